@@ -1,9 +1,11 @@
 import re
 import uuid
+from pathlib import Path
 from typing import Optional, Tuple
 import structlog
 
-from ..models.schemas import Task, ProjectConfig, TaskStatus
+from ..config import config
+from ..models.schemas import Task, ProjectConfig, ReviewResult, TaskStatus
 from ..models.state_store import state_store
 try:
     from ..services.llm_service import llm_service
@@ -13,10 +15,17 @@ try:
     from ..services.github_service import github_service
 except ImportError:
     from ..services.github_service_simple import github_service
+from ..services.llm_resilience import deadline_exceeded, llm_deadline
+from ..services.prefetch_service import repo_prefetcher
+from ..services.task_executor import task_cancelled
 from ..services.logging_service import log_agent_action, log_task_event
+from ..services.test_service import test_service
+from ..utils.acceptance import build_context, evaluate_checks
 
 logger = structlog.get_logger(__name__)
 
+LEASE_LOST_MESSAGE = "Execução abortada: o lease da task foi perdido para outro worker"
+
 class ManagerAgent:
     """Agente gerente que coordena o processo de desenvolvimento"""
     
@@ -27,11 +36,19 @@ class ManagerAgent:
         """Define o agente programador"""
         self.programmer_agent = programmer_agent
     
-    def create_task(self, project_config: ProjectConfig, user_text: str) -> Task:
-        """Cria uma nova task baseada na solicitação do usuário"""
+    def create_task(self, project_config: ProjectConfig, user_text: str,
+                    chat_id: Optional[int] = None, priority: int = 0) -> Task:
+        """Cria uma nova task baseada na solicitação do usuário
+        
+        A task é salva como ``PENDING`` e fica disponível para a fila de execução.
+        """
         try:
             log_agent_action("manager", "create_task", {"user_text": user_text})
             
+            # Sincronizar o repositório em paralelo com a geração da especificação
+            if project_config.repo_url:
+                repo_prefetcher.prefetch(project_config.repo_url)
+            
             # Gerar especificação técnica
             spec = llm_service.json_spec(user_text, project_config.model_dump())
             
@@ -40,19 +57,25 @@ class ManagerAgent:
                 project=project_config.name,
                 raw_request=user_text,
                 objective=spec.objective,
-                context=f"Complexidade: {spec.estimated_complexity}"
+                context=f"Complexidade: {spec.estimated_complexity}",
+                impacted_areas=spec.impacted_areas,
+                step_plan=spec.step_plan,
+                complexity=spec.estimated_complexity,
+                chat_id=chat_id,
+                priority=priority
             )
             
             # Gerar nome da branch
             slug = self._create_slug(spec.objective)
             task.branch_name = f"feat/{slug}-{task.id[:8]}"
             
-            # Salvar task
-            state_store.save_task(task)
-            
-            # Adicionar evento
-            task.add_event("created", f"Task criada com objetivo: {spec.objective}")
-            state_store.save_task(task)
+            # Salvar task (uma única escrita para criação + evento)
+            with state_store.transaction():
+                state_store.save_task(task)
+                
+                # Adicionar evento
+                task.add_event("created", f"Task criada com objetivo: {spec.objective}")
+                state_store.save_task(task)
             
             log_task_event(task.id, "task_created", f"Task {task.id} criada")
             
@@ -63,12 +86,22 @@ class ManagerAgent:
             raise
     
     def review_and_iterate(self, task_id: str) -> Tuple[bool, str, Optional[str]]:
-        """Revisa e itera sobre uma task"""
+        """Revisa e itera sobre uma task, com prazo para as chamadas ao LLM"""
+        with llm_deadline(config.TASK_LLM_DEADLINE_SECONDS):
+            return self._review_and_iterate(task_id)
+    
+    def _review_and_iterate(self, task_id: str) -> Tuple[bool, str, Optional[str]]:
+        """Implementa, revisa e repete com o feedback da revisão até ``TASK_MAX_ITERATIONS`` vezes
+        
+        O workspace da task é liberado ao final em qualquer caminho (ver ``finally``).
+        """
+        task = project_config = None
+        keep_worktree = lease_lost = False
         try:
             log_agent_action("manager", "review_and_iterate", {"task_id": task_id})
             
-            # Recuperar task
-            task = state_store.get_task(task_id)
+            # Recuperar task (o histórico não é necessário aqui; novos eventos são anexados)
+            task = state_store.get_task(task_id, include_history=False)
             if not task:
                 return False, "Task não encontrada", None
             
@@ -86,56 +119,152 @@ class ManagerAgent:
             if not self.programmer_agent:
                 return False, "Agente programador não configurado", None
             
-            success, test_output, repo_path, diff = self.programmer_agent.implement(
-                task, project_config, task.branch_name
-            )
-            
-            if not success:
-                task.status = TaskStatus.FAILED
-                task.add_event("failed", f"Implementação falhou: {test_output}")
-                state_store.save_task(task)
-                return False, f"Implementação falhou: {test_output}", None
-            
-            # Revisar implementação
             spec_data = {
                 "objective": task.objective,
                 "acceptance_criteria": project_config.acceptance_checks
             }
             
-            # Obter log do git
-            git_log = self._get_git_log(repo_path, task.branch_name)
-            
-            review_result = llm_service.review(
-                spec_data, test_output, git_log, diff
-            )
-            
-            # Atualizar task com resultado da revisão
-            task.add_event("reviewed", f"Revisão: {'Aprovado' if review_result.approved else 'Reprovado'}")
-            
-            if review_result.approved:
-                # Push e criar PR
-                pr_url = self.programmer_agent.push_and_pr(task, project_config)
+            # Cada tentativa custa um ciclo de patch + testes no mesmo worktree
+            max_iterations = max(1, config.TASK_MAX_ITERATIONS)
+            feedback = None
+            rejected = False
+            attempt = 0
+            for attempt in range(1, max_iterations + 1):
+                if task_cancelled():
+                    # Outro worker pode ter assumido a task: não gravar nem limpar nada
+                    logger.warning(f"Lease da task {task.id} perdido; abortando")
+                    lease_lost = True
+                    return False, LEASE_LOST_MESSAGE, None
+                if attempt > 1:
+                    if deadline_exceeded():
+                        logger.warning(f"Prazo da task {task.id} esgotado após {attempt - 1} tentativas")
+                        attempt -= 1
+                        break
+                    task.add_event("retry", f"Tentativa {attempt}/{max_iterations} com o feedback anterior")
+                    state_store.save_task(task)
                 
-                task.status = TaskStatus.DONE
-                task.add_event("completed", f"Task concluída. PR: {pr_url}")
-                state_store.save_task(task)
+                success, test_output, repo_path, diff = self.programmer_agent.implement(
+                    task, project_config, task.branch_name, feedback=feedback, attempt=attempt
+                )
                 
-                return True, f"Task aprovada! PR criado: {pr_url}", pr_url
-            else:
-                # Task reprovada - retornar feedback
-                task.status = TaskStatus.REVIEW
-                task.add_event("rejected", f"Revisão reprovada: {review_result.notes}")
-                state_store.save_task(task)
+                if not success:
+                    rejected = False
+                    feedback = f"Implementação falhou: {test_output}"
+                    task.add_event("attempt_failed", f"Tentativa {attempt} falhou: {test_output}", {"attempt": attempt})
+                    state_store.save_task(task)
+                    if repo_path == Path():
+                        # Sem worktree não há o que tentar de novo
+                        break
+                    continue
+                
+                # Critérios decidíveis localmente dispensam a ida ao LLM
+                review_result = self._local_review(project_config, repo_path, diff)
+                
+                if review_result is None:
+                    # Obter log do git
+                    git_log = self._get_git_log(repo_path, task.branch_name)
+                    
+                    review_result = llm_service.review(
+                        spec_data, test_output, git_log, diff
+                    )
+                    reviewer = "LLM"
+                else:
+                    reviewer = "local"
                 
+                # Atualizar task com resultado da revisão
+                task.add_event(
+                    "reviewed",
+                    f"Revisão ({reviewer}): {'Aprovado' if review_result.approved else 'Reprovado'}",
+                    {"attempt": attempt}
+                )
+                
+                if review_result.approved:
+                    if task_cancelled():
+                        logger.warning(f"Lease da task {task.id} perdido antes do push; abortando")
+                        lease_lost = True
+                        return False, LEASE_LOST_MESSAGE, None
+                    
+                    # Push e criar PR
+                    pr_url = self.programmer_agent.push_and_pr(task, project_config)
+                    if not pr_url:
+                        message = "Implementação aprovada, mas falhou o push da branch ou a criação do PR"
+                        task.status = TaskStatus.FAILED
+                        task.add_event("failed", message)
+                        state_store.save_task(task)
+                        return False, message, None
+                    
+                    task.status = TaskStatus.DONE
+                    task.add_event("completed", f"Task concluída. PR: {pr_url}")
+                    state_store.save_task(task)
+                    
+                    return True, f"Task aprovada! PR criado: {pr_url}", pr_url
+                
+                rejected = True
                 feedback = f"Revisão reprovada: {review_result.notes}"
                 if review_result.next_actions:
                     feedback += f"\n\nPróximas ações: {review_result.next_actions}"
-                
-                return False, feedback, None
-                
+                task.add_event("rejected", f"Revisão reprovada: {review_result.notes}", {"attempt": attempt})
+                state_store.save_task(task)
+            
+            if rejected:
+                # Task reprovada em todas as tentativas - retornar o último feedback.
+                # O worktree fica para inspeção manual da última tentativa
+                keep_worktree = True
+                task.status = TaskStatus.REVIEW
+                state_store.save_task(task)
+                return False, f"{feedback}\n\n({attempt} tentativa(s))", None
+            
+            task.status = TaskStatus.FAILED
+            task.add_event("failed", feedback or "Implementação falhou")
+            state_store.save_task(task)
+            return False, feedback or "Implementação falhou", None
+        
         except Exception as e:
             logger.error(f"Erro na revisão e iteração: {e}")
             return False, f"Erro interno: {str(e)}", None
+        
+        finally:
+            if task is not None and project_config is not None and self.programmer_agent:
+                if lease_lost:
+                    # O novo dono da task pode estar usando o worktree: só esquecer o estado local
+                    self.programmer_agent.forget(task.id)
+                else:
+                    self.programmer_agent.cleanup(task, project_config, keep_worktree=keep_worktree)
+    
+    def _local_review(self, project_config: ProjectConfig, repo_path, diff: str) -> Optional[ReviewResult]:
+        """Avalia ``acceptance_checks`` localmente sobre o resultado da implementação
+        
+        Reprova na hora se alguma expressão falhar e aprova sem o LLM quando
+        o projeto tem ``skip_llm_review`` e todas passam. Retorna None quando
+        a decisão fica com a revisão do LLM.
+        """
+        lint_passed = None
+        lint_output = ""
+        if project_config.lint_command:
+            lint_passed, lint_output = test_service.run_tests(repo_path, project_config.lint_command)
+        
+        # As tasks só chegam à revisão com os testes passando
+        context = build_context(diff, tests_passed=True, lint_passed=lint_passed)
+        passed, failed, undecided = evaluate_checks(project_config.acceptance_checks, context)
+        logger.info(
+            f"Critérios de aceitação: {len(passed)} aprovados, {len(failed)} reprovados, "
+            f"{len(undecided)} para o LLM"
+        )
+        
+        if failed:
+            next_actions = "Ajustar a implementação para atender: " + "; ".join(failed)
+            if lint_passed is False:
+                next_actions += f"\n\nSaída do lint:\n{lint_output[-2000:]}"
+            return ReviewResult(
+                approved=False,
+                notes=f"Critérios de aceitação não atendidos: {'; '.join(failed)}",
+                next_actions=next_actions
+            )
+        
+        if project_config.skip_llm_review and not undecided:
+            return ReviewResult(approved=True, notes="Todos os critérios de aceitação atendidos (verificação local)")
+        
+        return None
     
     def _create_slug(self, text: str) -> str:
         """Cria um slug a partir do texto"""
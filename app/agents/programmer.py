@@ -1,9 +1,13 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
+import git
 import structlog
 
-from ..models.schemas import Task, ProjectConfig
 from ..config import config
+from ..models.schemas import Task, ProjectConfig
 try:
     from ..services.llm_service import llm_service
 except ImportError:
@@ -14,77 +18,260 @@ except ImportError:
     from ..services.github_service_simple import github_service
 from ..services.patch_service import patch_service
 from ..services.test_service import test_service
+from ..services.workspace_service import workspace_service
 from ..services.logging_service import log_agent_action, log_task_event
+from ..utils.stream_parsers import StreamAborted
 
 logger = structlog.get_logger(__name__)
 
+# Instruções extras que diversificam os candidatos especulativos
+CANDIDATE_HINTS = [
+    "",
+    "Prefira a menor mudança possível que atenda ao objetivo.",
+    "Considere uma abordagem diferente da mais óbvia e trate os casos de borda.",
+]
+
+class CandidateCancelled(Exception):
+    """Outro candidato especulativo já passou nos testes"""
+
 class ProgrammerAgent:
     """Agente programador que implementa mudanças no código"""
     
-    def implement(self, task: Task, project_config: ProjectConfig, branch_name: str) -> Tuple[bool, str, Path, str]:
-        """Implementa as mudanças para uma task"""
+    def __init__(self):
+        # Worktree, commit base e mapa do repositório de cada task, reaproveitados entre tentativas
+        self._workspaces: Dict[str, Dict[str, Any]] = {}
+    
+    def implement(self, task: Task, project_config: ProjectConfig, branch_name: str,
+                  feedback: Optional[str] = None, attempt: int = 1) -> Tuple[bool, str, Path, str]:
+        """Implementa as mudanças para uma task
+        
+        A partir da segunda tentativa o worktree da tentativa anterior é
+        restaurado para o commit base (sem novo checkout) e o mapa do
+        repositório é reaproveitado; ``feedback`` vai para o prompt do patch.
+        """
         try:
-            log_agent_action("programmer", "implement", {"task_id": task.id, "branch": branch_name})
+            log_agent_action("programmer", "implement", {
+                "task_id": task.id, "branch": branch_name, "attempt": attempt
+            })
             
-            # Clone ou pull do repositório
-            repo_path = github_service.clone_or_pull(project_config.repo_url, project_config.name)
-            
-            # Criar branch
-            if not github_service.create_branch(repo_path, project_config.default_branch, branch_name):
-                return False, "Falha ao criar branch", repo_path, ""
-            
-            # Gerar mapa do repositório
-            repo_map = github_service.get_repo_map(repo_path)
+            workspace = self._prepare_workspace(task, project_config, branch_name)
+            if workspace is None:
+                return False, "Falha ao criar branch", Path(), ""
+            repo_path = workspace["repo_path"]
             
             # Gerar especificação para o LLM
             spec_data = {
                 "objective": task.objective,
-                "impacted_areas": ["código principal"],
+                "impacted_areas": task.impacted_areas or ["código principal"],
                 "acceptance_criteria": project_config.acceptance_checks,
-                "step_plan": ["implementar mudanças", "testar funcionalidade"]
+                "step_plan": task.step_plan or ["implementar mudanças", "testar funcionalidade"]
             }
             
-            # Gerar patch via LLM
-            diff = llm_service.generate_patch(spec_data, repo_map)
+            # Gerar mapa do repositório com os arquivos mais relevantes para a task
+            if workspace.get("repo_map") is None:
+                query = " ".join([task.objective, task.raw_request] + task.impacted_areas)
+                workspace["repo_map"] = github_service.get_repo_map(
+                    repo_path, max_files=config.REPO_MAP_MAX_FILES,
+                    query=query, index_key=project_config.name
+                )
             
-            # Validar diff
-            is_valid, validation_msg = patch_service.validate_diff(diff)
-            if not is_valid:
-                return False, f"Diff inválido: {validation_msg}", repo_path, diff
+            # Um patch por vez ou vários candidatos em paralelo
+            if config.SPECULATIVE_CANDIDATES > 1:
+                success, output, diff = self._implement_speculative(
+                    task, project_config, branch_name, workspace, spec_data, feedback, attempt
+                )
+            else:
+                success, output, diff = self._run_candidate(
+                    task, project_config, repo_path, spec_data, workspace["repo_map"], feedback, attempt
+                )
             
-            # Aplicar patch
-            success, patch_msg = patch_service.apply_unified_diff(diff, repo_path)
             if not success:
-                return False, f"Falha ao aplicar patch: {patch_msg}", repo_path, diff
-            
-            # Criar backup do diff
-            patch_service.create_diff_backup(diff, task.id)
-            
-            # Fazer commit das mudanças
-            commit_message = f"feat: {task.objective}\n\nTask ID: {task.id}"
-            if not github_service.commit_all(repo_path, commit_message):
-                return False, "Falha ao fazer commit", repo_path, diff
-            
-            # Executar testes
-            tests_ok, test_output = test_service.run_tests(repo_path, project_config.test_command)
-            
-            if not tests_ok:
-                return False, f"Testes falharam: {test_output}", repo_path, diff
+                return False, output, repo_path, diff
             
             log_task_event(task.id, "implementation_success", "Implementação concluída com sucesso")
             
-            return True, test_output, repo_path, diff
+            return True, output, repo_path, diff
             
         except Exception as e:
             logger.error(f"Erro na implementação: {e}")
-            return False, f"Erro interno: {str(e)}", Path(), ""
+            # Com o worktree pronto a tentativa pode ser repetida
+            workspace = self._workspaces.get(task.id) or {}
+            return False, f"Erro interno: {str(e)}", workspace.get("repo_path", Path()), ""
+    
+    def _run_candidate(self, task: Task, project_config: ProjectConfig, repo_path: Path,
+                       spec_data: Dict[str, Any], repo_map: str, feedback: Optional[str], attempt: int,
+                       temperature: float = 0.1, cancel: Optional[threading.Event] = None,
+                       backup: bool = True) -> Tuple[bool, str, str]:
+        """Gera, aplica, comita e testa um patch em ``repo_path``
+        
+        Retorna (testes passaram, saída ou motivo da falha, diff). Com
+        ``cancel`` sinalizado o candidato para no próximo passo
+        (``CandidateCancelled``), inclusive no meio do stream ou dos testes.
+        """
+        def on_section(section: str):
+            self._ensure_active(cancel)
+            self._check_section(section)
+        
+        # Gerar patch via LLM, validando cada arquivo do diff assim que chega
+        diff = llm_service.generate_patch(
+            spec_data, repo_map, feedback=feedback, on_section=on_section,
+            complexity=task.complexity, attempt=attempt, temperature=temperature
+        )
+        self._ensure_active(cancel)
+        
+        # Validar diff
+        is_valid, validation_msg = patch_service.validate_diff(diff)
+        if not is_valid:
+            return False, f"Diff inválido: {validation_msg}", diff
+        
+        # Aplicar patch
+        success, patch_msg = patch_service.apply_unified_diff(diff, repo_path)
+        if not success:
+            return False, f"Falha ao aplicar patch: {patch_msg}", diff
+        
+        # Criar backup do diff
+        if backup:
+            patch_service.create_diff_backup(diff, task.id)
+        
+        # Fazer commit das mudanças
+        commit_message = f"feat: {task.objective}\n\nTask ID: {task.id}"
+        if not github_service.commit_all(repo_path, commit_message):
+            return False, "Falha ao fazer commit", diff
+        self._ensure_active(cancel)
+        
+        # Executar testes
+        tests_ok, test_output = test_service.run_tests(repo_path, project_config.test_command, cancel=cancel)
+        self._ensure_active(cancel)
+        
+        if not tests_ok:
+            return False, f"Testes falharam: {test_output}", diff
+        return True, test_output, diff
+    
+    def _ensure_active(self, cancel: Optional[threading.Event]):
+        """Interrompe um candidato cancelado"""
+        if cancel is not None and cancel.is_set():
+            raise CandidateCancelled("Candidato cancelado")
+    
+    def _implement_speculative(self, task: Task, project_config: ProjectConfig, branch_name: str,
+                               workspace: Dict[str, Any], spec_data: Dict[str, Any],
+                               feedback: Optional[str], attempt: int) -> Tuple[bool, str, str]:
+        """Gera ``SPECULATIVE_CANDIDATES`` patches em paralelo; vence o primeiro que passa nos testes
+        
+        Cada candidato usa outra temperatura e instrução e roda em um
+        worktree próprio a partir do commit base. Os demais são cancelados
+        assim que um passa, e o worktree da task recebe o commit vencedor.
+        """
+        count = config.SPECULATIVE_CANDIDATES
+        cancel = threading.Event()
+        winner: Optional[Tuple[int, str, str, str]] = None
+        failures: List[str] = []
+        
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="candidate") as pool:
+            # Cada candidato leva uma cópia do contexto (prazo do LLM da task)
+            futures = {
+                pool.submit(
+                    contextvars.copy_context().run, self._speculative_candidate,
+                    task, project_config, branch_name, workspace, spec_data, feedback, attempt, index, cancel
+                ): index
+                for index in range(count)
+            }
+            try:
+                for future in as_completed(futures):
+                    index = futures[future]
+                    success, output, diff, sha = future.result()
+                    if success:
+                        winner = (index, output, diff, sha)
+                        break
+                    failures.append(f"[candidato {index + 1}] {output}")
+            finally:
+                cancel.set()
+        
+        try:
+            if winner is None:
+                return False, f"Nenhum dos {count} candidatos passou nos testes:\n\n" + "\n\n".join(failures), ""
+            
+            index, output, diff, sha = winner
+            if not workspace_service.reset_worktree(project_config.name, task.id, sha):
+                return False, "Falha ao adotar o patch vencedor", diff
+            patch_service.create_diff_backup(diff, task.id)
+            logger.info(f"Task {task.id}: candidato {index + 1}/{count} passou nos testes primeiro")
+            return True, output, diff
+        finally:
+            self._remove_candidates(task, project_config, branch_name)
+    
+    def _speculative_candidate(self, task: Task, project_config: ProjectConfig, branch_name: str,
+                               workspace: Dict[str, Any], spec_data: Dict[str, Any],
+                               feedback: Optional[str], attempt: int, index: int,
+                               cancel: threading.Event) -> Tuple[bool, str, str, Optional[str]]:
+        """Um candidato especulativo: retorna (passou, saída, diff, commit)"""
+        temperatures = config.SPECULATIVE_TEMPERATURES
+        hint = CANDIDATE_HINTS[index % len(CANDIDATE_HINTS)]
+        candidate_feedback = "\n\n".join(part for part in (feedback, hint) if part) or None
+        try:
+            self._ensure_active(cancel)
+            repo_path = workspace_service.create_worktree(
+                project_config.repo_url, project_config.name, f"{task.id}-c{index}",
+                project_config.default_branch, f"{branch_name}-c{index}",
+                start_point=workspace["base_sha"]
+            )
+            success, output, diff = self._run_candidate(
+                task, project_config, repo_path, spec_data, workspace["repo_map"], candidate_feedback,
+                attempt, temperature=temperatures[index % len(temperatures)], cancel=cancel, backup=False
+            )
+            sha = git.Repo(repo_path).head.commit.hexsha if success else None
+            return success, output, diff, sha
+        
+        except CandidateCancelled:
+            return False, "Candidato cancelado", "", None
+        except Exception as e:
+            logger.error(f"Erro no candidato {index + 1} da task {task.id}: {e}")
+            return False, f"Erro interno: {str(e)}", "", None
+    
+    def _remove_candidates(self, task: Task, project_config: ProjectConfig, branch_name: str):
+        """Remove os worktrees e branches dos candidatos especulativos"""
+        count = config.SPECULATIVE_CANDIDATES
+        if count <= 1:
+            return
+        for index in range(count):
+            workspace_service.remove_worktree(
+                project_config.repo_url, project_config.name,
+                f"{task.id}-c{index}", f"{branch_name}-c{index}"
+            )
+    
+    def _prepare_workspace(self, task: Task, project_config: ProjectConfig,
+                           branch_name: str) -> Optional[Dict[str, Any]]:
+        """Worktree da task pronto para uma tentativa (criado na primeira, restaurado nas demais)"""
+        workspace = self._workspaces.get(task.id)
+        if workspace and workspace_service.reset_worktree(project_config.name, task.id, workspace["base_sha"]):
+            return workspace
+        
+        # Worktree próprio da task, com a branch criada a partir da branch padrão
+        try:
+            repo_path = workspace_service.create_worktree(
+                project_config.repo_url, project_config.name, task.id,
+                project_config.default_branch, branch_name
+            )
+            base_sha = git.Repo(repo_path).head.commit.hexsha
+        except Exception as e:
+            logger.error(f"Erro ao criar worktree da task {task.id}: {e}")
+            return None
+        
+        workspace = {"repo_path": repo_path, "base_sha": base_sha, "repo_map": None}
+        self._workspaces[task.id] = workspace
+        return workspace
+    
+    def _check_section(self, section: str):
+        """Valida uma seção de arquivo do diff durante o streaming"""
+        is_valid, validation_msg = patch_service.validate_diff(section)
+        if not is_valid:
+            raise StreamAborted(validation_msg)
     
     def push_and_pr(self, task: Task, project_config: ProjectConfig) -> Optional[str]:
         """Faz push da branch e cria Pull Request"""
         try:
             log_agent_action("programmer", "push_and_pr", {"task_id": task.id})
             
-            repo_path = config.WORKDIR_BASE / project_config.name
+            repo_path = workspace_service.worktree_path(project_config.name, task.id)
             
             # Push da branch
             if not github_service.push_branch(repo_path, task.branch_name):
@@ -122,12 +309,36 @@ class ProgrammerAgent:
             
             if pr_url:
                 log_task_event(task.id, "pr_created", f"PR criado: {pr_url}")
+                
+                # A branch já está no remoto; o worktree não é mais necessário
+                self._workspaces.pop(task.id, None)
+                workspace_service.remove_worktree(
+                    project_config.repo_url, project_config.name, task.id, task.branch_name
+                )
             
             return pr_url
             
         except Exception as e:
             logger.error(f"Erro ao criar PR: {e}")
             return None
+    
+    def cleanup(self, task: Task, project_config: ProjectConfig, keep_worktree: bool = False) -> bool:
+        """Descarta o worktree e a branch local de uma task encerrada
+        
+        Com ``keep_worktree`` só o worktree da task (e sua branch) é mantido;
+        o estado em memória e os worktrees de candidatos são descartados.
+        """
+        self._workspaces.pop(task.id, None)
+        self._remove_candidates(task, project_config, task.branch_name)
+        if keep_worktree:
+            return True
+        return workspace_service.remove_worktree(
+            project_config.repo_url, project_config.name, task.id, task.branch_name
+        )
+    
+    def forget(self, task_id: str):
+        """Esquece o workspace de uma task sem tocar no disco (ex.: lease perdido)"""
+        self._workspaces.pop(task_id, None)
 
 # Instância global
 programmer_agent = ProgrammerAgent()
@@ -14,6 +14,30 @@ class Config:
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", DEFAULT_MODEL)
+    LLM_STRONG_MODEL = os.getenv("LLM_STRONG_MODEL", "gpt-4o")
+    LLM_STRONG_COMPLEXITIES = os.getenv("LLM_STRONG_COMPLEXITIES", "high").lower().split(",")  # low | medium | high
+    LLM_ROUTE_STATS_ENABLED = os.getenv("LLM_ROUTE_STATS_ENABLED", "false").lower() == "true"
+    LLM_ROUTE_STATS_FLUSH_SECONDS = float(os.getenv("LLM_ROUTE_STATS_FLUSH_SECONDS", "5"))
+    LLM_ROUTE_STATS_MAX_MB = int(os.getenv("LLM_ROUTE_STATS_MAX_MB", "16"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "4"))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+    LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "24000"))
+    LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+    LLM_STREAM_RETRIES = int(os.getenv("LLM_STREAM_RETRIES", "1"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+    LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    TASK_LLM_DEADLINE_SECONDS = float(os.getenv("TASK_LLM_DEADLINE_SECONDS", "900"))  # 0 = sem prazo
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))  # 7 dias; 0 = sem expiração
+    LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "128"))
+    LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
     
     # GitHub
     GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -22,8 +46,49 @@ class Config:
     WORKDIR_BASE = Path(os.getenv("WORKDIR_BASE", "/tmp/dev_trooper"))
     ARTIFACTS_DIR = Path("artifacts")
     
+    # Persistência de estado
+    DATA_DIR = Path(os.getenv("DATA_DIR", "data"))
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "json")  # json | sqlite
+    SQLITE_PATH = Path(os.getenv("SQLITE_PATH", str(DATA_DIR / "dev_trooper.db")))
+    STATE_LOG_COMPACT_THRESHOLD = int(os.getenv("STATE_LOG_COMPACT_THRESHOLD", "1000"))
+    STATE_LOG_COMPACT_INTERVAL = float(os.getenv("STATE_LOG_COMPACT_INTERVAL", "60"))
+    STATE_WRITE_COALESCE_MS = int(os.getenv("STATE_WRITE_COALESCE_MS", "0"))
+    STATE_FSYNC = os.getenv("STATE_FSYNC", "batch")  # always | batch | never
+    EVENT_PAYLOAD_MAX_CHARS = int(os.getenv("EVENT_PAYLOAD_MAX_CHARS", "2000"))
+    EVENT_PREVIEW_CHARS = int(os.getenv("EVENT_PREVIEW_CHARS", "300"))
+    STATE_IO_THREADS = int(os.getenv("STATE_IO_THREADS", "4"))
+    
+    # Execução de tasks
+    TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+    TASK_MAX_PENDING = int(os.getenv("TASK_MAX_PENDING", "32"))
+    TASK_MAX_PER_PROJECT = int(os.getenv("TASK_MAX_PER_PROJECT", "2"))
+    TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "1800"))
+    TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+    TASK_MAX_ITERATIONS = int(os.getenv("TASK_MAX_ITERATIONS", "3"))  # tentativas de patch por execução
+    SPECULATIVE_CANDIDATES = int(os.getenv("SPECULATIVE_CANDIDATES", "1"))  # patches concorrentes por tentativa; 1 = desligado
+    SPECULATIVE_TEMPERATURES = [float(t) for t in os.getenv("SPECULATIVE_TEMPERATURES", "0.1,0.5,0.8").split(",")]
+    TASK_QUEUE_POLL_SECONDS = float(os.getenv("TASK_QUEUE_POLL_SECONDS", "2"))
+    
     # Git
     DEFAULT_GIT_AUTHOR = os.getenv("DEFAULT_GIT_AUTHOR", "Agent Bot <agent@example.com>")
+    GIT_CACHE_DIR = Path(os.getenv("GIT_CACHE_DIR", str(WORKDIR_BASE / "mirrors")))
+    GIT_CLONE_FILTER = os.getenv("GIT_CLONE_FILTER", "")  # ex.: blob:none
+    GIT_CLONE_DEPTH = int(os.getenv("GIT_CLONE_DEPTH", "0"))  # 0 = histórico completo
+    GIT_FETCH_TTL_SECONDS = float(os.getenv("GIT_FETCH_TTL_SECONDS", "30"))
+    PREFETCH_INTERVAL_SECONDS = float(os.getenv("PREFETCH_INTERVAL_SECONDS", "300"))  # 0 desabilita
+    PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+    
+    # Mapa do repositório
+    REPO_MAP_IGNORE = os.getenv(
+        "REPO_MAP_IGNORE",
+        ".*,node_modules,__pycache__,*.pyc,dist,build,vendor,*.min.js,*.map,*.lock"
+    ).split(",")
+    REPO_MAP_TOKEN_BUDGET = int(os.getenv("REPO_MAP_TOKEN_BUDGET", "12000"))
+    REPO_MAP_MODE = os.getenv("REPO_MAP_MODE", "outline")  # outline ou full
+    REPO_MAP_FULL_FILES = int(os.getenv("REPO_MAP_FULL_FILES", "3"))
+    REPO_MAP_MAX_FILES = int(os.getenv("REPO_MAP_MAX_FILES", "100"))
+    CACHE_DIR = Path(os.getenv("CACHE_DIR", str(WORKDIR_BASE / "cache")))
+    REPO_MAP_CACHE_MAX_MB = int(os.getenv("REPO_MAP_CACHE_MAX_MB", "256"))
     
     @classmethod
     def validate(cls):
@@ -4,6 +4,11 @@ import sys
 import structlog
 
 from .config import config
+from .models.state_store import state_store
+from .models.async_state_store import async_state_store
+from .services.task_executor import task_executor
+from .services.prefetch_service import repo_prefetcher
+from .services.llm_client import llm_client
 from .services.logging_service import setup_logging
 try:
     from .telegram_bot import telegram_bot
@@ -61,6 +66,15 @@ class DevTrooperApp:
         """Para a aplicação"""
         logger.info("🛑 Parando aplicação...")
         self.running = False
+        
+        # Descartar tasks que ainda não começaram a executar
+        task_executor.shutdown(wait=False)
+        repo_prefetcher.shutdown()
+        llm_client.close()
+        
+        # Aguardar operações em andamento e gravar escritas pendentes do state store
+        async_state_store.close()
+        state_store.close()
 
 async def main():
     """Função principal"""
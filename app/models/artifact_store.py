@@ -0,0 +1,70 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+import structlog
+
+from ..config import config
+from .schemas import TaskEvent
+
+logger = structlog.get_logger()
+
+class ArtifactStore:
+    """Store de conteúdo endereçado por hash (sha256) para payloads grandes"""
+    
+    def __init__(self, base_dir: Optional[Path] = None):
+        self.base_dir = base_dir or config.ARTIFACTS_DIR / "blobs"
+    
+    def _blob_path(self, ref: str) -> Path:
+        """Caminho do blob: <base>/<2 primeiros caracteres>/<hash>"""
+        return self.base_dir / ref[:2] / ref
+    
+    def put(self, content: str) -> str:
+        """Armazena um conteúdo e retorna sua referência (idempotente)"""
+        data = content.encode('utf-8')
+        ref = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(ref)
+        
+        if blob_path.exists():
+            return ref
+        
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=blob_path.parent, prefix=f".{ref}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        
+        return ref
+    
+    def get(self, ref: str) -> Optional[str]:
+        """Recupera um conteúdo pela referência"""
+        try:
+            return self._blob_path(ref).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            logger.warning(f"Artefato {ref} não encontrado")
+            return None
+    
+    def offload_event(self, event: TaskEvent,
+                      max_chars: Optional[int] = None,
+                      preview_chars: Optional[int] = None) -> TaskEvent:
+        """Move a mensagem de um evento grande para o store, mantendo uma prévia"""
+        max_chars = max_chars if max_chars is not None else config.EVENT_PAYLOAD_MAX_CHARS
+        preview_chars = preview_chars if preview_chars is not None else config.EVENT_PREVIEW_CHARS
+        
+        if event.payload_ref or len(event.message) <= max_chars:
+            return event
+        
+        event.payload_ref = self.put(event.message)
+        event.message = (
+            f"{event.message[:preview_chars]}… "
+            f"[{len(event.message)} caracteres, artefato {event.payload_ref[:12]}]"
+        )
+        return event
+
+# Instância global
+artifact_store = ArtifactStore()
@@ -0,0 +1,100 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Any
+import structlog
+
+from ..config import config
+from .schemas import Task, TaskEvent, ProjectConfig, UserSession
+from .state_store import state_store
+
+logger = structlog.get_logger()
+
+class AsyncStateStore:
+    """Fachada assíncrona do state store para uso no event loop
+    
+    Cada chamada roda em um pool de threads dedicado, de modo que I/O de
+    arquivo, parse de JSON e consultas SQLite não bloqueiam os handlers do
+    bot. O pool é separado do executor padrão para que tarefas longas não
+    atrasem o acesso ao estado.
+    """
+    
+    def __init__(self, store: Any, max_workers: Optional[int] = None):
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.STATE_IO_THREADS,
+            thread_name_prefix="state-io"
+        )
+    
+    async def _run(self, method: str, *args, **kwargs) -> Any:
+        """Executa um método do store no pool de I/O"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(getattr(self.store, method), *args, **kwargs)
+        )
+    
+    # Métodos para Tasks
+    async def save_task(self, task: Task, expected_version: Optional[int] = None) -> bool:
+        """Salva uma task"""
+        return await self._run("save_task", task, expected_version)
+    
+    async def get_task(self, task_id: str, include_history: bool = True) -> Optional[Task]:
+        """Recupera uma task por ID"""
+        return await self._run("get_task", task_id, include_history=include_history)
+    
+    async def get_task_history(self, task_id: str, limit: Optional[int] = None) -> List[TaskEvent]:
+        """Recupera o histórico de uma task"""
+        return await self._run("get_task_history", task_id, limit)
+    
+    async def get_task_version(self, task_id: str) -> Optional[int]:
+        """Retorna a versão atual de uma task"""
+        return await self._run("get_task_version", task_id)
+    
+    async def get_tasks_by_project(self, project: str, include_history: bool = True) -> List[Task]:
+        """Recupera todas as tasks de um projeto"""
+        return await self._run("get_tasks_by_project", project, include_history=include_history)
+    
+    async def get_tasks_by_status(self, status: str, include_history: bool = False) -> List[Task]:
+        """Recupera todas as tasks com um status"""
+        return await self._run("get_tasks_by_status", status, include_history=include_history)
+    
+    async def update_task_status(self, task_id: str, status: str) -> bool:
+        """Atualiza o status de uma task"""
+        return await self._run("update_task_status", task_id, status)
+    
+    # Métodos para Projects
+    async def save_project(self, project: ProjectConfig) -> bool:
+        """Salva uma configuração de projeto"""
+        return await self._run("save_project", project)
+    
+    async def get_project(self, project_name: str) -> Optional[ProjectConfig]:
+        """Recupera uma configuração de projeto"""
+        return await self._run("get_project", project_name)
+    
+    async def list_projects(self) -> List[str]:
+        """Lista todos os projetos"""
+        return await self._run("list_projects")
+    
+    # Métodos para Sessions
+    async def save_session(self, session: UserSession) -> bool:
+        """Salva uma sessão de usuário"""
+        return await self._run("save_session", session)
+    
+    async def get_session(self, user_id: int) -> Optional[UserSession]:
+        """Recupera uma sessão de usuário"""
+        return await self._run("get_session", user_id)
+    
+    async def update_session_project(self, user_id: int, project_name: str) -> bool:
+        """Atualiza o projeto atual de uma sessão"""
+        return await self._run("update_session_project", user_id, project_name)
+    
+    async def flush(self) -> bool:
+        """Grava escritas pendentes"""
+        return await self._run("flush")
+    
+    def close(self):
+        """Encerra o pool de I/O (o store em si é fechado pelo dono)"""
+        self._executor.shutdown(wait=True)
+
+# Instância global
+async_state_store = AsyncStateStore(state_store)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 import uuid
 
 class TaskStatus(str, Enum):
@@ -22,6 +22,11 @@ class ProjectConfig(BaseModel):
         default=["tests_passed == True"], 
         description="Lista de expressões de aceitação"
     )
+    lint_command: Optional[str] = Field(None, description="Comando de lint (define ``lint_passed`` nas expressões)")
+    skip_llm_review: bool = Field(
+        default=False,
+        description="Aprovar sem revisão do LLM quando todas as expressões de aceitação passam localmente"
+    )
 
 class TaskEvent(BaseModel):
     """Evento na história de uma task"""
@@ -29,6 +34,7 @@ class TaskEvent(BaseModel):
     event_type: str = Field(..., description="Tipo do evento")
     message: str = Field(..., description="Mensagem do evento")
     data: Optional[Dict[str, Any]] = Field(None, description="Dados adicionais")
+    payload_ref: Optional[str] = Field(None, description="Referência à mensagem completa no artifact store")
 
 class Task(BaseModel):
     """Representa uma tarefa de desenvolvimento"""
@@ -38,11 +44,24 @@ class Task(BaseModel):
     objective: str = Field(..., description="Objetivo da tarefa")
     context: Optional[str] = Field(None, description="Contexto adicional")
     branch_name: Optional[str] = Field(None, description="Nome da branch criada")
+    impacted_areas: List[str] = Field(default_factory=list, description="Áreas do código impactadas (da especificação)")
+    step_plan: List[str] = Field(default_factory=list, description="Plano de implementação (da especificação)")
+    complexity: Optional[str] = Field(None, description="Complexidade estimada (da especificação)")
     status: TaskStatus = Field(default=TaskStatus.PENDING)
     history: List[TaskEvent] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     
+    # Fila de execução
+    priority: int = Field(default=0, description="Prioridade na fila (maior executa primeiro)")
+    chat_id: Optional[int] = Field(None, description="Chat do Telegram que recebe o resultado")
+    lease_owner: Optional[str] = Field(None, description="Worker que está executando a task")
+    lease_expires_at: Optional[datetime] = Field(None, description="Expiração do lease do worker")
+    attempts: int = Field(default=0, description="Quantas vezes a task foi reivindicada")
+    
+    # Quantos eventos de ``history`` já foram persistidos pelo state store
+    _persisted_events: int = PrivateAttr(default=0)
+    
     def add_event(self, event_type: str, message: str, data: Optional[Dict[str, Any]] = None):
         """Adiciona um evento à história da task"""
         event = TaskEvent(event_type=event_type, message=message, data=data)
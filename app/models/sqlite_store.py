@@ -0,0 +1,441 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+from datetime import datetime
+import structlog
+
+from .artifact_store import artifact_store
+from .schemas import Task, TaskEvent, ProjectConfig, UserSession
+
+logger = structlog.get_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks (project, updated_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks (updated_at);
+
+CREATE TABLE IF NOT EXISTS task_events (
+    task_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (task_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+class SQLiteStateStore:
+    """Store de estado usando SQLite, com a mesma interface do JSONStateStore
+    
+    Tasks ficam indexadas por ``project``, ``status`` e ``updated_at``; o
+    registro é mantido como JSON na coluna ``data`` e o histórico, evento a
+    evento, na tabela ``task_events``.
+    """
+    
+    def __init__(self, db_path: Path = Path("data/dev_trooper.db")):
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate_schema()
+        self._conn.commit()
+    
+    def _migrate_schema(self):
+        """Atualiza bancos criados antes da coluna de versão e da tabela de eventos"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")]
+        if 'version' not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        
+        # Histórico embutido no JSON da task passa para task_events
+        rows = self._conn.execute(
+            "SELECT id, json_extract(data, '$.history') FROM tasks "
+            "WHERE json_extract(data, '$.history') IS NOT NULL"
+        ).fetchall()
+        for task_id, history in rows:
+            self._insert_events(task_id, json.loads(history), base=0)
+            self._conn.execute(
+                "UPDATE tasks SET data = json_remove(data, '$.history') WHERE id = ?", (task_id,)
+            )
+    
+    def _insert_events(self, task_id: str, events: List[Dict[str, Any]], base: Optional[int] = None):
+        """Anexa eventos ao histórico de uma task (sem commit)"""
+        if base is None:
+            base = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM task_events WHERE task_id = ?", (task_id,)
+            ).fetchone()[0]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO task_events (task_id, seq, data) VALUES (?, ?, ?)",
+            [(task_id, base + i, json.dumps(event, ensure_ascii=False)) for i, event in enumerate(events)]
+        )
+    
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Executa uma instrução e faz commit (fora de transações)"""
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            if self._tx_depth == 0:
+                self._conn.commit()
+            return cursor
+    
+    def _fetchall(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Executa uma consulta e retorna todas as linhas"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+    
+    @contextmanager
+    def transaction(self):
+        """Agrupa as mutações do bloco em um único commit
+        
+        Se o bloco levantar uma exceção, a transação mais externa é desfeita.
+        """
+        with self._lock:
+            self._tx_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._conn.rollback()
+                raise
+            else:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._conn.commit()
+    
+    def flush(self) -> bool:
+        """Confirma mutações pendentes"""
+        try:
+            with self._lock:
+                self._conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao confirmar escritas pendentes: {e}")
+            return False
+    
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
+    
+    # Métodos para Tasks
+    def save_task(self, task: Task, expected_version: Optional[int] = None) -> bool:
+        """Salva uma task
+        
+        Apenas os eventos ainda não persistidos são anexados ao histórico;
+        mensagens grandes vão para o artifact store. Com ``expected_version``,
+        só grava se a versão atual da task for essa (0 para uma task nova).
+        Sem ele, o lease gravado (``lease_owner``/``lease_expires_at``) é
+        mantido, para não desfazer uma renovação feita pela fila.
+        """
+        try:
+            with self.transaction():
+                if not self._save_task_row(task, expected_version):
+                    return False
+                new_events = [
+                    artifact_store.offload_event(event).model_dump(mode="json")
+                    for event in task.history[task._persisted_events:]
+                ]
+                if new_events:
+                    self._insert_events(task.id, new_events)
+            
+            task._persisted_events = len(task.history)
+            logger.info(f"Task {task.id} salva com sucesso")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar task {task.id}: {e}")
+            return False
+    
+    def _save_task_row(self, task: Task, expected_version: Optional[int]) -> bool:
+        """Grava a linha da task (sem histórico) respeitando ``expected_version``"""
+        task_data = task.model_dump(mode="json", exclude={'history'})
+        params = (task.project, task.status.value, task_data['updated_at'],
+                  json.dumps(task_data, ensure_ascii=False), task.id)
+        
+        if expected_version is None:
+            self._execute(
+                "INSERT INTO tasks (project, status, updated_at, data, id, version) "
+                "VALUES (?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT (id) DO UPDATE SET project = excluded.project, status = excluded.status, "
+                "updated_at = excluded.updated_at, version = tasks.version + 1, "
+                # Lease só muda via CAS (claim/renew/release): preserva o atual
+                "data = json_set(excluded.data, "
+                "'$.lease_owner', json_extract(tasks.data, '$.lease_owner'), "
+                "'$.lease_expires_at', json_extract(tasks.data, '$.lease_expires_at'))",
+                params
+            )
+        elif expected_version == 0:
+            try:
+                self._execute(
+                    "INSERT INTO tasks (project, status, updated_at, data, id, version) "
+                    "VALUES (?, ?, ?, ?, ?, 1)",
+                    params
+                )
+            except sqlite3.IntegrityError:
+                logger.warning(f"Conflito de versão na task {task.id}: esperada 0, task já existe")
+                return False
+        else:
+            cursor = self._execute(
+                "UPDATE tasks SET project = ?, status = ?, updated_at = ?, data = ?, "
+                "version = version + 1 WHERE id = ? AND version = ?",
+                params + (expected_version,)
+            )
+            if cursor.rowcount == 0:
+                logger.warning(f"Conflito de versão na task {task.id}: esperada {expected_version}")
+                return False
+        
+        return True
+    
+    def get_task_version(self, task_id: str) -> Optional[int]:
+        """Retorna a versão atual de uma task (None se não existe)"""
+        rows = self._fetchall("SELECT version FROM tasks WHERE id = ?", (task_id,))
+        return rows[0][0] if rows else None
+    
+    def _build_task(self, data: str, include_history: bool) -> Task:
+        """Monta uma Task a partir da linha, carregando o histórico se pedido"""
+        task_data = json.loads(data)
+        history = []
+        if include_history:
+            history = [json.loads(row[0]) for row in self._fetchall(
+                "SELECT data FROM task_events WHERE task_id = ? ORDER BY seq", (task_data['id'],)
+            )]
+        task = Task(**task_data, history=history)
+        task._persisted_events = len(history)
+        return task
+    
+    def get_task(self, task_id: str, include_history: bool = True) -> Optional[Task]:
+        """Recupera uma task por ID
+        
+        Com ``include_history=False`` o histórico não é carregado; eventos
+        adicionados depois continuam sendo anexados ao histórico salvo.
+        """
+        try:
+            rows = self._fetchall("SELECT data FROM tasks WHERE id = ?", (task_id,))
+            if rows:
+                return self._build_task(rows[0][0], include_history)
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao carregar task {task_id}: {e}")
+            return None
+    
+    def get_task_history(self, task_id: str, limit: Optional[int] = None) -> List[TaskEvent]:
+        """Recupera o histórico de uma task (os ``limit`` eventos mais recentes)"""
+        try:
+            rows = self._fetchall(
+                "SELECT data FROM task_events WHERE task_id = ? ORDER BY seq DESC LIMIT ?",
+                (task_id, limit or -1)
+            )
+            return [TaskEvent(**json.loads(row[0])) for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"Erro ao carregar histórico da task {task_id}: {e}")
+            return []
+    
+    def get_tasks_by_project(self, project: str, include_history: bool = True) -> List[Task]:
+        """Recupera todas as tasks de um projeto"""
+        try:
+            rows = self._fetchall(
+                "SELECT data FROM tasks WHERE project = ? ORDER BY updated_at", (project,)
+            )
+            return [self._build_task(row[0], include_history) for row in rows]
+        except Exception as e:
+            logger.error(f"Erro ao carregar tasks do projeto {project}: {e}")
+            return []
+    
+    def get_tasks_by_status(self, status: str, include_history: bool = False) -> List[Task]:
+        """Recupera todas as tasks com um status"""
+        try:
+            status = getattr(status, 'value', status)
+            rows = self._fetchall(
+                "SELECT data FROM tasks WHERE status = ? ORDER BY updated_at", (status,)
+            )
+            return [self._build_task(row[0], include_history) for row in rows]
+        except Exception as e:
+            logger.error(f"Erro ao carregar tasks com status {status}: {e}")
+            return []
+    
+    def update_task_status(self, task_id: str, status: str) -> bool:
+        """Atualiza o status de uma task"""
+        try:
+            status = getattr(status, 'value', status)
+            updated_at = datetime.now().isoformat()
+            cursor = self._execute(
+                "UPDATE tasks SET status = ?, updated_at = ?, version = version + 1, "
+                "data = json_set(data, '$.status', ?, '$.updated_at', ?) WHERE id = ?",
+                (status, updated_at, status, updated_at, task_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            logger.info(f"Status da task {task_id} atualizado para {status}")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao atualizar status da task {task_id}: {e}")
+            return False
+    
+    # Métodos para Projects
+    def save_project(self, project: ProjectConfig) -> bool:
+        """Salva uma configuração de projeto"""
+        try:
+            self._execute(
+                "INSERT OR REPLACE INTO projects (name, data) VALUES (?, ?)",
+                (project.name, json.dumps(project.model_dump(mode="json"), ensure_ascii=False))
+            )
+            logger.info(f"Projeto {project.name} salvo com sucesso")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar projeto {project.name}: {e}")
+            return False
+    
+    def get_project(self, project_name: str) -> Optional[ProjectConfig]:
+        """Recupera uma configuração de projeto"""
+        try:
+            rows = self._fetchall("SELECT data FROM projects WHERE name = ?", (project_name,))
+            if rows:
+                return ProjectConfig(**json.loads(rows[0][0]))
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao carregar projeto {project_name}: {e}")
+            return None
+    
+    def list_projects(self) -> List[str]:
+        """Lista todos os projetos"""
+        try:
+            return [row[0] for row in self._fetchall("SELECT name FROM projects ORDER BY rowid")]
+        except Exception as e:
+            logger.error(f"Erro ao listar projetos: {e}")
+            return []
+    
+    # Métodos para Sessions
+    def save_session(self, session: UserSession) -> bool:
+        """Salva uma sessão de usuário"""
+        try:
+            self._execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data) VALUES (?, ?)",
+                (session.user_id, json.dumps(session.model_dump(mode="json"), ensure_ascii=False))
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar sessão do usuário {session.user_id}: {e}")
+            return False
+    
+    def get_session(self, user_id: int) -> Optional[UserSession]:
+        """Recupera uma sessão de usuário"""
+        try:
+            rows = self._fetchall("SELECT data FROM sessions WHERE user_id = ?", (user_id,))
+            if rows:
+                return UserSession(**json.loads(rows[0][0]))
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao carregar sessão do usuário {user_id}: {e}")
+            return None
+    
+    def update_session_project(self, user_id: int, project_name: str) -> bool:
+        """Atualiza o projeto atual de uma sessão"""
+        try:
+            with self._lock:
+                session = self.get_session(user_id)
+                if session:
+                    session.current_project = project_name
+                    session.last_activity = datetime.now()
+                else:
+                    session = UserSession(user_id=user_id, current_project=project_name)
+                return self.save_session(session)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar projeto da sessão do usuário {user_id}: {e}")
+            return False
+    
+    # Migração
+    def migrate_from_json(self, data_dir: Path) -> bool:
+        """Importa (uma única vez) os dados de um diretório do JSONStateStore"""
+        try:
+            if self._fetchall("SELECT 1 FROM meta WHERE key = 'json_migrated'"):
+                return True
+            
+            if not (data_dir / "tasks.json").exists() and not (data_dir / "projects.json").exists():
+                self._execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                    (datetime.now().isoformat(),)
+                )
+                return True
+            
+            from .state_store import JSONStateStore
+            json_store = JSONStateStore(data_dir, compact_interval=0)
+            try:
+                exported = json_store.export_data()
+            finally:
+                json_store.close()
+            
+            with self._lock:
+                with self._conn:
+                    for task_data in exported['tasks'].values():
+                        task = Task(**task_data)
+                        dumped = task.model_dump(mode="json", exclude={'history'})
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO tasks (id, project, status, updated_at, version, data) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (task.id, task.project, task.status.value, dumped['updated_at'],
+                             task_data.get('_version', 0), json.dumps(dumped, ensure_ascii=False))
+                        )
+                        self._conn.execute("DELETE FROM task_events WHERE task_id = ?", (task.id,))
+                        self._insert_events(
+                            task.id, [event.model_dump(mode="json") for event in task.history], base=0
+                        )
+                    for project_data in exported['projects'].values():
+                        project = ProjectConfig(**project_data)
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO projects (name, data) VALUES (?, ?)",
+                            (project.name, json.dumps(project.model_dump(mode="json"), ensure_ascii=False))
+                        )
+                    for session_data in exported['sessions'].values():
+                        session = UserSession(**session_data)
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO sessions (user_id, data) VALUES (?, ?)",
+                            (session.user_id, json.dumps(session.model_dump(mode="json"), ensure_ascii=False))
+                        )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                        (datetime.now().isoformat(),)
+                    )
+            
+            logger.info(f"Dados migrados de {data_dir} para {self.db_path}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Erro ao migrar dados de {data_dir}: {e}")
+            return False
+
+if __name__ == "__main__":
+    # Migração manual: python -m app.models.sqlite_store
+    from ..config import config
+    
+    store = SQLiteStateStore(config.SQLITE_PATH)
+    if store.migrate_from_json(config.DATA_DIR):
+        print(f"✅ Migração concluída: {config.SQLITE_PATH}")
+    else:
+        print("❌ Falha na migração")
@@ -1,42 +1,196 @@
+import atexit
 import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import structlog
 
-from .schemas import Task, ProjectConfig, UserSession
+try:
+    import fcntl
+except ImportError:
+    # Windows: sem lock entre processos
+    fcntl = None
+
+from ..config import config
+from .artifact_store import artifact_store
+from .schemas import Task, TaskEvent, ProjectConfig, UserSession
 
 logger = structlog.get_logger()
 
+# Tentativas otimistas antes de fazer o read-modify-write inteiro sob o lock
+OPTIMISTIC_RETRIES = 3
+
+# Campos do lease da fila, preservados em gravações sem ``expected_version``
+LEASE_FIELDS = ('lease_owner', 'lease_expires_at')
+
 class JSONStateStore:
-    """Store de estado usando JSON para persistência"""
+    """Store de estado usando JSON para persistência
+    
+    Tasks usam um log append-only (``tasks.log``, um registro JSON por linha)
+    sobre um snapshot (``tasks.json``). Um índice em memória é reconstruído na
+    inicialização e o log é compactado periodicamente no snapshot, de modo que
+    o custo de salvar uma task não depende do total de tasks armazenadas.
+    
+    Mutações dentro de ``transaction()`` (ou dentro da janela
+    ``coalesce_ms``) são aplicadas em memória e gravadas em disco numa única
+    escrita durável, via ``flush()``. A exceção são gravações com
+    ``expected_version``, que vão direto para o disco. No flush, uma task
+    gravada por outro processo durante o agrupamento é mesclada campo a
+    campo (ver ``_pending_task_record``) em vez de sobrescrita.
+    
+    Vários processos podem compartilhar o mesmo diretório: escritas são
+    serializadas por ``fcntl.flock`` em ``.state.lock``, arquivos JSON são
+    substituídos atomicamente (arquivo temporário + rename) e cada task
+    carrega uma versão usada em checagens otimistas (``expected_version``).
     
-    def __init__(self, data_dir: Path = Path("data")):
+    O histórico de cada task fica separado do registro principal: cada
+    ``save_task`` anexa apenas os eventos novos, e ``get_task`` só monta o
+    histórico quando ``include_history=True``.
+    """
+    
+    def __init__(self, data_dir: Path = Path("data"),
+                 compact_threshold: Optional[int] = None,
+                 compact_interval: Optional[float] = None,
+                 coalesce_ms: Optional[int] = None,
+                 fsync_policy: Optional[str] = None):
         self.data_dir = data_dir
         self.data_dir.mkdir(exist_ok=True)
         
         # Arquivos de dados
         self.tasks_file = self.data_dir / "tasks.json"
+        self.tasks_log_file = self.data_dir / "tasks.log"
         self.projects_file = self.data_dir / "projects.json"
         self.sessions_file = self.data_dir / "sessions.json"
+        self.lock_file = self.data_dir / ".state.lock"
+        
+        # Lock entre threads (RLock) e entre processos (flock)
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd: Optional[int] = None
+        self.fsync_policy = fsync_policy or config.STATE_FSYNC
+        if self.fsync_policy not in ("always", "batch", "never"):
+            raise ValueError(f"Política de fsync inválida: {self.fsync_policy}")
+        
+        # Cache de leitura dos arquivos JSON, invalidado por inode/mtime/tamanho
+        self._cache_lock = threading.Lock()
+        self._json_cache: Dict[Path, Tuple[Optional[Tuple[int, int, int]], Dict[str, Any]]] = {}
+        
+        # Índice em memória das tasks (snapshot + log) e histórico separado
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._history: Dict[str, List[Dict[str, Any]]] = {}
+        self._log_entries = 0
+        self._log_offset = 0
+        self._log_inode: Optional[int] = None
+        self._snapshot_signature: Optional[Tuple[int, int, int]] = None
+        self.compact_threshold = (
+            compact_threshold if compact_threshold is not None
+            else config.STATE_LOG_COMPACT_THRESHOLD
+        )
+        self.compact_interval = (
+            compact_interval if compact_interval is not None
+            else config.STATE_LOG_COMPACT_INTERVAL
+        )
+        
+        # Escritas pendentes (group commit)
+        self.coalesce_window = (
+            coalesce_ms if coalesce_ms is not None else config.STATE_WRITE_COALESCE_MS
+        ) / 1000
+        self._local = threading.local()
+        # Mutações de tasks ainda não gravadas, mantidas fora do índice (que reflete o disco)
+        self._pending_tasks: Dict[str, Dict[str, Any]] = {}
+        self._pending_events: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending_origin: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._pending_files: Dict[Path, Tuple[List[Callable[[Dict[str, Any]], None]], Dict[str, Any]]] = {}
+        self._flush_timer: Optional[threading.Timer] = None
         
         # Inicializar arquivos se não existirem
         self._init_files()
+        self._load_tasks_index()
+        
+        # Compactação periódica em background
+        self._stop_event = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        if self.compact_interval > 0:
+            self._compactor = threading.Thread(
+                target=self._compaction_loop, name="state-store-compactor", daemon=True
+            )
+            self._compactor.start()
     
     def _init_files(self):
         """Inicializa arquivos JSON se não existirem"""
-        if not self.tasks_file.exists():
-            self._save_json(self.tasks_file, {})
-        
-        if not self.projects_file.exists():
-            self._save_json(self.projects_file, {})
+        with self._locked():
+            if not self.tasks_file.exists():
+                self._write_json_file(self.tasks_file, {})
+            
+            if not self.projects_file.exists():
+                self._write_json_file(self.projects_file, {})
+            
+            if not self.sessions_file.exists():
+                self._write_json_file(self.sessions_file, {})
+    
+    # Concorrência e durabilidade
+    @contextmanager
+    def _locked(self):
+        """Lock exclusivo entre threads e entre processos (reentrante)"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                if self._lock_fd is None:
+                    self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+    
+    def _should_fsync(self, durable: bool) -> bool:
+        """Aplica a política de fsync (always | batch | never)"""
+        if self.fsync_policy == "always":
+            return True
+        return durable and self.fsync_policy == "batch"
+    
+    def _fsync_dir(self):
+        """Garante que o rename de um arquivo esteja persistido no diretório"""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        dir_fd = os.open(self.data_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    
+    @staticmethod
+    def _file_signature(file_path: Path) -> Optional[Tuple[int, int, int]]:
+        """Assinatura (inode, mtime, tamanho) usada para invalidar caches"""
+        try:
+            st = os.stat(file_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+    
+    def _read_json_cached(self, file_path: Path, include_pending: bool = True) -> Dict[str, Any]:
+        """Retorna os dados de um arquivo JSON via cache (não modificar o retorno)"""
+        signature = self._file_signature(file_path)
+        with self._cache_lock:
+            if include_pending and file_path in self._pending_files:
+                return self._pending_files[file_path][1]
+            cached = self._json_cache.get(file_path)
+            if cached and signature is not None and cached[0] == signature:
+                return cached[1]
         
-        if not self.sessions_file.exists():
-            self._save_json(self.sessions_file, {})
+        data = self._read_json_file(file_path)
+        with self._cache_lock:
+            self._json_cache[file_path] = (signature, data)
+        return data
     
-    def _load_json(self, file_path: Path) -> Dict[str, Any]:
-        """Carrega dados de um arquivo JSON"""
+    def _read_json_file(self, file_path: Path) -> Dict[str, Any]:
+        """Lê e faz parse de um arquivo JSON"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -44,63 +198,535 @@ class JSONStateStore:
             logger.warning(f"Arquivo {file_path} não encontrado ou inválido, criando novo")
             return {}
     
-    def _save_json(self, file_path: Path, data: Dict[str, Any]):
-        """Salva dados em um arquivo JSON"""
+    def _load_json(self, file_path: Path) -> Dict[str, Any]:
+        """Carrega dados de um arquivo JSON (cópia que pode ser modificada)"""
+        return dict(self._read_json_cached(file_path))
+    
+    def _update_json(self, file_path: Path, mutator: Callable[[Dict[str, Any]], None]):
+        """Aplica uma mutação a um arquivo JSON (adiada se as escritas estão agrupadas)"""
+        if self._coalescing():
+            with self._lock:
+                with self._cache_lock:
+                    pending = self._pending_files.get(file_path)
+                if pending is None:
+                    pending = ([], dict(self._read_json_cached(file_path)))
+                mutator(pending[1])
+                pending[0].append(mutator)
+                with self._cache_lock:
+                    self._pending_files[file_path] = pending
+            self._schedule_flush()
+            return
+        self._commit_json(file_path, [mutator])
+    
+    def _commit_json(self, file_path: Path, mutators: List[Callable[[Dict[str, Any]], None]],
+                     durable: bool = False):
+        """Read-modify-write otimista de um arquivo JSON
+        
+        As mutações são aplicadas sobre a versão lida sem lock; a gravação só
+        acontece se o arquivo não mudou desde a leitura. Em caso de conflito
+        com outro processo, tenta de novo e, por fim, faz tudo sob o lock.
+        """
+        for _ in range(OPTIMISTIC_RETRIES):
+            signature = self._file_signature(file_path)
+            data = dict(self._read_json_cached(file_path, include_pending=False))
+            for mutator in mutators:
+                mutator(data)
+            with self._locked():
+                if self._file_signature(file_path) == signature:
+                    self._write_json_file(file_path, data, durable)
+                    return
+            logger.info(f"Conflito de escrita em {file_path}, tentando novamente")
+        
+        with self._locked():
+            data = dict(self._read_json_cached(file_path, include_pending=False))
+            for mutator in mutators:
+                mutator(data)
+            self._write_json_file(file_path, data, durable)
+    
+    def _write_json_file(self, file_path: Path, data: Dict[str, Any], durable: bool = False):
+        """Grava dados em um arquivo JSON de forma atômica (temporário + rename)"""
+        fsync = self._should_fsync(durable)
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+            if fsync:
+                self._fsync_dir()
+            with self._cache_lock:
+                self._json_cache[file_path] = (self._file_signature(file_path), data)
         except Exception as e:
+            Path(tmp_path).unlink(missing_ok=True)
+            with self._cache_lock:
+                self._json_cache.pop(file_path, None)
             logger.error(f"Erro ao salvar {file_path}: {e}")
             raise
     
+    # Log append-only de tasks
+    def _load_tasks_index(self):
+        """Reconstrói o índice em memória a partir do snapshot e do log"""
+        with self._lock:
+            self._snapshot_signature = self._file_signature(self.tasks_file)
+            self._tasks = self._read_json_file(self.tasks_file)
+            self._history = {
+                task_id: task_data.pop('history', []) for task_id, task_data in self._tasks.items()
+            }
+            self._log_entries = 0
+            self._log_offset = 0
+            log_signature = self._file_signature(self.tasks_log_file)
+            self._log_inode = log_signature[0] if log_signature else None
+            
+            if self._replay_log():
+                # Pode ser uma escrita em andamento de outro processo: espera o lock
+                with self._locked():
+                    if self._replay_log():
+                        # Isola a linha incompleta para não corromper o próximo registro
+                        with open(self.tasks_log_file, 'a', encoding='utf-8') as f:
+                            f.write("\n")
+                        self._log_offset = self.tasks_log_file.stat().st_size
+    
+    def _replay_log(self) -> bool:
+        """Aplica os registros completos a partir do último offset lido
+        
+        Retorna True se o log termina em uma linha incompleta.
+        """
+        if not self.tasks_log_file.exists():
+            return False
+        
+        with open(self.tasks_log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            chunk = f.read()
+        
+        complete, separator, tail = chunk.rpartition(b"\n")
+        if separator:
+            for line in complete.split(b"\n"):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Linha incompleta (ex.: queda no meio de uma escrita)
+                    logger.warning(f"Registro inválido ignorado em {self.tasks_log_file}")
+                    continue
+                self._apply_task_record(record)
+                self._log_entries += 1
+            self._log_offset += len(complete) + 1
+        
+        return bool(tail)
+    
+    def _refresh_tasks_index(self):
+        """Revalida o índice se os arquivos de tasks mudaram em disco"""
+        with self._lock:
+            log_signature = self._file_signature(self.tasks_log_file)
+            log_inode = log_signature[0] if log_signature else None
+            log_size = log_signature[2] if log_signature else 0
+            
+            if (self._file_signature(self.tasks_file) != self._snapshot_signature
+                    or log_inode != self._log_inode
+                    or log_size < self._log_offset):
+                # Snapshot reescrito ou log compactado por outro processo
+                self._load_tasks_index()
+            elif log_size > self._log_offset:
+                self._replay_log()
+    
+    def _apply_task_record(self, record: Dict[str, Any]):
+        """Aplica um registro do log ao índice em memória"""
+        op = record.get('op')
+        task_id = record.get('id')
+        version = record.get('v')
+        current = self._tasks.get(task_id)
+        
+        # Registros mais antigos que o índice (ex.: snapshot novo + log antigo)
+        if version is not None and current is not None and version < current.get('_version', 0):
+            return
+        
+        if op == 'put':
+            task_data = dict(record['task'])
+            if 'history' in task_data:
+                # Registro no formato antigo, com histórico completo embutido
+                self._history[task_id] = task_data.pop('history')
+            self._tasks[task_id] = {**task_data, '_version': version or 0}
+            
+            history = self._history.setdefault(task_id, [])
+            if record.get('events'):
+                # Atribuição por posição: reaplicar o mesmo registro é idempotente
+                base = record['base']
+                history[base:base + len(record['events'])] = record['events']
+        elif op == 'status' and current is not None:
+            current['status'] = record['status']
+            current['updated_at'] = record['updated_at']
+            current['_version'] = version or current.get('_version', 0)
+    
+    def _append_task_record(self, record: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Anexa um registro ao log e aplica no índice
+        
+        Retorna False se ``expected_version`` não confere com a versão atual.
+        Gravações com ``expected_version`` nunca ficam só no buffer de
+        agrupamento: a checagem e a escrita acontecem sob o ``flock``, para
+        que a versão valha também entre processos.
+        """
+        with self._lock:
+            coalescing = self._coalescing() and expected_version is None
+            with (self._lock if coalescing else self._locked()):
+                if not coalescing and self._pending_tasks:
+                    # Mantém a ordem no log: o que está no buffer vai antes deste registro
+                    self.flush()
+                self._refresh_tasks_index()
+                current = self._task_view(record['id'])
+                current_version = current.get('_version', 0) if current is not None else 0
+                if expected_version is not None and current_version != expected_version:
+                    logger.warning(
+                        f"Conflito de versão na task {record['id']}: "
+                        f"esperada {expected_version}, atual {current_version}"
+                    )
+                    return False
+                
+                if expected_version is None and record.get('op') == 'put' and current is not None:
+                    # Lease só muda via CAS (claim/renew/release): preserva o atual
+                    for field in LEASE_FIELDS:
+                        record['task'][field] = current.get(field)
+                
+                record['v'] = current_version + 1
+                if record.get('events'):
+                    record['base'] = len(self._history.get(record['id'], []))
+                line = json.dumps(record, ensure_ascii=False, default=str)
+                if coalescing:
+                    # Fica no buffer (leituras deste processo já veem a mudança) até o flush
+                    self._buffer_task_record(json.loads(line), current)
+                else:
+                    self._write_log_lines([line])
+        
+        if coalescing:
+            self._schedule_flush()
+        return True
+    
+    def _buffer_task_record(self, record: Dict[str, Any], current: Optional[Dict[str, Any]]):
+        """Aplica um registro às mutações pendentes em vez do índice"""
+        task_id = record['id']
+        if task_id not in self._pending_tasks:
+            # Base do merge no flush: a task como estava em disco antes do agrupamento
+            stored = self._tasks.get(task_id)
+            self._pending_origin[task_id] = dict(stored) if stored is not None else None
+        if record['op'] == 'put':
+            task_data = dict(record['task'])
+        else:
+            task_data = dict(current or {})
+            task_data['status'] = record['status']
+            task_data['updated_at'] = record['updated_at']
+        task_data['_version'] = record['v']
+        self._pending_tasks[task_id] = task_data
+        if record.get('events'):
+            self._pending_events.setdefault(task_id, []).extend(record['events'])
+    
+    def _pending_task_record(self, task_id: str) -> Dict[str, Any]:
+        """Registro ``put`` de uma task pendente, versionado sobre o que está em disco agora
+        
+        Chamar sob ``_locked`` e depois de ``_refresh_tasks_index``. Se outro
+        processo gravou a task desde o início do agrupamento, é feito um
+        merge de três vias: campos alterados só por ele são mantidos, os
+        alterados aqui prevalecem, e a versão passa das duas (uma checagem
+        com a versão lida antes do merge falha). Os eventos vão para o fim
+        do histórico atual.
+        """
+        pending = self._pending_tasks[task_id]
+        stored = self._tasks.get(task_id)
+        stored_version = stored.get('_version', 0) if stored is not None else 0
+        origin = self._pending_origin.get(task_id)
+        version = max(stored_version + 1, pending.get('_version', 0))
+        
+        task_data = {k: v for k, v in pending.items() if k != '_version'}
+        if stored is not None and origin is not None and stored_version != origin.get('_version', 0):
+            changed = {k: v for k, v in task_data.items() if origin.get(k) != v}
+            overlapping = sorted(
+                k for k, v in changed.items()
+                if k != 'updated_at' and stored.get(k) not in (origin.get(k), v)
+            )
+            logger.warning(
+                f"Task {task_id} gravada por outro processo durante o agrupamento "
+                f"(versão {origin.get('_version', 0)} -> {stored_version}); mesclando"
+                + (f", prevalecem os valores locais de {', '.join(overlapping)}" if overlapping else "")
+            )
+            task_data = {**{k: v for k, v in stored.items() if k != '_version'}, **changed}
+            version = max(stored_version, pending.get('_version', 0)) + 1
+        if stored is not None:
+            # Lease só muda via CAS (claim/renew/release): vale o do disco
+            for field in LEASE_FIELDS:
+                task_data[field] = stored.get(field)
+        
+        record = {
+            'op': 'put',
+            'id': task_id,
+            'v': version,
+            'task': task_data
+        }
+        if self._pending_events.get(task_id):
+            record['base'] = len(self._history.get(task_id, []))
+            record['events'] = self._pending_events[task_id]
+        return record
+    
+    def _write_log_lines(self, lines: List[str], durable: bool = False):
+        """Grava linhas no fim do log e atualiza o índice (chamar sob ``_locked``)"""
+        with open(self.tasks_log_file, 'a', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in lines))
+            if self._should_fsync(durable):
+                f.flush()
+                os.fsync(f.fileno())
+        if self._log_inode is None:
+            self._log_inode = self._file_signature(self.tasks_log_file)[0]
+        self._replay_log()
+    
+    # Agrupamento de escritas (group commit)
+    def _coalescing(self) -> bool:
+        """Indica se as escritas devem ser adiadas para o próximo flush"""
+        return getattr(self._local, 'depth', 0) > 0 or self.coalesce_window > 0
+    
+    def _schedule_flush(self):
+        """Agenda um flush ao fim da janela de agrupamento"""
+        if self.coalesce_window <= 0:
+            return
+        with self._lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.coalesce_window, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    @contextmanager
+    def transaction(self):
+        """Agrupa as mutações do bloco em uma única escrita durável"""
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            yield self
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self.flush()
+    
+    def flush(self) -> bool:
+        """Grava em disco todas as mutações pendentes"""
+        with self._locked():
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            
+            try:
+                if self._pending_tasks:
+                    self._refresh_tasks_index()
+                    lines = [
+                        json.dumps(self._pending_task_record(task_id), ensure_ascii=False, default=str)
+                        for task_id in self._pending_tasks
+                    ]
+                    self._write_log_lines(lines, durable=True)
+                    self._pending_tasks = {}
+                    self._pending_events = {}
+                    self._pending_origin = {}
+                
+                with self._cache_lock:
+                    pending_files = dict(self._pending_files)
+                for file_path, (mutators, _) in pending_files.items():
+                    self._commit_json(file_path, mutators, durable=True)
+                    with self._cache_lock:
+                        if self._pending_files.get(file_path) is pending_files[file_path]:
+                            del self._pending_files[file_path]
+                return True
+            
+            except Exception as e:
+                logger.error(f"Erro ao gravar escritas pendentes: {e}")
+                return False
+    
+    def compact(self) -> bool:
+        """Compacta o log de tasks em um novo snapshot"""
+        try:
+            with self._locked():
+                self._refresh_tasks_index()
+                if self._log_entries == 0:
+                    return True
+                # Snapshot primeiro: reaplicar o log sobre ele é idempotente
+                self._write_json_file(self.tasks_file, self._snapshot_tasks(), durable=True)
+                with open(self.tasks_log_file, 'w', encoding='utf-8'):
+                    pass
+                with self._cache_lock:
+                    # O snapshot é lido pelo índice, não pelo cache de arquivos
+                    self._json_cache.pop(self.tasks_file, None)
+                logger.info(f"Log de tasks compactado ({self._log_entries} registros)")
+                self._snapshot_signature = self._file_signature(self.tasks_file)
+                self._log_entries = 0
+                self._log_offset = 0
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao compactar log de tasks: {e}")
+            return False
+    
+    def _snapshot_tasks(self) -> Dict[str, Dict[str, Any]]:
+        """Tasks com o histórico embutido, no formato do snapshot"""
+        return {
+            task_id: {**task_data, 'history': self._history.get(task_id, [])}
+            for task_id, task_data in self._tasks.items()
+        }
+    
+    def _compaction_loop(self):
+        """Compacta o log periodicamente quando ultrapassa o limite"""
+        while not self._stop_event.wait(self.compact_interval):
+            if self._log_entries >= self.compact_threshold:
+                self.compact()
+    
+    def close(self):
+        """Grava escritas pendentes, encerra a compactação e compacta o log"""
+        self.flush()
+        self._stop_event.set()
+        if self._compactor and self._compactor.is_alive():
+            self._compactor.join(timeout=5)
+        self.compact()
+        with self._lock:
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+    
+    def export_data(self) -> Dict[str, Dict[str, Any]]:
+        """Exporta todos os dados brutos (usado na migração para SQLite)"""
+        with self._lock:
+            self._refresh_tasks_index()
+            tasks = self._snapshot_tasks()
+        return {
+            'tasks': tasks,
+            'projects': self._load_json(self.projects_file),
+            'sessions': self._load_json(self.sessions_file)
+        }
+    
     # Métodos para Tasks
-    def save_task(self, task: Task) -> bool:
-        """Salva uma task"""
+    def save_task(self, task: Task, expected_version: Optional[int] = None) -> bool:
+        """Salva uma task
+        
+        Apenas os eventos ainda não persistidos são anexados ao histórico;
+        mensagens grandes vão para o artifact store. Com ``expected_version``,
+        só grava se a versão atual da task for essa (0 para uma task nova).
+        Sem ele, o lease gravado (``lease_owner``/``lease_expires_at``) é
+        mantido, para não desfazer uma renovação feita pela fila.
+        """
         try:
-            tasks = self._load_json(self.tasks_file)
-            tasks[task.id] = task.model_dump()
-            self._save_json(self.tasks_file, tasks)
+            new_events = [
+                artifact_store.offload_event(event).model_dump()
+                for event in task.history[task._persisted_events:]
+            ]
+            record = {'op': 'put', 'id': task.id, 'task': task.model_dump(exclude={'history'})}
+            if new_events:
+                record['events'] = new_events
+            
+            if not self._append_task_record(record, expected_version):
+                return False
+            task._persisted_events = len(task.history)
             logger.info(f"Task {task.id} salva com sucesso")
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar task {task.id}: {e}")
             return False
     
-    def get_task(self, task_id: str) -> Optional[Task]:
-        """Recupera uma task por ID"""
+    def _build_task(self, task_data: Dict[str, Any], history: List[Dict[str, Any]]) -> Task:
+        """Monta uma Task a partir do índice"""
+        task = Task(**task_data, history=history)
+        task._persisted_events = len(history)
+        return task
+    
+    def _task_view(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Dados da task vistos por este processo (mutações pendentes sobre o disco)"""
+        return self._pending_tasks.get(task_id, self._tasks.get(task_id))
+    
+    def _task_views(self) -> Dict[str, Dict[str, Any]]:
+        """Todas as tasks vistas por este processo"""
+        if not self._pending_tasks:
+            return self._tasks
+        return {**self._tasks, **self._pending_tasks}
+    
+    def _history_view(self, task_id: str) -> List[Dict[str, Any]]:
+        """Histórico salvo da task seguido dos eventos pendentes"""
+        return self._history.get(task_id, []) + self._pending_events.get(task_id, [])
+    
+    def get_task(self, task_id: str, include_history: bool = True) -> Optional[Task]:
+        """Recupera uma task por ID
+        
+        Com ``include_history=False`` o histórico não é carregado; eventos
+        adicionados depois continuam sendo anexados ao histórico salvo.
+        """
         try:
-            tasks = self._load_json(self.tasks_file)
-            if task_id in tasks:
-                return Task(**tasks[task_id])
+            with self._lock:
+                self._refresh_tasks_index()
+                task_data = self._task_view(task_id)
+                history = self._history_view(task_id) if include_history else []
+            if task_data is not None:
+                return self._build_task(task_data, history)
             return None
         except Exception as e:
             logger.error(f"Erro ao carregar task {task_id}: {e}")
             return None
     
-    def get_tasks_by_project(self, project: str) -> List[Task]:
+    def get_task_history(self, task_id: str, limit: Optional[int] = None) -> List[TaskEvent]:
+        """Recupera o histórico de uma task (os ``limit`` eventos mais recentes)"""
+        try:
+            with self._lock:
+                self._refresh_tasks_index()
+                history = self._history_view(task_id)
+                events = history[-limit:] if limit else history
+            return [TaskEvent(**event) for event in events]
+        except Exception as e:
+            logger.error(f"Erro ao carregar histórico da task {task_id}: {e}")
+            return []
+    
+    def get_task_version(self, task_id: str) -> Optional[int]:
+        """Retorna a versão atual de uma task (None se não existe)"""
+        with self._lock:
+            self._refresh_tasks_index()
+            task_data = self._task_view(task_id)
+            return task_data.get('_version', 0) if task_data is not None else None
+    
+    def get_tasks_by_project(self, project: str, include_history: bool = True) -> List[Task]:
         """Recupera todas as tasks de um projeto"""
         try:
-            tasks = self._load_json(self.tasks_file)
-            project_tasks = []
-            for task_data in tasks.values():
-                if task_data.get('project') == project:
-                    project_tasks.append(Task(**task_data))
-            return project_tasks
+            with self._lock:
+                self._refresh_tasks_index()
+                tasks = [
+                    (task_data, self._history_view(task_id) if include_history else [])
+                    for task_id, task_data in self._task_views().items()
+                    if task_data.get('project') == project
+                ]
+            return [self._build_task(task_data, history) for task_data, history in tasks]
         except Exception as e:
             logger.error(f"Erro ao carregar tasks do projeto {project}: {e}")
             return []
     
+    def get_tasks_by_status(self, status: str, include_history: bool = False) -> List[Task]:
+        """Recupera todas as tasks com um status"""
+        try:
+            status = getattr(status, 'value', status)
+            with self._lock:
+                self._refresh_tasks_index()
+                tasks = [
+                    (task_data, self._history_view(task_id) if include_history else [])
+                    for task_id, task_data in self._task_views().items()
+                    if task_data.get('status') == status
+                ]
+            return [self._build_task(task_data, history) for task_data, history in tasks]
+        except Exception as e:
+            logger.error(f"Erro ao carregar tasks com status {status}: {e}")
+            return []
+    
     def update_task_status(self, task_id: str, status: str) -> bool:
         """Atualiza o status de uma task"""
         try:
-            tasks = self._load_json(self.tasks_file)
-            if task_id in tasks:
-                tasks[task_id]['status'] = status
-                tasks[task_id]['updated_at'] = datetime.now().isoformat()
-                self._save_json(self.tasks_file, tasks)
-                logger.info(f"Status da task {task_id} atualizado para {status}")
-                return True
-            return False
+            with self._lock:
+                self._refresh_tasks_index()
+                if self._task_view(task_id) is None:
+                    return False
+                self._append_task_record({
+                    'op': 'status',
+                    'id': task_id,
+                    'status': status,
+                    'updated_at': datetime.now().isoformat()
+                })
+            logger.info(f"Status da task {task_id} atualizado para {status}")
+            return True
         except Exception as e:
             logger.error(f"Erro ao atualizar status da task {task_id}: {e}")
             return False
@@ -109,9 +735,12 @@ class JSONStateStore:
     def save_project(self, project: ProjectConfig) -> bool:
         """Salva uma configuração de projeto"""
         try:
-            projects = self._load_json(self.projects_file)
-            projects[project.name] = project.model_dump()
-            self._save_json(self.projects_file, projects)
+            project_data = project.model_dump()
+            
+            def mutate(projects: Dict[str, Any]):
+                projects[project.name] = project_data
+            
+            self._update_json(self.projects_file, mutate)
             logger.info(f"Projeto {project.name} salvo com sucesso")
             return True
         except Exception as e:
@@ -121,7 +750,7 @@ class JSONStateStore:
     def get_project(self, project_name: str) -> Optional[ProjectConfig]:
         """Recupera uma configuração de projeto"""
         try:
-            projects = self._load_json(self.projects_file)
+            projects = self._read_json_cached(self.projects_file)
             if project_name in projects:
                 return ProjectConfig(**projects[project_name])
             return None
@@ -132,7 +761,7 @@ class JSONStateStore:
     def list_projects(self) -> List[str]:
         """Lista todos os projetos"""
         try:
-            projects = self._load_json(self.projects_file)
+            projects = self._read_json_cached(self.projects_file)
             return list(projects.keys())
         except Exception as e:
             logger.error(f"Erro ao listar projetos: {e}")
@@ -142,9 +771,12 @@ class JSONStateStore:
     def save_session(self, session: UserSession) -> bool:
         """Salva uma sessão de usuário"""
         try:
-            sessions = self._load_json(self.sessions_file)
-            sessions[str(session.user_id)] = session.model_dump()
-            self._save_json(self.sessions_file, sessions)
+            session_data = session.model_dump()
+            
+            def mutate(sessions: Dict[str, Any]):
+                sessions[str(session.user_id)] = session_data
+            
+            self._update_json(self.sessions_file, mutate)
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar sessão do usuário {session.user_id}: {e}")
@@ -153,7 +785,7 @@ class JSONStateStore:
     def get_session(self, user_id: int) -> Optional[UserSession]:
         """Recupera uma sessão de usuário"""
         try:
-            sessions = self._load_json(self.sessions_file)
+            sessions = self._read_json_cached(self.sessions_file)
             if str(user_id) in sessions:
                 return UserSession(**sessions[str(user_id)])
             return None
@@ -164,23 +796,39 @@ class JSONStateStore:
     def update_session_project(self, user_id: int, project_name: str) -> bool:
         """Atualiza o projeto atual de uma sessão"""
         try:
-            sessions = self._load_json(self.sessions_file)
             user_key = str(user_id)
             
-            if user_key in sessions:
-                sessions[user_key]['current_project'] = project_name
-                sessions[user_key]['last_activity'] = datetime.now().isoformat()
-            else:
-                sessions[user_key] = UserSession(
-                    user_id=user_id,
-                    current_project=project_name
-                ).model_dump()
+            def mutate(sessions: Dict[str, Any]):
+                if user_key in sessions:
+                    sessions[user_key] = {
+                        **sessions[user_key],
+                        'current_project': project_name,
+                        'last_activity': datetime.now().isoformat()
+                    }
+                else:
+                    sessions[user_key] = UserSession(
+                        user_id=user_id,
+                        current_project=project_name
+                    ).model_dump()
             
-            self._save_json(self.sessions_file, sessions)
+            self._update_json(self.sessions_file, mutate)
             return True
         except Exception as e:
             logger.error(f"Erro ao atualizar projeto da sessão do usuário {user_id}: {e}")
             return False
 
+def create_state_store():
+    """Cria o store de estado conforme ``config.STATE_BACKEND``"""
+    if config.STATE_BACKEND == "sqlite":
+        from .sqlite_store import SQLiteStateStore
+        store = SQLiteStateStore(config.SQLITE_PATH)
+        store.migrate_from_json(config.DATA_DIR)
+    else:
+        store = JSONStateStore(config.DATA_DIR)
+    
+    # Garante que escritas agrupadas sejam gravadas no encerramento
+    atexit.register(store.close)
+    return store
+
 # Instância global
-state_store = JSONStateStore()
+state_store = create_state_store()
@@ -6,6 +6,7 @@ import git
 import structlog
 
 from ..config import config
+from .repo_map_service import repo_map_service
 
 logger = structlog.get_logger(__name__)
 
@@ -30,28 +31,6 @@ class SimpleGitHubService:
         
         raise ValueError(f"Não foi possível extrair nome do repositório de: {repo_url}")
     
-    def clone_or_pull(self, repo_url: str, name: str) -> Path:
-        """Clona ou atualiza um repositório"""
-        try:
-            workdir = config.WORKDIR_BASE / name
-            
-            if workdir.exists():
-                # Pull se já existe
-                repo = git.Repo(workdir)
-                origin = repo.remotes.origin
-                origin.pull()
-                logger.info(f"Repositório {name} atualizado via pull")
-            else:
-                # Clone se não existe
-                git.Repo.clone_from(repo_url, workdir)
-                logger.info(f"Repositório {name} clonado")
-            
-            return workdir
-            
-        except Exception as e:
-            logger.error(f"Erro ao clonar/pull repositório {name}: {e}")
-            raise
-    
     def create_branch(self, repo_path: Path, base_branch: str, new_branch: str) -> bool:
         """Cria uma nova branch"""
         try:
@@ -127,43 +106,13 @@ class SimpleGitHubService:
             logger.error(f"Erro ao criar PR: {e}")
             return None
     
-    def get_repo_map(self, repo_path: Path, max_files: int = 20, max_size_kb: int = 100) -> str:
-        """Gera mapa do repositório para o LLM"""
-        try:
-            repo_map = []
-            
-            for file_path in repo_path.rglob('*'):
-                if file_path.is_file():
-                    # Ignorar arquivos e diretórios específicos
-                    if any(part.startswith('.') for part in file_path.parts):
-                        continue
-                    
-                    if file_path.name in ['__pycache__', 'node_modules', '.git']:
-                        continue
-                    
-                    # Verificar tamanho
-                    if file_path.stat().st_size > max_size_kb * 1024:
-                        continue
-                    
-                    # Ler conteúdo do arquivo
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        relative_path = file_path.relative_to(repo_path)
-                        repo_map.append(f"=== {relative_path} ===\n{content}\n")
-                        
-                        if len(repo_map) >= max_files:
-                            break
-                            
-                    except (UnicodeDecodeError, PermissionError):
-                        continue
-            
-            return "\n".join(repo_map)
-            
-        except Exception as e:
-            logger.error(f"Erro ao gerar mapa do repositório: {e}")
-            return ""
+    def get_repo_map(self, repo_path: Path, max_files: int = 20, max_size_kb: int = 100,
+                     query: Optional[str] = None, index_key: Optional[str] = None,
+                     mode: Optional[str] = None) -> str:
+        """Gera mapa do repositório para o LLM (arquivos versionados, sem binários)"""
+        return repo_map_service.get_repo_map(
+            repo_path, max_files, max_size_kb, query=query, index_key=index_key, mode=mode
+        )
 
 # Instância global
 github_service = SimpleGitHubService()
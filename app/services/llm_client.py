@@ -0,0 +1,277 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+import structlog
+
+from ..config import config
+
+logger = structlog.get_logger(__name__)
+
+class LLMError(Exception):
+    """Erro em uma chamada à API do LLM (HTTP ou de transporte)"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Segundos do cabeçalho Retry-After (apenas o formato numérico)"""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+class LLMClient:
+    """Cliente assíncrono da API de chat completions (formato OpenAI) sobre ``httpx``
+    
+    Todas as requisições rodam em um event loop próprio, em uma thread de
+    background, compartilhando um pool de conexões keep-alive. Um semáforo
+    global e um por modelo limitam quantas chamadas ficam em voo ao mesmo
+    tempo. ``chat`` pode ser aguardado de qualquer event loop; código
+    síncrono usa ``run``.
+    """
+    
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 max_concurrency: Optional[int] = None,
+                 per_model_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = (base_url or config.OPENAI_BASE_URL).rstrip('/')
+        self.api_key = api_key if api_key is not None else config.OPENAI_API_KEY
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.per_model_concurrency = per_model_concurrency or config.LLM_MODEL_CONCURRENCY
+        self.timeout = timeout or config.LLM_TIMEOUT_SECONDS
+        self.transport = transport
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        
+        # Tokens consumidos por modelo (prompt/completion), segundo a API
+        self.usage: Dict[str, Dict[str, int]] = {}
+        
+        # Criados dentro do loop de background
+        self._http: Optional[httpx.AsyncClient] = None
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._model_semaphores: Dict[str, asyncio.Semaphore] = {}
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Inicia (uma vez) o event loop de background das requisições"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="llm-io", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+    
+    def _get_http(self) -> httpx.AsyncClient:
+        """Cliente HTTP compartilhado (pool de conexões keep-alive)"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=config.LLM_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                transport=self.transport
+            )
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+    
+    def _model_semaphore(self, model: str) -> asyncio.Semaphore:
+        """Semáforo de concorrência de um modelo"""
+        semaphore = self._model_semaphores.get(model)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_model_concurrency)
+            self._model_semaphores[model] = semaphore
+        return semaphore
+    
+    async def chat(self, model: str, messages: List[Dict[str, str]],
+                   temperature: float = 0.1, max_tokens: int = 1000,
+                   timeout: Optional[float] = None) -> str:
+        """Envia uma conversa e retorna o conteúdo da resposta"""
+        loop = self._ensure_loop()
+        coro = self._chat(model, messages, temperature, max_tokens, timeout)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    
+    async def chat_stream(self, model: str, messages: List[Dict[str, str]],
+                          on_delta: Callable[[str], Optional[bool]],
+                          temperature: float = 0.1, max_tokens: int = 1000,
+                          timeout: Optional[float] = None) -> str:
+        """Envia uma conversa com ``stream`` e entrega cada trecho a ``on_delta``
+        
+        ``on_delta`` roda no loop de background e deve ser rápido. Se retornar
+        True o stream é encerrado e o texto recebido até ali é retornado; se
+        levantar uma exceção a conexão é fechada e a exceção propagada, sem
+        pagar pelo resto da resposta.
+        """
+        loop = self._ensure_loop()
+        coro = self._chat_stream(model, messages, on_delta, temperature, max_tokens, timeout)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    
+    async def _chat_stream(self, model: str, messages: List[Dict[str, str]],
+                           on_delta: Callable[[str], Optional[bool]],
+                           temperature: float, max_tokens: int,
+                           timeout: Optional[float]) -> str:
+        """Requisição de chat em streaming (SSE) executada no loop de background"""
+        http = self._get_http()
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        
+        started = time.monotonic()
+        first_delta_at = None
+        usage = None
+        chunks = []
+        async with self._global_semaphore, self._model_semaphore(model):
+            try:
+                async with http.stream(
+                    "POST", "/chat/completions", json=payload,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                ) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode('utf-8', errors='replace')
+                        raise LLMError(
+                            f"LLM retornou HTTP {response.status_code}: {body[:300]}",
+                            status_code=response.status_code,
+                            retry_after=_parse_retry_after(response.headers.get("retry-after"))
+                        )
+                    
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        
+                        event = json.loads(data)
+                        usage = event.get("usage") or usage
+                        choices = event.get("choices") or [{}]
+                        delta = (choices[0].get("delta") or {}).get("content")
+                        if not delta:
+                            continue
+                        if first_delta_at is None:
+                            first_delta_at = time.monotonic()
+                        chunks.append(delta)
+                        if on_delta(delta):
+                            break
+            except httpx.HTTPError as e:
+                raise LLMError(f"Falha de comunicação com o LLM: {e!r}") from e
+        
+        content = "".join(chunks)
+        self._record_usage(model, usage)
+        if first_delta_at is not None:
+            logger.info(
+                f"LLM {model} (stream): primeiro trecho em {first_delta_at - started:.2f}s, "
+                f"{len(content)} caracteres em {time.monotonic() - started:.2f}s"
+            )
+        return content
+    
+    async def _chat(self, model: str, messages: List[Dict[str, str]],
+                    temperature: float, max_tokens: int,
+                    timeout: Optional[float]) -> str:
+        """Requisição de chat executada no loop de background"""
+        http = self._get_http()
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        async with self._global_semaphore, self._model_semaphore(model):
+            try:
+                response = await http.post(
+                    "/chat/completions", json=payload,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                )
+            except httpx.HTTPError as e:
+                raise LLMError(f"Falha de comunicação com o LLM: {e!r}") from e
+        
+        if response.status_code >= 400:
+            raise LLMError(
+                f"LLM retornou HTTP {response.status_code}: {response.text[:300]}",
+                status_code=response.status_code,
+                retry_after=_parse_retry_after(response.headers.get("retry-after"))
+            )
+        
+        data = response.json()
+        self._record_usage(model, data.get("usage"))
+        return data["choices"][0]["message"]["content"] or ""
+    
+    def _record_usage(self, model: str, usage: Optional[Dict[str, Any]]):
+        """Registra e acumula os tokens informados pela API para uma chamada"""
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        totals = self.usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        logger.info(
+            f"LLM {model}: {prompt_tokens or '?'} tokens de entrada, "
+            f"{completion_tokens or '?'} de saída"
+        )
+    
+    def submit(self, coro) -> Future:
+        """Agenda uma corrotina no loop de background"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+    
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        """Executa uma corrotina no loop de background e aguarda o resultado (código síncrono)"""
+        return self.submit(coro).result(timeout=timeout)
+    
+    async def _aclose(self):
+        """Fecha o cliente HTTP (no loop de background)"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    def close(self):
+        """Fecha as conexões e encerra o loop de background"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        
+        try:
+            asyncio.run_coroutine_threadsafe(self._aclose(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"Erro ao fechar cliente do LLM: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+        self._model_semaphores.clear()
+
+# Instância global
+llm_client = LLMClient()
@@ -0,0 +1,189 @@
+import asyncio
+import contextvars
+import math
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+import structlog
+
+from ..config import config
+from .llm_client import LLMError
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+# Códigos HTTP que indicam falha transitória do provedor
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Prazo (time.monotonic) das chamadas ao LLM da task em execução
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+class LLMDeadlineExceeded(LLMError):
+    """O prazo da task para chamadas ao LLM terminou"""
+
+@contextmanager
+def llm_deadline(seconds: Optional[float]):
+    """Define o prazo das chamadas ao LLM feitas dentro do bloco (None ou 0 = sem prazo)
+    
+    O prazo acompanha o contexto, inclusive em chamadas síncronas que
+    rodam no loop do ``LLMClient``. Prazos aninhados nunca estendem o
+    prazo externo.
+    """
+    current = _deadline.get()
+    deadline = time.monotonic() + seconds if seconds else None
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def deadline_exceeded() -> bool:
+    """Indica se o prazo atual (``llm_deadline``) já terminou"""
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+def is_retryable(error: BaseException) -> bool:
+    """Indica se vale repetir a chamada após o erro"""
+    if isinstance(error, LLMDeadlineExceeded):
+        return False
+    if isinstance(error, LLMError):
+        return error.status_code is None or error.status_code in RETRYABLE_STATUS
+    return False
+
+class LatencyTracker:
+    """Latências recentes de chamadas bem-sucedidas, por chave (``rota:modelo``)"""
+    
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+    
+    def record(self, key: str, seconds: float):
+        """Registra a latência de uma chamada"""
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+    
+    def count(self, key: str) -> int:
+        """Quantidade de amostras de uma chave"""
+        return len(self._samples.get(key, ()))
+    
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """Percentil das latências (None sem amostras)"""
+        samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(pct / 100 * len(samples)) - 1))
+        return samples[index]
+
+class ResilientCaller:
+    """Repetição com backoff e requisições hedged para chamadas ao LLM
+    
+    Erros transitórios (transporte, 429, 5xx) são repetidos com backoff
+    exponencial com jitter, respeitando ``Retry-After``. Com ``hedge`` uma
+    segunda requisição idêntica é disparada quando a primeira passa do p95
+    das latências observadas; vale a que terminar primeiro. Tudo respeita o
+    prazo definido por ``llm_deadline``.
+    """
+    
+    def __init__(self, max_retries: Optional[int] = None,
+                 base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None,
+                 hedge: Optional[bool] = None,
+                 hedge_min_samples: Optional[int] = None,
+                 latencies: Optional[LatencyTracker] = None,
+                 rng: Optional[random.Random] = None):
+        self.max_retries = max_retries if max_retries is not None else config.LLM_MAX_RETRIES
+        self.base_delay = base_delay if base_delay is not None else config.LLM_BACKOFF_BASE_SECONDS
+        self.max_delay = max_delay if max_delay is not None else config.LLM_BACKOFF_MAX_SECONDS
+        self.hedge = hedge if hedge is not None else config.LLM_HEDGE_ENABLED
+        self.hedge_min_samples = hedge_min_samples or config.LLM_HEDGE_MIN_SAMPLES
+        self.latencies = latencies or LatencyTracker()
+        self.rng = rng or random.Random()
+        self.hedges_started = 0
+        self.hedges_won = 0
+    
+    def backoff(self, attempt: int, error: LLMError) -> float:
+        """Espera antes da próxima tentativa (jitter completo ou ``Retry-After``)"""
+        if error.retry_after is not None:
+            return min(error.retry_after, self.max_delay)
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+    
+    def _remaining(self) -> Optional[float]:
+        """Segundos até o prazo atual (None sem prazo)"""
+        deadline = _deadline.get()
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+    
+    async def call(self, request: Callable[[], Awaitable[T]], key: str) -> T:
+        """Executa ``request`` com repetição, hedging e prazo"""
+        attempt = 0
+        while True:
+            remaining = self._remaining()
+            if remaining is not None and remaining <= 0:
+                raise LLMDeadlineExceeded("Prazo da task para chamadas ao LLM excedido")
+            
+            try:
+                if remaining is None:
+                    return await self._attempt(request, key)
+                return await asyncio.wait_for(self._attempt(request, key), remaining)
+            except asyncio.TimeoutError as e:
+                raise LLMDeadlineExceeded("Prazo da task para chamadas ao LLM excedido") from e
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                remaining = self._remaining()
+                if remaining is not None and delay >= remaining:
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"Chamada ao LLM falhou ({e}); tentativa {attempt}/{self.max_retries} em {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+    
+    async def _attempt(self, request: Callable[[], Awaitable[T]], key: str) -> T:
+        """Uma tentativa, com uma requisição hedged se a primeira demorar além do p95"""
+        threshold = None
+        if self.hedge and self.latencies.count(key) >= self.hedge_min_samples:
+            threshold = self.latencies.percentile(key, 95)
+        
+        started = time.monotonic()
+        if threshold is None:
+            result = await request()
+            self.latencies.record(key, time.monotonic() - started)
+            return result
+        
+        primary = asyncio.ensure_future(request())
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=threshold)
+            if done:
+                result = primary.result()
+                self.latencies.record(key, time.monotonic() - started)
+                return result
+            
+            self.hedges_started += 1
+            logger.info(f"LLM {key}: sem resposta em {threshold:.1f}s (p95), disparando requisição hedged")
+            hedged = asyncio.ensure_future(request())
+            pending = {primary, hedged}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedged:
+                            self.hedges_won += 1
+                        self.latencies.record(key, time.monotonic() - started)
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+# Instância global
+llm_resilience = ResilientCaller()
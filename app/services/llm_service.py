@@ -1,123 +1,323 @@
+import hashlib
 import json
 import re
-from typing import Dict, Any, Optional
-import openai
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 import structlog
 
 from ..config import config
+from ..utils.disk_cache import DiskCache
+from ..utils.stream_parsers import DiffStreamParser, JSONStreamParser, StreamAborted
+from ..utils.tokens import estimate_tokens
+from .llm_client import LLMClient, LLMError, llm_client
+from .llm_resilience import ResilientCaller, is_retryable, llm_resilience
+from .model_router import ROUTE_PATCH, ROUTE_REVIEW, ROUTE_SPEC, ModelRouter, model_router
+from .prompt_budget import PromptBudget, prompt_budget
 from ..utils.prompts import MANAGER_SPEC_PROMPT, PROGRAMMER_DIFF_PROMPT, REVIEW_PROMPT
 from ..models.schemas import LLMSpecification, ReviewResult
 
 logger = structlog.get_logger(__name__)
 
+T = TypeVar("T")
+
+class LLMResponseCache:
+    """Cache em disco das respostas do LLM
+    
+    A chave é o hash de (modelo, mensagens, temperatura, max_tokens). Só
+    entram respostas de chamadas com temperatura baixa, que para nosso uso
+    são determinísticas. Entradas mais velhas que ``ttl`` segundos são
+    ignoradas e o tamanho total é limitado pelo LRU do ``DiskCache``.
+    """
+    
+    def __init__(self, cache: DiskCache, ttl: float, max_temperature: float):
+        self.cache = cache
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+    
+    def key(self, model: str, messages: List[Dict[str, str]],
+            temperature: float, max_tokens: int) -> Optional[str]:
+        """Chave de uma chamada (None se a temperatura não permite cache)"""
+        if temperature > self.max_temperature:
+            return None
+        payload = json.dumps([model, messages, temperature, max_tokens], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _count(self, counter: str):
+        """Incrementa um contador"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def get(self, key: str) -> Optional[str]:
+        """Resposta guardada para a chave, se existir e não estiver expirada"""
+        raw = self.cache.get(key)
+        if raw is None:
+            self._count("misses")
+            return None
+        
+        entry = json.loads(raw)
+        if self.ttl and time.time() - entry["created_at"] > self.ttl:
+            self._count("expired")
+            self._count("misses")
+            return None
+        
+        self._count("hits")
+        return entry["content"]
+    
+    def put(self, key: str, content: str):
+        """Guarda uma resposta"""
+        self.cache.put(key, json.dumps({"created_at": time.time(), "content": content}))
+    
+    def stats(self) -> Dict[str, int]:
+        """Contadores de acertos e falhas"""
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired}
+
+def _extract_json(content: str) -> Dict[str, Any]:
+    """Extrai o objeto JSON de uma resposta do LLM"""
+    json_match = re.search(r'\{.*\}', content, re.DOTALL)
+    if not json_match:
+        raise ValueError("Resposta do LLM não contém JSON válido")
+    return json.loads(json_match.group())
+
+def _validate_diff(content: str) -> str:
+    """Confere se a resposta é um diff unificado"""
+    if not content.startswith('--- a/') and not content.startswith('diff --git'):
+        raise ValueError("Resposta não é um diff válido")
+    return content
+
 class LLMService:
-    """Serviço para interação com LLM via OpenAI"""
+    """Serviço para interação com LLM via OpenAI
     
-    def __init__(self):
-        openai.api_key = config.OPENAI_API_KEY
-        self.model = config.DEFAULT_MODEL
+    As chamadas são assíncronas (``*_async``) e compartilham o pool de
+    conexões do ``LLMClient``; os métodos síncronos de mesmo nome aguardam
+    o resultado no loop do cliente, para os agentes que rodam em threads.
     
-    def json_spec(self, user_input: str, project_config: Dict[str, Any]) -> LLMSpecification:
-        """Gera especificação técnica a partir da entrada do usuário"""
+    Com ``LLM_CACHE_ENABLED`` respostas válidas ficam no ``LLMResponseCache``;
+    ``use_cache=False`` força uma nova chamada (e atualiza o cache).
+    
+    Com ``streaming`` as respostas são validadas enquanto chegam: uma saída
+    que claramente não é diff/JSON é interrompida e pedida de novo, e o
+    stream de JSON termina assim que o objeto fecha.
+    
+    O modelo de cada chamada é escolhido pelo ``ModelRouter`` (por etapa,
+    complexidade e tentativa).
+    """
+    
+    def __init__(self, client: Optional[LLMClient] = None,
+                 cache: Optional[LLMResponseCache] = None,
+                 streaming: Optional[bool] = None,
+                 budget: Optional[PromptBudget] = None,
+                 resilience: Optional[ResilientCaller] = None,
+                 router: Optional[ModelRouter] = None):
+        self.client = client or llm_client
+        self.budget = budget or prompt_budget
+        self.resilience = resilience or llm_resilience
+        self.router = router or model_router
+        self.streaming = streaming if streaming is not None else config.LLM_STREAMING
+        if cache is None and config.LLM_CACHE_ENABLED:
+            cache = LLMResponseCache(
+                DiskCache(config.CACHE_DIR / "llm", config.LLM_CACHE_MAX_MB * 1024 * 1024),
+                ttl=config.LLM_CACHE_TTL_SECONDS,
+                max_temperature=config.LLM_CACHE_MAX_TEMPERATURE
+            )
+        self.cache = cache
+    
+    async def _complete(self, route: str, system: str, prompt: str, max_tokens: int,
+                        parse: Callable[[str], T], temperature: float = 0.1,
+                        use_cache: bool = True,
+                        stream_parser: Optional[Callable[[], Any]] = None,
+                        complexity: Optional[str] = None, attempt: int = 1) -> T:
+        """Envia o prompt ao modelo escolhido pelo roteador e interpreta a resposta com ``parse``
+        
+        ``stream_parser`` cria o validador incremental da resposta (``feed``
+        e ``close``); respostas do cache ou sem streaming também passam por
+        ele. Apenas respostas que passam por ``parse`` são guardadas no cache.
+        Respostas inválidas (``ValueError``) e erros transitórios (os mesmos
+        que o ``ResilientCaller`` repete) levam a uma nova tentativa com o
+        modelo mais forte; os demais erros são propagados.
+        """
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        model = self.router.choose(route, complexity, attempt)
         try:
-            prompt = MANAGER_SPEC_PROMPT.format(
-                user_input=user_input,
-                project_name=project_config.get('name', ''),
-                repo_url=project_config.get('repo_url', ''),
-                default_branch=project_config.get('default_branch', 'main'),
-                test_command=project_config.get('test_command', 'pytest -q')
+            return await self._complete_with(
+                model, route, messages, max_tokens, parse, temperature, use_cache, stream_parser
             )
-            
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Você é um gerente de projeto técnico experiente."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=1000
+        except (ValueError, LLMError) as e:
+            stronger = self.router.escalate(model)
+            if stronger is None or not (isinstance(e, ValueError) or is_retryable(e)):
+                raise
+            logger.warning(f"Rota {route}: {model} falhou ({e}), escalando para {stronger}")
+            return await self._complete_with(
+                stronger, route, messages, max_tokens, parse, temperature, use_cache, stream_parser
             )
+    
+    async def _complete_with(self, model: str, route: str, messages: List[Dict[str, str]],
+                             max_tokens: int, parse: Callable[[str], T], temperature: float,
+                             use_cache: bool, stream_parser: Optional[Callable[[], Any]]) -> T:
+        """Uma chamada (com cache, repetição e estatísticas) a um modelo específico"""
+        cache_key = self.cache.key(model, messages, temperature, max_tokens) if self.cache else None
+        if cache_key and use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Resposta do LLM reaproveitada do cache ({cache_key[:12]})")
+                return parse(self._replay(stream_parser, cached) if stream_parser else cached)
+        
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        # Latências (p95 do hedging) por rota: um patch longo não dita o prazo de uma revisão
+        latency_key = f"{route}:{model}"
+        started = time.monotonic()
+        content = ""
+        try:
+            if self.streaming and stream_parser:
+                content = await self.resilience.call(
+                    lambda: self._stream(model, messages, temperature, max_tokens, stream_parser), latency_key
+                )
+            else:
+                content = await self.resilience.call(
+                    lambda: self.client.chat(
+                        model, messages=messages, temperature=temperature, max_tokens=max_tokens
+                    ),
+                    latency_key
+                )
+                content = content.strip()
+                if stream_parser:
+                    content = self._replay(stream_parser, content)
+            result = parse(content)
+        except Exception:
+            self.router.record(route, model, time.monotonic() - started,
+                               prompt_tokens, estimate_tokens(content), ok=False)
+            raise
+        
+        self.router.record(route, model, time.monotonic() - started,
+                           prompt_tokens, estimate_tokens(content), ok=True)
+        if cache_key:
+            self.cache.put(cache_key, content)
+        return result
+    
+    async def _stream(self, model: str, messages: List[Dict[str, str]], temperature: float,
+                      max_tokens: int, stream_parser: Callable[[], Any]) -> str:
+        """Recebe a resposta em streaming, repetindo o pedido se ela for interrompida"""
+        attempts = config.LLM_STREAM_RETRIES + 1
+        for attempt in range(1, attempts + 1):
+            parser = stream_parser()
+            try:
+                await self.client.chat_stream(
+                    model, messages, on_delta=parser.feed,
+                    temperature=temperature, max_tokens=max_tokens
+                )
+                return parser.close()
+            except StreamAborted as e:
+                logger.warning(f"Stream do LLM interrompido (tentativa {attempt}/{attempts}): {e}")
+                if attempt == attempts:
+                    raise
+    
+    def _replay(self, stream_parser: Callable[[], Any], content: str) -> str:
+        """Passa uma resposta completa pelo validador incremental"""
+        parser = stream_parser()
+        parser.feed(content)
+        return parser.close()
+    
+    def json_spec(self, user_input: str, project_config: Dict[str, Any],
+                  use_cache: bool = True) -> LLMSpecification:
+        """Gera especificação técnica a partir da entrada do usuário"""
+        return self.client.run(self.json_spec_async(user_input, project_config, use_cache))
+    
+    def generate_patch(self, spec_json: Dict[str, Any], repo_map: str, feedback: Optional[str] = None,
+                       use_cache: bool = True,
+                       on_section: Optional[Callable[[str], None]] = None,
+                       complexity: Optional[str] = None, attempt: int = 1,
+                       temperature: float = 0.1) -> str:
+        """Gera patch unificado baseado na especificação"""
+        return self.client.run(self.generate_patch_async(
+            spec_json, repo_map, feedback, use_cache, on_section, complexity, attempt, temperature
+        ))
+    
+    def review(self, spec_json: Dict[str, Any], test_output: str, git_log: str, diff_applied: str,
+               use_cache: bool = True) -> ReviewResult:
+        """Revisa a implementação e retorna resultado"""
+        return self.client.run(self.review_async(spec_json, test_output, git_log, diff_applied, use_cache))
+    
+    async def json_spec_async(self, user_input: str, project_config: Dict[str, Any],
+                              use_cache: bool = True) -> LLMSpecification:
+        """Gera especificação técnica a partir da entrada do usuário"""
+        try:
+            prompt, _usage = self.budget.render("spec", MANAGER_SPEC_PROMPT, {
+                "user_input": user_input,
+                "project_name": project_config.get('name', ''),
+                "repo_url": project_config.get('repo_url', ''),
+                "default_branch": project_config.get('default_branch', 'main'),
+                "test_command": project_config.get('test_command', 'pytest -q')
+            })
             
-            content = response.choices[0].message.content.strip()
+            return await self._complete(
+                ROUTE_SPEC, "Você é um gerente de projeto técnico experiente.", prompt, max_tokens=1000,
+                parse=lambda content: LLMSpecification(**_extract_json(content)),
+                use_cache=use_cache, stream_parser=JSONStreamParser
+            )
             
-            # Extrair JSON da resposta
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                spec_data = json.loads(json_match.group())
-                return LLMSpecification(**spec_data)
-            else:
-                raise ValueError("Resposta do LLM não contém JSON válido")
-                
         except Exception as e:
             logger.error(f"Erro ao gerar especificação: {e}")
             raise
     
-    def generate_patch(self, spec_json: Dict[str, Any], repo_map: str, feedback: Optional[str] = None) -> str:
-        """Gera patch unificado baseado na especificação"""
+    async def generate_patch_async(self, spec_json: Dict[str, Any], repo_map: str,
+                                   feedback: Optional[str] = None, use_cache: bool = True,
+                                   on_section: Optional[Callable[[str], None]] = None,
+                                   complexity: Optional[str] = None, attempt: int = 1,
+                                   temperature: float = 0.1) -> str:
+        """Gera patch unificado baseado na especificação
+        
+        ``on_section`` recebe cada seção de arquivo completa assim que ela
+        chega (levantar ``StreamAborted`` descarta a resposta e pede outra).
+        ``complexity`` e ``attempt`` orientam a escolha do modelo;
+        ``temperature`` acima de ``LLM_CACHE_MAX_TEMPERATURE`` não usa cache.
+        """
         try:
             feedback_text = feedback if feedback else "Nenhum feedback anterior"
             
-            prompt = PROGRAMMER_DIFF_PROMPT.format(
-                spec_json=json.dumps(spec_json, indent=2),
-                repo_map=repo_map,
-                feedback=feedback_text
-            )
+            prompt, _usage = self.budget.render("patch", PROGRAMMER_DIFF_PROMPT, {
+                "spec_json": json.dumps(spec_json, indent=2),
+                "repo_map": repo_map,
+                "feedback": feedback_text
+            })
             
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Você é um programador experiente."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
+            return await self._complete(
+                ROUTE_PATCH, "Você é um programador experiente.", prompt, max_tokens=2000,
+                parse=_validate_diff, use_cache=use_cache,
+                stream_parser=lambda: DiffStreamParser(on_section), temperature=temperature,
+                complexity=complexity, attempt=attempt
             )
             
-            content = response.choices[0].message.content.strip()
-            
-            # Validar se é um diff válido
-            if not content.startswith('--- a/') and not content.startswith('diff --git'):
-                raise ValueError("Resposta não é um diff válido")
-            
-            return content
-            
         except Exception as e:
             logger.error(f"Erro ao gerar patch: {e}")
             raise
     
-    def review(self, spec_json: Dict[str, Any], test_output: str, git_log: str, diff_applied: str) -> ReviewResult:
+    async def review_async(self, spec_json: Dict[str, Any], test_output: str,
+                           git_log: str, diff_applied: str, use_cache: bool = True) -> ReviewResult:
         """Revisa a implementação e retorna resultado"""
         try:
             acceptance_criteria = spec_json.get('acceptance_criteria', [])
             
-            prompt = REVIEW_PROMPT.format(
-                spec_json=json.dumps(spec_json, indent=2),
-                test_output=test_output,
-                git_log=git_log,
-                diff_applied=diff_applied,
-                acceptance_criteria=json.dumps(acceptance_criteria, indent=2)
-            )
+            prompt, _usage = self.budget.render("review", REVIEW_PROMPT, {
+                "spec_json": json.dumps(spec_json, indent=2),
+                "test_output": test_output,
+                "git_log": git_log,
+                "diff_applied": diff_applied,
+                "acceptance_criteria": json.dumps(acceptance_criteria, indent=2)
+            })
             
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Você é um revisor técnico experiente."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=1000
+            return await self._complete(
+                ROUTE_REVIEW, "Você é um revisor técnico experiente.", prompt, max_tokens=1000,
+                parse=lambda content: ReviewResult(**_extract_json(content)),
+                use_cache=use_cache, stream_parser=JSONStreamParser
             )
             
-            content = response.choices[0].message.content.strip()
-            
-            # Extrair JSON da resposta
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                review_data = json.loads(json_match.group())
-                return ReviewResult(**review_data)
-            else:
-                raise ValueError("Resposta do LLM não contém JSON válido")
-                
         except Exception as e:
             logger.error(f"Erro ao revisar implementação: {e}")
             raise
@@ -1,11 +1,12 @@
 import json
 import re
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 import structlog
 
 from ..config import config
 from ..utils.prompts import MANAGER_SPEC_PROMPT, PROGRAMMER_DIFF_PROMPT, REVIEW_PROMPT
 from ..models.schemas import LLMSpecification, ReviewResult
+from ..utils.stream_parsers import DiffStreamParser
 
 logger = structlog.get_logger(__name__)
 
@@ -44,7 +45,11 @@ class MockLLMService:
             logger.error(f"Erro ao gerar especificação mock: {e}")
             raise
     
-    def generate_patch(self, spec_json: Dict[str, Any], repo_map: str, feedback: Optional[str] = None) -> str:
+    def generate_patch(self, spec_json: Dict[str, Any], repo_map: str, feedback: Optional[str] = None,
+                       use_cache: bool = True,
+                       on_section: Optional[Callable[[str], None]] = None,
+                       complexity: Optional[str] = None, attempt: int = 1,
+                       temperature: float = 0.1) -> str:
         """Gera patch mock"""
         try:
             logger.info(f"Gerando patch mock para: {spec_json.get('objective', '')}")
@@ -60,6 +65,9 @@ class MockLLMService:
      print("Sistema funcionando!")
 """
             
+            parser = DiffStreamParser(on_section)
+            parser.feed(mock_patch)
+            parser.close()
             return mock_patch
             
         except Exception as e:
@@ -83,6 +91,25 @@ class MockLLMService:
         except Exception as e:
             logger.error(f"Erro ao revisar implementação mock: {e}")
             raise
+    
+    async def json_spec_async(self, user_input: str, project_config: Dict[str, Any]) -> LLMSpecification:
+        """Versão assíncrona de ``json_spec``"""
+        return self.json_spec(user_input, project_config)
+    
+    async def generate_patch_async(self, spec_json: Dict[str, Any], repo_map: str,
+                                   feedback: Optional[str] = None, use_cache: bool = True,
+                                   on_section: Optional[Callable[[str], None]] = None,
+                                   complexity: Optional[str] = None, attempt: int = 1,
+                                   temperature: float = 0.1) -> str:
+        """Versão assíncrona de ``generate_patch``"""
+        return self.generate_patch(
+            spec_json, repo_map, feedback, use_cache, on_section, complexity, attempt, temperature
+        )
+    
+    async def review_async(self, spec_json: Dict[str, Any], test_output: str,
+                           git_log: str, diff_applied: str) -> ReviewResult:
+        """Versão assíncrona de ``review``"""
+        return self.review(spec_json, test_output, git_log, diff_applied)
 
 # Instância global
 llm_service = MockLLMService()
@@ -0,0 +1,139 @@
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import structlog
+
+from ..config import config
+
+logger = structlog.get_logger(__name__)
+
+# Etapas do pipeline que chamam o LLM
+ROUTE_SPEC = "spec"
+ROUTE_PATCH = "patch"
+ROUTE_REVIEW = "review"
+
+class ModelRouter:
+    """Escolhe o modelo de cada chamada ao LLM por etapa e complexidade
+    
+    Especificação e revisão usam o modelo rápido. O patch usa o modelo
+    rápido para complexidades fora de ``strong_complexities`` e o modelo
+    forte nas demais, a partir da segunda tentativa ou quando o modelo
+    rápido falha (``escalate``). Cada chamada é registrada em ``stats`` e,
+    com ``stats_path``, em um arquivo JSON Lines para calibrar a política:
+    as linhas são gravadas em lote por uma thread (``flush_interval``), nunca
+    por quem chama ``record``, e o arquivo é rotacionado para ``.1`` ao
+    passar de ``max_bytes``.
+    """
+    
+    def __init__(self, fast_model: Optional[str] = None,
+                 strong_model: Optional[str] = None,
+                 strong_complexities: Optional[Iterable[str]] = None,
+                 stats_path: Optional[Path] = None,
+                 flush_interval: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.fast_model = fast_model or config.LLM_FAST_MODEL
+        self.strong_model = strong_model or config.LLM_STRONG_MODEL
+        self.strong_complexities = set(
+            strong_complexities if strong_complexities is not None else config.LLM_STRONG_COMPLEXITIES
+        )
+        self.stats_path = stats_path
+        self.flush_interval = flush_interval if flush_interval is not None else config.LLM_ROUTE_STATS_FLUSH_SECONDS
+        self.max_bytes = max_bytes if max_bytes is not None else config.LLM_ROUTE_STATS_MAX_MB * 1024 * 1024
+        
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        if stats_path:
+            atexit.register(self.flush)
+    
+    def choose(self, route: str, complexity: Optional[str] = None, attempt: int = 1) -> str:
+        """Modelo para uma etapa"""
+        if route != ROUTE_PATCH:
+            return self.fast_model
+        if attempt > 1 or (complexity or "").lower() in self.strong_complexities:
+            return self.strong_model
+        return self.fast_model
+    
+    def escalate(self, model: str) -> Optional[str]:
+        """Modelo para repetir uma chamada que falhou (None se já é o mais forte)"""
+        return self.strong_model if model != self.strong_model else None
+    
+    def record(self, route: str, model: str, seconds: float, prompt_tokens: int,
+               completion_tokens: int, ok: bool):
+        """Registra latência e tokens (estimados) de uma chamada"""
+        key = f"{route}:{model}"
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                "calls": 0, "failures": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "latencies": []
+            })
+            stats["calls"] += 1
+            stats["failures"] += 0 if ok else 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["latencies"].append(seconds)
+            del stats["latencies"][:-500]
+            
+            if self.stats_path:
+                self._pending.append(json.dumps({
+                    "ts": time.time(), "route": route, "model": model,
+                    "seconds": round(seconds, 3), "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens, "ok": ok
+                }))
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        
+        logger.info(
+            f"Rota {route} ({model}): {seconds:.2f}s, ~{prompt_tokens}+{completion_tokens} tokens, "
+            f"{'ok' if ok else 'falhou'}"
+        )
+    
+    def flush(self):
+        """Grava as estatísticas pendentes, rotacionando o arquivo se passou do limite"""
+        with self._lock:
+            lines, self._pending = self._pending, []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        if not lines or not self.stats_path:
+            return
+        
+        data = "".join(line + "\n" for line in lines)
+        with self._flush_lock:
+            try:
+                self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+                if self.stats_path.exists() and self.stats_path.stat().st_size + len(data) > self.max_bytes:
+                    os.replace(self.stats_path, self.stats_path.with_name(self.stats_path.name + ".1"))
+                with open(self.stats_path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+            except OSError as e:
+                logger.warning(f"Erro ao gravar estatísticas de rota: {e}")
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Resumo por rota e modelo: chamadas, falhas, tokens e latências p50/p95"""
+        summary = {}
+        with self._lock:
+            for key, stats in self._stats.items():
+                latencies: List[float] = sorted(stats["latencies"])
+                summary[key] = {
+                    "calls": stats["calls"],
+                    "failures": stats["failures"],
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "completion_tokens": stats["completion_tokens"],
+                    "p50_seconds": latencies[len(latencies) // 2] if latencies else None,
+                    "p95_seconds": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+                }
+        return summary
+
+# Instância global
+model_router = ModelRouter(
+    stats_path=config.DATA_DIR / "model_routes.jsonl" if config.LLM_ROUTE_STATS_ENABLED else None
+)
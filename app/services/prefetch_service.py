@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import structlog
+
+from ..config import config
+from ..models.state_store import state_store
+from .repo_cache import RepoCache, repo_cache
+
+logger = structlog.get_logger(__name__)
+
+class RepoPrefetcher:
+    """Mantém o cache dos repositórios dos projetos atualizado em background
+    
+    ``prefetch`` agenda um fetch sem bloquear quem chama; pedidos repetidos
+    para o mesmo remoto enquanto um fetch está em andamento reaproveitam o
+    mesmo ``Future``. ``run`` percorre periodicamente os projetos cadastrados.
+    """
+    
+    def __init__(self, cache: Optional[RepoCache] = None, store: Any = None,
+                 max_workers: Optional[int] = None):
+        self.cache = cache or repo_cache
+        self.store = store or state_store
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or config.PREFETCH_WORKERS,
+            thread_name_prefix="repo-prefetch"
+        )
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+    
+    def prefetch(self, repo_url: str) -> Future:
+        """Agenda a atualização do cache de um remoto"""
+        with self._inflight_lock:
+            future = self._inflight.get(repo_url)
+            if future is not None and not future.done():
+                return future
+            
+            future = self._pool.submit(self._sync, repo_url)
+            self._inflight[repo_url] = future
+            return future
+    
+    def _sync(self, repo_url: str) -> bool:
+        """Cria ou atualiza o clone bare do remoto"""
+        try:
+            self.cache.mirror(repo_url, force=True)
+            return True
+        except Exception as e:
+            logger.warning(f"Erro ao pré-carregar {repo_url}: {e}")
+            return False
+    
+    def wait(self, repo_url: str, timeout: Optional[float] = None) -> bool:
+        """Aguarda um prefetch em andamento (True se não há nenhum)"""
+        with self._inflight_lock:
+            future = self._inflight.get(repo_url)
+        if future is None:
+            return True
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return False
+    
+    def prefetch_all(self) -> int:
+        """Agenda o prefetch de todos os projetos cadastrados"""
+        count = 0
+        for name in self.store.list_projects():
+            project = self.store.get_project(name)
+            if project and project.repo_url:
+                self.prefetch(project.repo_url)
+                count += 1
+        return count
+    
+    async def run(self, interval: Optional[float] = None):
+        """Loop periódico de prefetch (desabilitado com intervalo 0)"""
+        interval = interval if interval is not None else config.PREFETCH_INTERVAL_SECONDS
+        if interval <= 0:
+            return
+        
+        logger.info(f"Prefetch de repositórios a cada {interval}s")
+        while True:
+            try:
+                count = await asyncio.to_thread(self.prefetch_all)
+                logger.info(f"Prefetch agendado para {count} projetos")
+            except Exception as e:
+                logger.error(f"Erro no loop de prefetch: {e}")
+            await asyncio.sleep(interval)
+    
+    def shutdown(self):
+        """Encerra o pool, descartando prefetches que não começaram"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+# Instância global
+repo_prefetcher = RepoPrefetcher()
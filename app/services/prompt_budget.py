@@ -0,0 +1,194 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+import structlog
+
+from ..config import config
+from ..utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+logger = structlog.get_logger(__name__)
+
+# Peso de cada seção na divisão do orçamento (demais seções pesam 1)
+SECTION_WEIGHTS = {
+    "repo_map": 4,
+    "diff_applied": 3,
+    "test_output": 2,
+}
+
+PASSED_RE = re.compile(r'(\sPASSED\b|^PASSED\b)')
+# Linhas de progresso do pytest: ``tests/test_x.py ..F.s [ 50%]`` ou só ``.... [100%]``;
+# sem o caminho o percentual é obrigatório (um ``F`` ou ``E`` solto pode ser saída do teste)
+PROGRESS_RE = re.compile(
+    r'^(?:[\w/.-]+\.py\s+[.sxXEF]+(?:\s*\[\s*\d+%\])?|[.sxXEF]+\s*\[\s*\d+%\])\s*$'
+)
+SUMMARY_RE = re.compile(r'^=+ .*short test summary info.* =+$')
+HUNK_RE = re.compile(r'^@@ ')
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """Corta o meio de um texto, mantendo início e fim"""
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    
+    marker = f"\n[... {len(text) - max_chars} caracteres omitidos ...]\n"
+    keep = max(0, max_chars - len(marker))
+    head = keep * 2 // 3
+    tail = keep - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+def trim_test_output(text: str, max_tokens: int) -> str:
+    """Reduz a saída do pytest mantendo falhas e resumo
+    
+    Linhas de testes aprovados e de progresso saem primeiro; se ainda
+    faltar espaço o resumo final (``short test summary info`` em diante)
+    é preservado e o detalhamento das falhas é cortado.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    lines = text.splitlines()
+    kept = [line for line in lines if not PASSED_RE.search(line) and not PROGRESS_RE.match(line)]
+    omitted = len(lines) - len(kept)
+    if omitted:
+        kept.insert(0, f"[... {omitted} linhas de testes aprovados/progresso omitidas ...]")
+    reduced = "\n".join(kept)
+    if estimate_tokens(reduced) <= max_tokens:
+        return reduced
+    
+    summary_at = next((i for i, line in enumerate(kept) if SUMMARY_RE.match(line)), None)
+    if summary_at is None:
+        return trim_text(reduced, max_tokens)
+    
+    summary = "\n".join(kept[summary_at:])
+    summary_tokens = estimate_tokens(summary)
+    if summary_tokens >= max_tokens:
+        return trim_text(summary, max_tokens)
+    details = "\n".join(kept[:summary_at])
+    return trim_text(details, max_tokens - summary_tokens - 1) + "\n" + summary
+
+def trim_diff(text: str, max_tokens: int, context_lines: int = 1) -> str:
+    """Reduz um diff removendo contexto inalterado longe das mudanças
+    
+    O resultado serve apenas para leitura (revisão): as contagens dos
+    cabeçalhos ``@@`` deixam de bater com as linhas mantidas.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    lines = text.splitlines()
+    changed = [
+        i for i, line in enumerate(lines)
+        if line[:1] in "+-" and not line.startswith(("+++ ", "--- "))
+    ]
+    keep = set()
+    for i in changed:
+        keep.update(range(i - context_lines, i + context_lines + 1))
+    
+    result: List[str] = []
+    in_hunk = False
+    elided = False
+    for i, line in enumerate(lines):
+        if HUNK_RE.match(line):
+            in_hunk = True
+        elif line.startswith(("diff --git", "--- ", "+++ ")) and i not in changed:
+            in_hunk = False
+        
+        if in_hunk and line[:1] in (" ", "") and not HUNK_RE.match(line) and i not in keep:
+            if not elided:
+                result.append(" …")
+                elided = True
+            continue
+        result.append(line)
+        elided = False
+    
+    return trim_text("\n".join(result), max_tokens)
+
+def trim_repo_map(text: str, max_tokens: int) -> str:
+    """Corta o mapa do repositório entre arquivos, mantendo os primeiros (mais relevantes)"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    entries = re.split(r'(?m)^(?==== .+ ===$)', text)
+    kept: List[str] = []
+    used = 0
+    for entry in entries:
+        cost = estimate_tokens(entry)
+        if used + cost > max_tokens:
+            break
+        kept.append(entry)
+        used += cost
+    if not kept:
+        return trim_text(text, max_tokens)
+    return "".join(kept) + f"\n[... {len(entries) - len(kept)} arquivos omitidos ...]\n"
+
+TRIMMERS: Dict[str, Callable[[str, int], str]] = {
+    "repo_map": trim_repo_map,
+    "test_output": trim_test_output,
+    "diff_applied": trim_diff,
+}
+
+class PromptBudget:
+    """Distribui o orçamento de tokens de um prompt entre suas seções
+    
+    Seções que cabem na sua fatia entram inteiras e o que sobra é
+    redistribuído entre as demais (proporcionalmente a ``SECTION_WEIGHTS``).
+    Seções acima da fatia são reduzidas pelo corte específico de cada uma.
+    """
+    
+    def __init__(self, max_prompt_tokens: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.max_prompt_tokens = max_prompt_tokens or config.PROMPT_TOKEN_BUDGET
+        self.weights = weights if weights is not None else SECTION_WEIGHTS
+    
+    def allocate(self, sizes: Dict[str, int], budget: int) -> Dict[str, int]:
+        """Tokens disponíveis para cada seção, dado o tamanho de cada uma"""
+        remaining = dict(sizes)
+        allocation: Dict[str, int] = {}
+        left = max(0, budget)
+        
+        while remaining:
+            total_weight = sum(self.weights.get(name, 1) for name in remaining)
+            share = {name: left * self.weights.get(name, 1) / total_weight for name in remaining}
+            fitting = [name for name in remaining if remaining[name] <= share[name]]
+            if not fitting:
+                for name in remaining:
+                    allocation[name] = int(share[name])
+                break
+            for name in fitting:
+                allocation[name] = remaining.pop(name)
+                left -= allocation[name]
+        
+        return allocation
+    
+    def render(self, name: str, template: str, sections: Dict[str, str],
+               max_tokens: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+        """Preenche o template com as seções dentro do orçamento
+        
+        Retorna o prompt e os tokens estimados de cada seção (já reduzida),
+        mais ``total``.
+        """
+        budget = max_tokens or self.max_prompt_tokens
+        overhead = estimate_tokens(template.format(**{key: "" for key in sections}))
+        sizes = {key: estimate_tokens(text) for key, text in sections.items()}
+        allocation = self.allocate(sizes, budget - overhead)
+        
+        fitted = {}
+        trimmed = []
+        for key, text in sections.items():
+            if sizes[key] > allocation[key]:
+                fitted[key] = TRIMMERS.get(key, trim_text)(text, allocation[key])
+                trimmed.append(f"{key} {sizes[key]}→{estimate_tokens(fitted[key])}")
+            else:
+                fitted[key] = text
+        
+        prompt = template.format(**fitted)
+        usage = {key: estimate_tokens(text) for key, text in fitted.items()}
+        usage["total"] = estimate_tokens(prompt)
+        
+        breakdown = ", ".join(f"{key}={tokens}" for key, tokens in usage.items() if key != "total")
+        logger.info(f"Prompt {name}: ~{usage['total']} tokens ({breakdown})")
+        if trimmed:
+            logger.info(f"Prompt {name}: seções reduzidas para caber em {budget} tokens: {'; '.join(trimmed)}")
+        return prompt, usage
+
+# Instância global
+prompt_budget = PromptBudget()
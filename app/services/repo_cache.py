@@ -0,0 +1,110 @@
+import hashlib
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import git
+import structlog
+
+from ..config import config
+
+logger = structlog.get_logger(__name__)
+
+class RepoCache:
+    """Cache local de repositórios remotos em clones bare
+    
+    Cada remoto tem um único clone bare em ``<cache>/<nome>-<hash>.git``,
+    atualizado com ``fetch`` incremental. Clones de trabalho e worktrees são
+    criados a partir dele, sem baixar de novo o histórico inteiro.
+    """
+    
+    def __init__(self, cache_dir: Optional[Path] = None,
+                 clone_filter: Optional[str] = None,
+                 depth: Optional[int] = None,
+                 fetch_ttl: Optional[float] = None):
+        self.cache_dir = cache_dir or config.GIT_CACHE_DIR
+        self.clone_filter = clone_filter if clone_filter is not None else config.GIT_CLONE_FILTER
+        self.depth = depth if depth is not None else config.GIT_CLONE_DEPTH
+        self.fetch_ttl = fetch_ttl if fetch_ttl is not None else config.GIT_FETCH_TTL_SECONDS
+        
+        self._locks: Dict[Path, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        self._last_fetch: Dict[Path, float] = {}
+    
+    def mirror_path(self, repo_url: str) -> Path:
+        """Caminho do clone bare de um remoto"""
+        digest = hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:12]
+        name = re.sub(r'\.git$', '', repo_url.rstrip('/').split('/')[-1]) or "repo"
+        return self.cache_dir / f"{name}-{digest}.git"
+    
+    def lock(self, repo_url: str) -> threading.RLock:
+        """Lock das operações que alteram o clone bare de um remoto"""
+        path = self.mirror_path(repo_url)
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.RLock())
+    
+    def _clone_options(self) -> List[str]:
+        """Opções de clone parcial/raso conforme a configuração"""
+        options = []
+        if self.clone_filter:
+            options.append(f"--filter={self.clone_filter}")
+        if self.depth:
+            options.extend(["--depth", str(self.depth)])
+        return options
+    
+    def mirror(self, repo_url: str, force: bool = False) -> git.Repo:
+        """Garante o clone bare do remoto atualizado e o retorna
+        
+        Fetches feitos há menos de ``fetch_ttl`` segundos são reaproveitados,
+        a menos que ``force`` seja informado.
+        """
+        path = self.mirror_path(repo_url)
+        with self.lock(repo_url):
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                git.Repo.clone_from(repo_url, path, multi_options=["--bare"] + self._clone_options())
+                repo = git.Repo(path)
+                
+                # Clone bare não cria refs remotas; worktrees partem de origin/<branch>
+                with repo.config_writer() as writer:
+                    writer.set_value('remote "origin"', "fetch", "+refs/heads/*:refs/remotes/origin/*")
+                self._fetch(repo, path)
+                logger.info(f"Cache de {repo_url} criado em {path}")
+                return repo
+            
+            repo = git.Repo(path)
+            last_fetch = self._last_fetch.get(path)
+            if force or last_fetch is None or time.monotonic() - last_fetch >= self.fetch_ttl:
+                self._fetch(repo, path)
+                logger.info(f"Cache de {repo_url} atualizado via fetch")
+            return repo
+    
+    def _fetch(self, repo: git.Repo, path: Path):
+        """Fetch incremental do remoto"""
+        args = ["origin", "--prune"]
+        if self.depth:
+            args.extend(["--depth", str(self.depth)])
+        repo.git.fetch(*args)
+        self._last_fetch[path] = time.monotonic()
+    
+    def clone(self, repo_url: str, dest: Path, branch: Optional[str] = None) -> git.Repo:
+        """Cria um clone de trabalho reaproveitando os objetos do cache
+        
+        Os objetos vêm do clone bare (``--reference``) e são copiados para o
+        clone (``--dissociate``), que não depende do cache: um ``gc`` ou
+        ``fetch --prune`` no clone bare não corrompe clones já criados.
+        """
+        mirror = self.mirror(repo_url)
+        options = ["--reference", mirror.git_dir, "--dissociate"]
+        if self.depth:
+            options.extend(["--depth", str(self.depth)])
+        if branch:
+            options.extend(["--branch", branch])
+        
+        repo = git.Repo.clone_from(repo_url, dest, multi_options=options)
+        logger.info(f"Repositório {repo_url} clonado em {dest} usando o cache")
+        return repo
+
+# Instância global
+repo_cache = RepoCache()
@@ -0,0 +1,178 @@
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import structlog
+
+from ..utils.tokens import tokenize_code
+
+logger = structlog.get_logger(__name__)
+
+# Termos do caminho pesam mais que ocorrências no conteúdo
+PATH_WEIGHT = 3
+
+class BlobCache:
+    """Valores derivados de blobs do git (conteúdo imutável), com limite de entradas"""
+    
+    def __init__(self, max_entries: int = 200_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Valor de um blob, se já calculado"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Any):
+        """Guarda o valor de um blob, descartando os menos usados"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class LexicalIndex:
+    """Índice invertido BM25 sobre os arquivos de um projeto
+    
+    A atualização é incremental: apenas arquivos cujo SHA do blob mudou são
+    removidos e reindexados. Os termos de cada blob ficam em um cache
+    compartilhado, então worktrees diferentes do mesmo commit não
+    re-tokenizam nada; com um ``store`` em disco em ``update``, nem um novo
+    processo.
+    """
+    
+    def __init__(self, term_cache: BlobCache, k1: float = 1.5, b: float = 0.75):
+        self.term_cache = term_cache
+        self.k1 = k1
+        self.b = b
+        
+        self._files: Dict[str, str] = {}  # caminho -> sha do blob
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_len = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        """Quantidade de arquivos indexados"""
+        return len(self._doc_terms)
+    
+    def _terms_for(self, path: str, blob_sha: str, read: Callable[[str], Optional[str]],
+                   store: Optional[Any] = None) -> Optional[Counter]:
+        """Termos de um arquivo (caminho com peso maior + conteúdo)"""
+        # O caminho entra na chave porque seus termos fazem parte do documento
+        cache_key = f"{blob_sha}:{path}" if blob_sha else None
+        terms = self.term_cache.get(cache_key) if cache_key else None
+        if terms is None and cache_key and store is not None:
+            stored = store.get(f"terms:{cache_key}")
+            if stored is not None:
+                terms = Counter(json.loads(stored))
+                self.term_cache.put(cache_key, terms)
+        if terms is None:
+            content = read(path)
+            if content is None:
+                return None
+            terms = Counter(tokenize_code(content))
+            for term in tokenize_code(path):
+                terms[term] += PATH_WEIGHT
+            if cache_key:
+                self.term_cache.put(cache_key, terms)
+                if store is not None:
+                    store.put(f"terms:{cache_key}", json.dumps(terms))
+        return terms
+    
+    def _remove(self, path: str):
+        """Retira um arquivo das listas invertidas"""
+        terms = self._doc_terms.pop(path, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(path, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(path, 0)
+    
+    def _add(self, path: str, terms: Counter):
+        """Inclui um arquivo nas listas invertidas"""
+        self._doc_terms[path] = terms
+        length = sum(terms.values())
+        self._doc_len[path] = length
+        self._total_len += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[path] = tf
+    
+    def update(self, files: Iterable[Tuple[str, Optional[str]]],
+               read: Callable[[str], Optional[str]], store: Optional[Any] = None) -> int:
+        """Sincroniza o índice com a lista (caminho, sha do blob); retorna quantos arquivos foram reindexados
+        
+        ``store`` (ex.: ``DiskCache``) guarda os termos por blob entre processos.
+        """
+        with self._lock:
+            current = {path: blob_sha for path, blob_sha in files}
+            for path in list(self._files):
+                if path not in current:
+                    self._remove(path)
+                    del self._files[path]
+            
+            reindexed = 0
+            for path, blob_sha in current.items():
+                # Sem sha (fora do git) o arquivo é sempre relido
+                if blob_sha is not None and self._files.get(path) == blob_sha:
+                    continue
+                self._remove(path)
+                self._files[path] = blob_sha
+                terms = self._terms_for(path, blob_sha, read, store)
+                if terms:
+                    self._add(path, terms)
+                reindexed += 1
+            
+            return reindexed
+    
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """Arquivos mais relevantes para a consulta (BM25)"""
+        query_terms = set(tokenize_code(query))
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs or not query_terms:
+                return []
+            avg_len = self._total_len / n_docs
+            
+            scores: Dict[str, float] = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for path, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[path] / avg_len)
+                    scores[path] = scores.get(path, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
+
+class RepoIndexRegistry:
+    """Índices léxicos por projeto, compartilhando o cache de termos por blob"""
+    
+    def __init__(self):
+        self.term_cache = BlobCache()
+        self._indexes: Dict[str, LexicalIndex] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> LexicalIndex:
+        """Índice de um projeto (criado sob demanda)"""
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = LexicalIndex(self.term_cache)
+                self._indexes[key] = index
+            return index
+
+# Instância global
+repo_indexes = RepoIndexRegistry()
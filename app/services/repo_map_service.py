@@ -0,0 +1,327 @@
+import fnmatch
+import json
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import structlog
+
+from ..config import config
+from ..utils.disk_cache import DiskCache
+from ..utils.outline import python_outline
+from ..utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+from .repo_index import BlobCache, RepoIndexRegistry, repo_indexes
+
+logger = structlog.get_logger(__name__)
+
+# Mesmo critério do git: um byte NUL no início indica arquivo binário
+BINARY_SNIFF_BYTES = 8000
+
+# Modos do mapa: conteúdo completo ou resumo por assinaturas
+MODE_FULL = "full"
+MODE_OUTLINE = "outline"
+
+# Menor entrada possível no mapa (cabeçalho com caminho de um caractere, sem conteúdo)
+MIN_ENTRY_TOKENS = estimate_tokens("=== x ===\n\n")
+
+class RepoFile(NamedTuple):
+    """Arquivo versionado do repositório"""
+    path: str
+    blob_sha: Optional[str]
+
+class RepoMapService:
+    """Enumeração de arquivos e montagem do mapa do repositório para o LLM
+    
+    Os arquivos vêm do índice do git (``git ls-files``), então o que está no
+    ``.gitignore`` e artefatos não versionados ficam de fora sem percorrer o
+    disco. Diretórios/padrões em ``ignore`` são descartados antes de qualquer
+    leitura, e binários são detectados pelos primeiros bytes.
+    
+    No modo ``outline`` apenas os arquivos mais relevantes entram inteiros;
+    os demais arquivos Python aparecem como resumo (assinaturas e primeira
+    linha das docstrings), guardado por SHA do blob.
+    
+    Só o que não depende da consulta vai para o cache em disco: a lista de
+    arquivos (pelo SHA da árvore do commit) e, por SHA do blob, os termos do
+    índice, os resumos e o conteúdo dos arquivos. A ordenação e a montagem
+    são refeitas a cada chamada, então uma nova task sobre um repositório que
+    não mudou recebe o mapa sem ler nenhum arquivo, qualquer que seja a
+    consulta.
+    """
+    
+    def __init__(self, ignore: Optional[Iterable[str]] = None,
+                 indexes: Optional[RepoIndexRegistry] = None,
+                 outline_cache: Optional[BlobCache] = None,
+                 map_cache: Optional[DiskCache] = None):
+        self.indexes = indexes or repo_indexes
+        self.outline_cache = outline_cache or BlobCache()
+        self.map_cache = map_cache or DiskCache(
+            config.CACHE_DIR / "repo_maps", config.REPO_MAP_CACHE_MAX_MB * 1024 * 1024
+        )
+        patterns = ignore if ignore is not None else config.REPO_MAP_IGNORE
+        self.ignore = [pattern.strip() for pattern in patterns if pattern.strip()]
+        
+        # Um único regex para todos os padrões; decisões por diretório são memorizadas
+        self._ignore_re = re.compile('|'.join(fnmatch.translate(p) for p in self.ignore)) if self.ignore else None
+        self._dir_cache: Dict[str, bool] = {}
+        self._path_patterns = any('/' in p for p in self.ignore)
+    
+    def _dir_ignored(self, directory: str) -> bool:
+        """Indica se um diretório (ou algum ancestral) está ignorado"""
+        if not directory:
+            return False
+        cached = self._dir_cache.get(directory)
+        if cached is None:
+            parent, _, name = directory.rpartition('/')
+            cached = self._dir_ignored(parent) or bool(self._ignore_re.match(name))
+            self._dir_cache[directory] = cached
+        return cached
+    
+    def is_ignored(self, relative_path: str) -> bool:
+        """Indica se o caminho casa com algum padrão do conjunto de ignorados"""
+        if self._ignore_re is None:
+            return False
+        directory, _, name = relative_path.rpartition('/')
+        if self._dir_ignored(directory) or self._ignore_re.match(name):
+            return True
+        return self._path_patterns and bool(self._ignore_re.match(relative_path))
+    
+    def list_files(self, repo_path: Path) -> List[RepoFile]:
+        """Lista os arquivos versionados (com o SHA do blob), em ordem de caminho"""
+        try:
+            result = subprocess.run(
+                ["git", "ls-files", "-s", "-z"],
+                cwd=repo_path, capture_output=True, check=True
+            )
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            logger.warning(f"git ls-files indisponível em {repo_path}, percorrendo o disco: {e}")
+            return self._walk_files(repo_path)
+        
+        files = []
+        for entry in result.stdout.decode('utf-8', errors='surrogateescape').split('\0'):
+            if not entry:
+                continue
+            # Formato: "<modo> <sha> <estágio>\t<caminho>"
+            meta, path = entry.split('\t', 1)
+            mode, blob_sha, _stage = meta.split(' ')
+            if mode == '160000':  # submódulo
+                continue
+            if not self.is_ignored(path):
+                files.append(RepoFile(path, blob_sha))
+        return files
+    
+    def _walk_files(self, repo_path: Path) -> List[RepoFile]:
+        """Enumeração pelo disco para diretórios que não são repositórios git"""
+        files = []
+        for root, dirs, names in os.walk(repo_path):
+            relative_root = os.path.relpath(root, repo_path)
+            prefix = '' if relative_root == '.' else relative_root.replace(os.sep, '/') + '/'
+            dirs[:] = sorted(d for d in dirs if d != '.git' and not self.is_ignored(prefix + d))
+            for name in sorted(names):
+                path = prefix + name
+                if not self.is_ignored(path):
+                    files.append(RepoFile(path, None))
+        return files
+    
+    def read_text(self, repo_path: Path, relative_path: str, max_size_kb: int) -> Optional[str]:
+        """Lê um arquivo de texto (None se grande demais, binário ou ilegível)"""
+        file_path = repo_path / relative_path
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read(max_size_kb * 1024 + 1)
+        except OSError:
+            return None
+        
+        if len(data) > max_size_kb * 1024:
+            return None
+        if b'\0' in data[:BINARY_SNIFF_BYTES]:
+            return None
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    
+    def rank_files(self, repo_path: Path, files: List[RepoFile], query: str,
+                   max_size_kb: int = 100, index_key: Optional[str] = None) -> List[str]:
+        """Ordena os arquivos por relevância para a consulta (BM25)
+        
+        Arquivos sem nenhum termo em comum com a consulta vêm depois, em
+        ordem de caminho.
+        """
+        index = self.indexes.get(index_key or str(repo_path))
+        reindexed = index.update(
+            [(f.path, f.blob_sha) for f in files],
+            lambda path: self.read_text(repo_path, path, max_size_kb),
+            store=self.map_cache
+        )
+        logger.info(f"Índice do repositório atualizado: {reindexed} arquivos reindexados de {len(files)}")
+        
+        ranked = [path for path, _score in index.search(query, k=len(files))]
+        ranked_set = set(ranked)
+        return ranked + [f.path for f in files if f.path not in ranked_set]
+    
+    def get_content(self, repo_path: Path, relative_path: str, blob_sha: Optional[str],
+                    max_size_kb: int = 100) -> Optional[str]:
+        """Conteúdo de um arquivo de texto, guardado em disco por SHA do blob"""
+        if not blob_sha:
+            return self.read_text(repo_path, relative_path, max_size_kb)
+        
+        # O limite de tamanho entra na chave: o mesmo blob pode ser aceito ou recusado
+        cache_key = "body:" + json.dumps([blob_sha, max_size_kb])
+        cached = self.map_cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+        content = self.read_text(repo_path, relative_path, max_size_kb)
+        self.map_cache.put(cache_key, json.dumps(content))
+        return content
+    
+    def get_outline(self, repo_path: Path, relative_path: str, blob_sha: Optional[str],
+                    max_size_kb: int = 100) -> Optional[str]:
+        """Resumo de um arquivo Python (None se ilegível ou com erro de sintaxe)"""
+        if blob_sha:
+            outline = self.outline_cache.get(blob_sha)
+            if outline is None:
+                outline = self.map_cache.get(f"outline:{blob_sha}")
+                if outline is not None:
+                    self.outline_cache.put(blob_sha, outline)
+            if outline is not None:
+                return outline
+        
+        content = self.read_text(repo_path, relative_path, max_size_kb)
+        if content is None:
+            return None
+        outline = python_outline(content)
+        if outline is not None and blob_sha:
+            self.outline_cache.put(blob_sha, outline)
+            self.map_cache.put(f"outline:{blob_sha}", outline)
+        return outline
+    
+    def modified_paths(self, repo_path: Path) -> Optional[set]:
+        """Arquivos com alterações no working tree ainda fora do índice (None se indisponível)"""
+        try:
+            result = subprocess.run(
+                ["git", "diff", "--name-only", "-z"],
+                cwd=repo_path, capture_output=True, check=True
+            )
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+        return {p for p in result.stdout.decode('utf-8', errors='surrogateescape').split('\0') if p}
+    
+    def repo_files(self, repo_path: Path) -> List[RepoFile]:
+        """Arquivos do mapa; com o working tree limpo, a lista vem do cache pela árvore
+        
+        Arquivos alterados no working tree ficam sem SHA do blob (o do índice
+        não corresponde ao disco), então são sempre lidos de novo.
+        """
+        tree_sha = self.tree_sha(repo_path)
+        cache_key = "files:" + json.dumps([tree_sha, self.ignore]) if tree_sha else None
+        if cache_key:
+            cached = self.map_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Lista de arquivos reaproveitada do cache (árvore {tree_sha[:12]})")
+                return [RepoFile(path, blob_sha) for path, blob_sha in json.loads(cached)]
+        
+        files = self.list_files(repo_path)
+        if cache_key:
+            self.map_cache.put(cache_key, json.dumps(files))
+            return files
+        
+        modified = self.modified_paths(repo_path)
+        if modified is None:
+            return [RepoFile(f.path, None) for f in files]
+        return [RepoFile(f.path, None) if f.path in modified else f for f in files]
+    
+    def tree_sha(self, repo_path: Path) -> Optional[str]:
+        """SHA da árvore do HEAD, se o working tree não tiver alterações em arquivos versionados"""
+        try:
+            status = subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=repo_path, capture_output=True, check=True
+            )
+            if status.stdout.strip():
+                return None
+            result = subprocess.run(
+                ["git", "rev-parse", "HEAD^{tree}"],
+                cwd=repo_path, capture_output=True, check=True
+            )
+            return result.stdout.decode().strip() or None
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+    
+    def _size_tokens(self, repo_path: Path, relative_path: str) -> int:
+        """Estimativa de tokens pelo tamanho do arquivo em disco, sem lê-lo"""
+        try:
+            return os.path.getsize(repo_path / relative_path) // CHARS_PER_TOKEN
+        except OSError:
+            return 0
+    
+    def get_repo_map(self, repo_path: Path, max_files: int = 20, max_size_kb: int = 100,
+                     query: Optional[str] = None, token_budget: Optional[int] = None,
+                     index_key: Optional[str] = None, mode: Optional[str] = None,
+                     full_files: Optional[int] = None) -> str:
+        """Gera mapa do repositório para o LLM
+        
+        Com ``query`` os arquivos mais relevantes entram primeiro; o mapa
+        para em ``max_files`` arquivos ou quando o orçamento de tokens acaba.
+        No modo ``outline`` só os ``full_files`` primeiros entram inteiros.
+        """
+        try:
+            mode = mode or config.REPO_MAP_MODE
+            full_files = full_files if full_files is not None else config.REPO_MAP_FULL_FILES
+            budget = token_budget if token_budget is not None else config.REPO_MAP_TOKEN_BUDGET
+            
+            files = self.repo_files(repo_path)
+            blob_shas = {f.path: f.blob_sha for f in files}
+            if query:
+                paths = self.rank_files(repo_path, files, query, max_size_kb, index_key)
+            else:
+                paths = [f.path for f in files]
+            
+            used_tokens = 0
+            full_count = 0
+            repo_map = []
+            for path in paths:
+                remaining = budget - used_tokens
+                if remaining < MIN_ENTRY_TOKENS:
+                    break
+                header_cost = estimate_tokens(f"=== {path} ===\n\n")
+                if header_cost > remaining:
+                    # Caminhos mais curtos mais abaixo ainda podem caber
+                    continue
+                
+                is_full = mode == MODE_FULL or full_count < full_files
+                if is_full and header_cost + self._size_tokens(repo_path, path) > remaining:
+                    # Grande demais para o que sobrou: nem chega a ser lido
+                    continue
+                if is_full:
+                    content = self.get_content(repo_path, path, blob_shas.get(path), max_size_kb)
+                elif path.endswith('.py'):
+                    content = self.get_outline(repo_path, path, blob_shas.get(path), max_size_kb)
+                else:
+                    # Fora do Python só o caminho, sem ler o arquivo
+                    content = ""
+                if content is None:
+                    continue
+                
+                entry = f"=== {path} ===\n{content}\n"
+                cost = estimate_tokens(entry)
+                if used_tokens + cost > budget:
+                    # Arquivos menores mais abaixo ainda podem caber
+                    continue
+                
+                repo_map.append(entry)
+                used_tokens += cost
+                if is_full:
+                    full_count += 1
+                if len(repo_map) >= max_files:
+                    break
+            
+            return "\n".join(repo_map)
+        
+        except Exception as e:
+            logger.error(f"Erro ao gerar mapa do repositório: {e}")
+            return ""
+
+# Instância global
+repo_map_service = RepoMapService()
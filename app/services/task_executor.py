@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import structlog
+
+from ..config import config
+
+logger = structlog.get_logger(__name__)
+
+PipelineResult = Tuple[bool, str, Optional[str]]
+CompletionCallback = Callable[[str, PipelineResult], Awaitable[None]]
+
+# Sinal de cancelamento da task em execução na thread atual
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    "task_cancel_event", default=None
+)
+
+def task_cancelled() -> bool:
+    """Indica se a task em execução foi cancelada (ex.: lease perdido)"""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+class TaskExecutor:
+    """Executa pipelines de tasks em um pool de threads limitado
+    
+    ``submit`` retorna imediatamente; o pipeline roda fora do event loop e o
+    resultado é entregue a um callback assíncrono no loop de quem submeteu.
+    O pipeline é I/O (git, LLM, subprocessos de teste), por isso threads
+    bastam para executar várias tasks em paralelo.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or config.TASK_WORKERS
+        self.max_pending = max_pending or config.TASK_MAX_PENDING
+        self.pipeline: Optional[Callable[[str], PipelineResult]] = None  # Será injetado
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task-worker")
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+    
+    def set_pipeline(self, pipeline: Callable[[str], PipelineResult]):
+        """Define a função que executa uma task (ex.: ``manager_agent.review_and_iterate``)"""
+        self.pipeline = pipeline
+    
+    @property
+    def active_count(self) -> int:
+        """Quantidade de tasks submetidas e ainda não concluídas"""
+        return len(self._running)
+    
+    def is_running(self, task_id: str) -> bool:
+        """Indica se a task está em execução ou aguardando um worker"""
+        return task_id in self._running
+    
+    def cancel(self, task_id: str) -> bool:
+        """Pede ao pipeline da task que pare no próximo ponto de verificação
+        
+        O pipeline consulta ``task_cancelled()``; a thread não é interrompida.
+        """
+        event = self._cancel_events.get(task_id)
+        if event is None:
+            return False
+        event.set()
+        logger.warning(f"Cancelamento da task {task_id} solicitado")
+        return True
+    
+    def submit(self, task_id: str, on_complete: Optional[CompletionCallback] = None) -> bool:
+        """Agenda a execução de uma task
+        
+        Deve ser chamado de dentro do event loop. Retorna False se a task já
+        está em execução ou se o limite de tasks pendentes foi atingido.
+        """
+        if self.pipeline is None:
+            logger.error("Pipeline de execução não configurado")
+            return False
+        
+        if task_id in self._running:
+            logger.warning(f"Task {task_id} já está em execução")
+            return False
+        
+        if len(self._running) >= self.max_pending:
+            logger.warning(f"Limite de {self.max_pending} tasks pendentes atingido; task {task_id} recusada")
+            return False
+        
+        self._running[task_id] = asyncio.create_task(self._run(task_id, on_complete))
+        logger.info(f"Task {task_id} submetida ({len(self._running)} em execução)")
+        return True
+    
+    async def _run(self, task_id: str, on_complete: Optional[CompletionCallback]):
+        """Executa o pipeline no pool e entrega o resultado ao callback"""
+        loop = asyncio.get_running_loop()
+        cancel_event = threading.Event()
+        self._cancel_events[task_id] = cancel_event
+        try:
+            try:
+                result = await loop.run_in_executor(self._pool, self._call_pipeline, task_id, cancel_event)
+            except Exception as e:
+                logger.error(f"Erro ao executar task {task_id}: {e}")
+                result = (False, f"Erro interno: {str(e)}", None)
+            
+            if on_complete:
+                try:
+                    await on_complete(task_id, result)
+                except Exception as e:
+                    logger.error(f"Erro ao notificar conclusão da task {task_id}: {e}")
+        finally:
+            self._running.pop(task_id, None)
+            self._cancel_events.pop(task_id, None)
+    
+    def _call_pipeline(self, task_id: str, cancel_event: threading.Event) -> PipelineResult:
+        """Executa o pipeline na thread do pool com o sinal de cancelamento da task"""
+        context = contextvars.copy_context()
+        context.run(_cancel_event.set, cancel_event)
+        return context.run(self.pipeline, task_id)
+    
+    async def wait_all(self):
+        """Aguarda todas as tasks submetidas terminarem"""
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+    
+    def shutdown(self, wait: bool = False):
+        """Encerra o pool, descartando tasks que ainda não começaram"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+# Instância global
+task_executor = TaskExecutor()
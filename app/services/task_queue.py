@@ -0,0 +1,240 @@
+import asyncio
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+import structlog
+
+from ..config import config
+from ..models.schemas import Task, TaskStatus
+from ..models.state_store import state_store
+from .task_executor import TaskExecutor, CompletionCallback
+
+logger = structlog.get_logger(__name__)
+
+class TaskQueue:
+    """Fila persistente de tasks construída sobre o state store
+    
+    Tasks ``PENDING`` são a fila. Um worker reivindica uma task gravando
+    ``IN_PROGRESS`` com um lease (dono + expiração) via ``expected_version``,
+    de modo que duas reivindicações concorrentes não pegam a mesma task.
+    Leases expirados (processo que morreu) voltam a ser reivindicáveis.
+    """
+    
+    def __init__(self, store: Any = None,
+                 max_global: Optional[int] = None,
+                 max_per_project: Optional[int] = None,
+                 lease_seconds: Optional[int] = None,
+                 max_attempts: Optional[int] = None):
+        self.store = store or state_store
+        self.max_global = max_global or config.TASK_WORKERS
+        self.max_per_project = max_per_project or config.TASK_MAX_PER_PROJECT
+        self.lease_seconds = lease_seconds or config.TASK_LEASE_SECONDS
+        self.max_attempts = max_attempts or config.TASK_MAX_ATTEMPTS
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        
+        self._claim_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    def enqueue(self, task: Task, priority: Optional[int] = None) -> bool:
+        """Coloca uma task na fila"""
+        task.status = TaskStatus.PENDING
+        if priority is not None:
+            task.priority = priority
+        task.lease_owner = None
+        task.lease_expires_at = None
+        task.add_event("queued", f"Task enfileirada (prioridade {task.priority})")
+        
+        if not self.store.save_task(task):
+            return False
+        self.notify()
+        return True
+    
+    def notify(self):
+        """Acorda o dispatcher para procurar tasks imediatamente (seguro entre threads)"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    def _lease_active(self, task: Task, now: datetime) -> bool:
+        """Indica se a task está com um lease válido"""
+        return task.lease_expires_at is not None and task.lease_expires_at > now
+    
+    def _candidates(self, now: datetime) -> List[Task]:
+        """Tasks reivindicáveis, em ordem de prioridade e chegada"""
+        pending = self.store.get_tasks_by_status(TaskStatus.PENDING)
+        expired = [
+            task for task in self.store.get_tasks_by_status(TaskStatus.IN_PROGRESS)
+            if task.lease_expires_at is not None and not self._lease_active(task, now)
+        ]
+        return sorted(pending + expired, key=lambda task: (-task.priority, task.created_at))
+    
+    def running_counts(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Quantidade de tasks com lease ativo por projeto"""
+        now = now or datetime.now()
+        counts: Dict[str, int] = {}
+        for task in self.store.get_tasks_by_status(TaskStatus.IN_PROGRESS):
+            if self._lease_active(task, now):
+                counts[task.project] = counts.get(task.project, 0) + 1
+        return counts
+    
+    def claim(self, skip: Optional[Callable[[str], bool]] = None) -> Optional[Task]:
+        """Reivindica a próxima task respeitando os limites global e por projeto
+        
+        ``skip`` permite ignorar tasks que este processo ainda está executando
+        (lease expirado durante um pipeline longo).
+        """
+        with self._claim_lock:
+            try:
+                now = datetime.now()
+                counts = self.running_counts(now)
+                if sum(counts.values()) >= self.max_global:
+                    return None
+                
+                for candidate in self._candidates(now):
+                    if counts.get(candidate.project, 0) >= self.max_per_project:
+                        continue
+                    if skip is not None and skip(candidate.id):
+                        continue
+                    
+                    # Versão antes da leitura: se a task mudar no meio, a gravação falha
+                    version = self.store.get_task_version(candidate.id)
+                    task = self.store.get_task(candidate.id, include_history=False)
+                    if task is None or version is None:
+                        continue
+                    
+                    if task.attempts >= self.max_attempts:
+                        task.status = TaskStatus.FAILED
+                        task.lease_owner = None
+                        task.lease_expires_at = None
+                        task.add_event("failed", f"Task abandonada após {task.attempts} tentativas")
+                        self.store.save_task(task, expected_version=version)
+                        continue
+                    
+                    task.status = TaskStatus.IN_PROGRESS
+                    task.lease_owner = self.worker_id
+                    task.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+                    task.attempts += 1
+                    task.add_event("claimed", f"Task reivindicada por {self.worker_id} (tentativa {task.attempts})")
+                    
+                    if self.store.save_task(task, expected_version=version):
+                        logger.info(f"Task {task.id} reivindicada por {self.worker_id}")
+                        return task
+                    
+                    logger.info(f"Task {task.id} reivindicada por outro worker")
+                
+                return None
+            
+            except Exception as e:
+                logger.error(f"Erro ao reivindicar task: {e}")
+                return None
+    
+    def renew(self, task_id: str) -> bool:
+        """Estende o lease de uma task que este worker está executando
+        
+        Usa o mesmo ``expected_version`` do ``claim``: falha se a task mudou de
+        dono ou não está mais ``IN_PROGRESS``.
+        """
+        for _ in range(3):
+            try:
+                version = self.store.get_task_version(task_id)
+                task = self.store.get_task(task_id, include_history=False)
+                if task is None or version is None:
+                    return False
+                if task.lease_owner != self.worker_id or task.status != TaskStatus.IN_PROGRESS:
+                    return False
+                
+                task.lease_expires_at = datetime.now() + timedelta(seconds=self.lease_seconds)
+                if self.store.save_task(task, expected_version=version):
+                    return True
+            except Exception as e:
+                logger.error(f"Erro ao renovar lease da task {task_id}: {e}")
+                return False
+        
+        logger.warning(f"Não foi possível renovar o lease da task {task_id}")
+        return False
+    
+    async def _heartbeat(self, task_id: str, executor: TaskExecutor):
+        """Renova o lease periodicamente; cancela o pipeline se a renovação falhar"""
+        interval = self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            if not await asyncio.to_thread(self.renew, task_id):
+                logger.warning(f"Lease da task {task_id} perdido; abortando execução")
+                executor.cancel(task_id)
+                return
+    
+    def release(self, task_id: str, requeue: bool = False) -> bool:
+        """Libera o lease de uma task
+        
+        Com ``requeue`` a task volta para a fila; caso contrário, uma task que
+        ainda esteja ``IN_PROGRESS`` (pipeline interrompido) é marcada como
+        ``FAILED``.
+        """
+        for _ in range(3):
+            version = self.store.get_task_version(task_id)
+            task = self.store.get_task(task_id, include_history=False)
+            if task is None or version is None:
+                return False
+            if task.lease_owner != self.worker_id:
+                return False
+            
+            task.lease_owner = None
+            task.lease_expires_at = None
+            if requeue:
+                task.status = TaskStatus.PENDING
+                task.attempts = max(task.attempts - 1, 0)
+            elif task.status == TaskStatus.IN_PROGRESS:
+                task.status = TaskStatus.FAILED
+                task.add_event("failed", "Execução terminou sem status final")
+            
+            if self.store.save_task(task, expected_version=version):
+                return True
+        
+        logger.warning(f"Não foi possível liberar o lease da task {task_id}")
+        return False
+    
+    async def run(self, executor: TaskExecutor, on_complete: Optional[CompletionCallback] = None,
+                  poll_interval: Optional[float] = None):
+        """Loop do dispatcher: reivindica tasks e as submete ao executor"""
+        poll_interval = poll_interval if poll_interval is not None else config.TASK_QUEUE_POLL_SECONDS
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        heartbeats: Dict[str, asyncio.Task] = {}
+        
+        async def finish(task_id, result):
+            heartbeat = heartbeats.pop(task_id, None)
+            if heartbeat is not None:
+                heartbeat.cancel()
+            await asyncio.to_thread(self.release, task_id)
+            self.notify()
+            if on_complete:
+                await on_complete(task_id, result)
+        
+        logger.info(f"Dispatcher da fila iniciado ({self.worker_id})")
+        try:
+            while True:
+                while executor.active_count < self.max_global:
+                    task = await asyncio.to_thread(self.claim, executor.is_running)
+                    if task is None:
+                        break
+                    if not executor.submit(task.id, finish):
+                        await asyncio.to_thread(self.release, task.id, True)
+                        break
+                    heartbeats[task.id] = asyncio.create_task(self._heartbeat(task.id, executor))
+                
+                # ``asyncio.wait`` em vez de ``wait_for``: no 3.11 um cancelamento que
+                # chega junto com o timeout vira TimeoutError e o loop não para
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=poll_interval)
+                finally:
+                    waiter.cancel()
+                self._wakeup.clear()
+        finally:
+            for heartbeat in heartbeats.values():
+                heartbeat.cancel()
+
+# Instância global
+task_queue = TaskQueue()
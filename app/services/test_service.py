@@ -1,4 +1,5 @@
 import subprocess
+import threading
 import time
 from pathlib import Path
 from typing import Tuple, Optional
@@ -9,8 +10,12 @@ logger = structlog.get_logger(__name__)
 class TestService:
     """Serviço para executar testes"""
     
-    def run_tests(self, repo_root: Path, test_command: str, timeout: int = 300) -> Tuple[bool, str]:
-        """Executa testes com timeout e captura de output"""
+    def run_tests(self, repo_root: Path, test_command: str, timeout: int = 300,
+                  cancel: Optional[threading.Event] = None) -> Tuple[bool, str]:
+        """Executa testes com timeout e captura de output
+        
+        Com ``cancel`` o processo é encerrado assim que o evento é sinalizado.
+        """
         try:
             logger.info(f"Executando testes: {test_command} em {repo_root}")
             
@@ -19,13 +24,19 @@ class TestService:
                 return False, f"Diretório {repo_root} não existe"
             
             # Executar comando de teste
-            result = subprocess.run(
-                test_command.split(),
-                cwd=repo_root,
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
+            if cancel is None:
+                result = subprocess.run(
+                    test_command.split(),
+                    cwd=repo_root,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
+            else:
+                result = self._run_cancellable(test_command.split(), repo_root, timeout, cancel)
+                if result is None:
+                    logger.info(f"Testes em {repo_root} cancelados")
+                    return False, "Execução dos testes cancelada"
             
             # Capturar output
             stdout = result.stdout or ""
@@ -55,6 +66,23 @@ class TestService:
             logger.error(error_msg)
             return False, error_msg
     
+    def _run_cancellable(self, args: list, cwd: Path, timeout: int,
+                         cancel: threading.Event) -> Optional[subprocess.CompletedProcess]:
+        """Executa um comando que pode ser interrompido por ``cancel`` (None se cancelado)"""
+        process = subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=0.2)
+                return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                if cancel.is_set() or time.monotonic() >= deadline:
+                    process.kill()
+                    process.communicate()
+                    if cancel.is_set():
+                        return None
+                    raise subprocess.TimeoutExpired(args, timeout)
+    
     def run_specific_test(self, repo_root: Path, test_file: str, test_function: Optional[str] = None) -> Tuple[bool, str]:
         """Executa um teste específico"""
         try:
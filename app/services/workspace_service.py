@@ -0,0 +1,111 @@
+import shutil
+from pathlib import Path
+from typing import Optional
+import git
+import structlog
+
+from ..config import config
+from .prefetch_service import RepoPrefetcher, repo_prefetcher
+from .repo_cache import RepoCache, repo_cache
+
+logger = structlog.get_logger(__name__)
+
+class WorkspaceService:
+    """Diretórios de trabalho isolados por task usando ``git worktree``
+    
+    Os objetos e refs de cada remoto ficam no clone bare do ``RepoCache``;
+    cada task ganha seu próprio worktree em
+    ``<base>/worktrees/<projeto>/<task_id>``, com a branch da task. Tasks do
+    mesmo projeto não disputam mais o mesmo working tree.
+    
+    Um prefetch em andamento para o mesmo remoto é aguardado antes de criar
+    o worktree, que então parte do fetch recém-feito em vez de repeti-lo.
+    """
+    
+    def __init__(self, base_dir: Optional[Path] = None, cache: Optional[RepoCache] = None,
+                 prefetcher: Optional[RepoPrefetcher] = None):
+        self.base_dir = base_dir or config.WORKDIR_BASE
+        self.cache = cache or repo_cache
+        self.prefetcher = prefetcher or repo_prefetcher
+    
+    def worktree_path(self, name: str, task_id: str) -> Path:
+        """Caminho do worktree de uma task"""
+        return self.base_dir / "worktrees" / name / task_id
+    
+    def create_worktree(self, repo_url: str, name: str, task_id: str,
+                        base_branch: str, branch_name: str,
+                        start_point: Optional[str] = None) -> Path:
+        """Cria o worktree da task com uma branch nova a partir de ``origin/<base_branch>``
+        
+        ``start_point`` (um commit) substitui ``origin/<base_branch>`` como ponto de partida.
+        """
+        worktree_path = self.worktree_path(name, task_id)
+        
+        # O fetch agendado na criação da task normalmente já terminou
+        self.prefetcher.wait(repo_url)
+        with self.cache.lock(repo_url):
+            repo = self.cache.mirror(repo_url)
+            
+            # Sobras de uma execução anterior da mesma task
+            if worktree_path.exists():
+                self._remove_worktree(repo, worktree_path)
+            if branch_name in repo.heads:
+                repo.git.branch("-D", branch_name)
+            
+            worktree_path.parent.mkdir(parents=True, exist_ok=True)
+            repo.git.worktree("add", "-b", branch_name, str(worktree_path), start_point or f"origin/{base_branch}")
+        
+        logger.info(f"Worktree da task {task_id} criado em {worktree_path} (branch {branch_name})")
+        return worktree_path
+    
+    def reset_worktree(self, name: str, task_id: str, base_ref: str) -> bool:
+        """Volta o worktree (e a branch) da task para ``base_ref``, descartando o resto
+        
+        Arquivos ignorados pelo ``.gitignore`` (ambientes, caches de build)
+        são mantidos para que a próxima tentativa não precise recriá-los.
+        """
+        try:
+            repo = git.Repo(self.worktree_path(name, task_id))
+            repo.git.reset("--hard", base_ref)
+            repo.git.clean("-fd")
+            logger.info(f"Worktree da task {task_id} restaurado para {base_ref[:12]}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Erro ao restaurar worktree da task {task_id}: {e}")
+            return False
+    
+    def _remove_worktree(self, repo: git.Repo, worktree_path: Path):
+        """Remove um worktree e seus metadados"""
+        try:
+            repo.git.worktree("remove", "--force", str(worktree_path))
+        except git.GitCommandError:
+            shutil.rmtree(worktree_path, ignore_errors=True)
+        repo.git.worktree("prune")
+    
+    def remove_worktree(self, repo_url: str, name: str, task_id: str,
+                        branch_name: Optional[str] = None) -> bool:
+        """Remove o worktree de uma task (e a branch local, se informada)"""
+        try:
+            worktree_path = self.worktree_path(name, task_id)
+            mirror_path = self.cache.mirror_path(repo_url)
+            if not mirror_path.exists():
+                shutil.rmtree(worktree_path, ignore_errors=True)
+                return True
+            
+            with self.cache.lock(repo_url):
+                repo = git.Repo(mirror_path)
+                if worktree_path.exists():
+                    self._remove_worktree(repo, worktree_path)
+                if branch_name and branch_name in repo.heads:
+                    repo.git.branch("-D", branch_name)
+            
+            logger.info(f"Worktree da task {task_id} removido")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Erro ao remover worktree da task {task_id}: {e}")
+            return False
+
+# Instância global
+workspace_service = WorkspaceService()
@@ -6,15 +6,19 @@ import structlog
 
 from .config import config
 from .models.schemas import ProjectConfig, UserSession
-from .models.state_store import state_store
+from .models.async_state_store import async_state_store
 from .agents.manager import manager_agent
 from .agents.programmer import programmer_agent
 from .services.logging_service import log_agent_action
+from .services.task_executor import task_executor
+from .services.task_queue import task_queue
+from .services.prefetch_service import repo_prefetcher
 
 logger = structlog.get_logger(__name__)
 
 # Configurar agentes
 manager_agent.set_programmer_agent(programmer_agent)
+task_executor.set_pipeline(manager_agent.review_and_iterate)
 
 class TelegramBot:
     """Bot do Telegram para interação com o sistema multi-agentes"""
@@ -69,7 +73,7 @@ Vamos começar! 🚀
             
             if len(args) < 2:
                 # Listar projetos existentes
-                projects = state_store.list_projects()
+                projects = await async_state_store.list_projects()
                 if projects:
                     projects_text = "📋 Projetos disponíveis:\n\n"
                     for i, project in enumerate(projects, 1):
@@ -83,17 +87,20 @@ Vamos começar! 🚀
             project_name = args[1].strip()
             
             # Verificar se projeto já existe
-            existing_project = state_store.get_project(project_name)
+            existing_project = await async_state_store.get_project(project_name)
             
             if existing_project:
                 # Projeto existe - selecionar
-                state_store.update_session_project(user_id, project_name)
+                await async_state_store.update_session_project(user_id, project_name)
+                if existing_project.repo_url:
+                    repo_prefetcher.prefetch(existing_project.repo_url)
                 
                 # Gerar URL automática se não estiver configurada
                 if not existing_project.repo_url:
                     repo_url = f"https://github.com/henrique-maceira/{project_name}"
                     existing_project.repo_url = repo_url
-                    state_store.save_project(existing_project)
+                    await async_state_store.save_project(existing_project)
+                    repo_prefetcher.prefetch(repo_url)
                     await message.answer(
                         f"✅ Projeto {project_name} selecionado!\n"
                         f"🔗 Repositório configurado: {repo_url}\n"
@@ -115,8 +122,9 @@ Vamos começar! 🚀
                     test_command="pytest -q"
                 )
                 
-                if state_store.save_project(project_config):
-                    state_store.update_session_project(user_id, project_name)
+                if await async_state_store.save_project(project_config):
+                    await async_state_store.update_session_project(user_id, project_name)
+                    repo_prefetcher.prefetch(repo_url)
                     await message.answer(
                         f"✅ Projeto {project_name} criado!\n"
                         f"🔗 Repositório: {repo_url}\n"
@@ -136,14 +144,14 @@ Vamos começar! 🚀
             user_id = message.from_user.id
             
             # Verificar se usuário tem projeto selecionado
-            session = state_store.get_session(user_id)
+            session = await async_state_store.get_session(user_id)
             if not session or not session.current_project:
                 await message.answer("❌ Nenhum projeto selecionado. Use /projeto <nome> primeiro")
                 return
             
             if len(args) < 2:
                 # Mostrar repositório atual
-                project_config = state_store.get_project(session.current_project)
+                project_config = await async_state_store.get_project(session.current_project)
                 if project_config and project_config.repo_url:
                     await message.answer(
                         f"🔗 Repositório atual:\n"
@@ -158,13 +166,14 @@ Vamos começar! 🚀
             repo_url = args[1].strip()
             
             # Atualizar configuração do projeto
-            project_config = state_store.get_project(session.current_project)
+            project_config = await async_state_store.get_project(session.current_project)
             if not project_config:
                 await message.answer("❌ Projeto não encontrado")
                 return
             
             project_config.repo_url = repo_url
-            if state_store.save_project(project_config):
+            if await async_state_store.save_project(project_config):
+                repo_prefetcher.prefetch(repo_url)
                 await message.answer(
                     f"✅ Repositório configurado!\n"
                     f"Projeto: {session.current_project}\n"
@@ -190,12 +199,12 @@ Vamos começar! 🚀
             user_id = message.from_user.id
             
             # Verificar se usuário tem projeto configurado
-            session = state_store.get_session(user_id)
+            session = await async_state_store.get_session(user_id)
             if not session or not session.current_project:
                 await message.answer("❌ Nenhum projeto selecionado. Use `/projeto <nome>` primeiro")
                 return
             
-            project_config = state_store.get_project(session.current_project)
+            project_config = await async_state_store.get_project(session.current_project)
             if not project_config:
                 await message.answer("❌ Projeto não encontrado")
                 return
@@ -208,39 +217,21 @@ Vamos começar! 🚀
             processing_msg = await message.answer("🔄 Processando tarefa...")
             
             try:
-                # Criar task
-                task = manager_agent.create_task(project_config, task_description)
+                # Criar task (chamada ao LLM fora do event loop); ela já entra na fila
+                task = await asyncio.to_thread(
+                    manager_agent.create_task, project_config, task_description, message.chat.id
+                )
+                task_queue.notify()
                 
-                # Atualizar mensagem
+                # Atualizar mensagem; o resultado chega pelo dispatcher da fila
                 await processing_msg.edit_text(
                     f"✅ Task criada!\n\n"
                     f"ID: {task.id}\n"
                     f"Objetivo: {task.objective}\n"
                     f"Status: {task.status.value}\n\n"
-                    f"🔄 Iniciando implementação..."
+                    f"🔄 Task na fila de implementação. Use /status {task.id} para acompanhar"
                 )
                 
-                # Executar implementação
-                success, result, pr_url = manager_agent.review_and_iterate(task.id)
-                
-                if success:
-                    await processing_msg.edit_text(
-                        f"🎉 Task concluída com sucesso!\n\n"
-                        f"ID: {task.id}\n"
-                        f"Objetivo: {task.objective}\n"
-                        f"Status: {task.status.value}\n"
-                        f"PR: {pr_url or 'N/A'}\n\n"
-                        f"✅ Implementação aprovada e PR criado!"
-                    )
-                else:
-                    await processing_msg.edit_text(
-                        f"⚠️ Task precisa de ajustes\n\n"
-                        f"ID: {task.id}\n"
-                        f"Objetivo: {task.objective}\n"
-                        f"Status: {task.status.value}\n\n"
-                        f"Feedback:\n{result}"
-                    )
-                    
             except Exception as e:
                 logger.error(f"Erro ao processar tarefa: {e}")
                 await processing_msg.edit_text(
@@ -252,6 +243,36 @@ Vamos começar! 🚀
             logger.error(f"Erro no comando tarefa: {e}")
             await message.answer("❌ Erro interno ao processar comando")
     
+    async def _report_task_result(self, task_id: str, result):
+        """Envia ao chat de origem o resultado da execução de uma task"""
+        success, feedback, pr_url = result
+        task = await async_state_store.get_task(task_id, include_history=False)
+        if not task or not task.chat_id:
+            logger.warning(f"Task {task_id} sem chat para notificar")
+            return
+        objective = task.objective
+        status = task.status.value
+        
+        if success:
+            text = (
+                f"🎉 Task concluída com sucesso!\n\n"
+                f"ID: {task_id}\n"
+                f"Objetivo: {objective}\n"
+                f"Status: {status}\n"
+                f"PR: {pr_url or 'N/A'}\n\n"
+                f"✅ Implementação aprovada e PR criado!"
+            )
+        else:
+            text = (
+                f"⚠️ Task precisa de ajustes\n\n"
+                f"ID: {task_id}\n"
+                f"Objetivo: {objective}\n"
+                f"Status: {status}\n\n"
+                f"Feedback:\n{feedback}"
+            )
+        
+        await self.bot.send_message(task.chat_id, text)
+    
     async def cmd_status(self, message: Message):
         """Comando /status - verifica status de uma tarefa"""
         try:
@@ -261,7 +282,7 @@ Vamos começar! 🚀
                 return
             
             task_id = args[1].strip()
-            task = state_store.get_task(task_id)
+            task = await async_state_store.get_task(task_id, include_history=False)
             
             if not task:
                 await message.answer("❌ Task não encontrada")
@@ -269,7 +290,7 @@ Vamos começar! 🚀
             
             # Formatar histórico
             history_text = ""
-            for event in task.history[-5:]:  # Últimos 5 eventos
+            for event in await async_state_store.get_task_history(task_id, limit=5):  # Últimos 5 eventos
                 history_text += f"• {event.timestamp.strftime('%H:%M:%S')} - {event.message}\n"
             
             status_text = f"""
@@ -332,6 +353,14 @@ Fluxo típico:
     async def start(self):
         """Inicia o bot"""
         logger.info("Iniciando bot do Telegram...")
+        
+        # Dispatcher da fila: retoma tasks pendentes e executa as novas
+        self._dispatcher = asyncio.create_task(
+            task_queue.run(task_executor, self._report_task_result)
+        )
+        
+        # Mantém os repositórios dos projetos atualizados em background
+        self._prefetcher = asyncio.create_task(repo_prefetcher.run())
         await self.dp.start_polling(self.bot)
 
 # Instância global
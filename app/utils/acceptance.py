@@ -0,0 +1,194 @@
+"""
+Avaliação local e segura das expressões de ``ProjectConfig.acceptance_checks``
+"""
+
+import ast
+import fnmatch
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .stream_parsers import HUNK_RE
+
+# Funções disponíveis nas expressões (além de ``touches``, ligada ao contexto)
+SAFE_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "len": len,
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "any": any,
+    "all": all,
+}
+
+COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+ARITHMETIC = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+}
+
+class UndecidableCheck(ValueError):
+    """A expressão não pode ser decidida localmente (sintaxe não suportada ou dado ausente)"""
+
+@lru_cache(maxsize=256)
+def _parse(expression: str) -> ast.Expression:
+    """Compila e valida uma expressão (resultado reaproveitado entre tasks)"""
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise UndecidableCheck(f"Expressão inválida: {expression!r}") from e
+    
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not,
+                             ast.USub, ast.Compare, ast.BinOp, ast.Name, ast.Load, ast.Constant,
+                             ast.List, ast.Tuple)):
+            continue
+        if isinstance(node, tuple(COMPARISONS)) or isinstance(node, tuple(ARITHMETIC)):
+            continue
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            continue
+        raise UndecidableCheck(f"Construção não suportada em {expression!r}: {type(node).__name__}")
+    return tree
+
+def _eval(node: ast.AST, names: Dict[str, Any]) -> Any:
+    """Avalia um nó já validado"""
+    if isinstance(node, ast.Expression):
+        return _eval(node.body, names)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if names.get(node.id) is None:
+            raise UndecidableCheck(f"Valor não disponível: {node.id}")
+        return names[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_eval(element, names) for element in node.elts]
+    if isinstance(node, ast.BoolOp):
+        if isinstance(node.op, ast.And):
+            return all(_eval(value, names) for value in node.values)
+        return any(_eval(value, names) for value in node.values)
+    if isinstance(node, ast.UnaryOp):
+        value = _eval(node.operand, names)
+        return not value if isinstance(node.op, ast.Not) else -value
+    if isinstance(node, ast.BinOp):
+        op = ARITHMETIC.get(type(node.op))
+        if op is None:
+            raise UndecidableCheck(f"Operador não suportado: {type(node.op).__name__}")
+        return op(_eval(node.left, names), _eval(node.right, names))
+    if isinstance(node, ast.Compare):
+        left = _eval(node.left, names)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _eval(comparator, names)
+            if not COMPARISONS[type(op)](left, right):
+                return False
+            left = right
+        return True
+    if isinstance(node, ast.Call):
+        function = names.get(node.func.id)
+        if not callable(function):
+            raise UndecidableCheck(f"Função não disponível: {node.func.id}")
+        return function(*[_eval(arg, names) for arg in node.args])
+    raise UndecidableCheck(f"Construção não suportada: {type(node).__name__}")
+
+def evaluate_check(expression: str, context: Dict[str, Any]) -> bool:
+    """Avalia uma expressão de aceitação sobre o contexto
+    
+    Só literais, nomes do contexto, comparações, operadores lógicos,
+    aritmética simples e as funções de ``SAFE_FUNCTIONS`` são aceitos; nada
+    de atributos, índices ou ``eval``. Levanta ``UndecidableCheck`` quando a
+    expressão usa algo fora disso ou um valor ausente (None) do contexto.
+    """
+    tree = _parse(expression)
+    names = dict(SAFE_FUNCTIONS)
+    names.update(context)
+    files = context.get("touched_files") or []
+    names["touches"] = lambda pattern: any(fnmatch.fnmatch(path, pattern) for path in files)
+    try:
+        return bool(_eval(tree, names))
+    except UndecidableCheck:
+        raise
+    except Exception as e:
+        raise UndecidableCheck(f"Erro ao avaliar {expression!r}: {e}") from e
+
+def evaluate_checks(checks: List[str], context: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+    """Avalia todas as expressões e retorna (aprovadas, reprovadas, indecidíveis)"""
+    passed: List[str] = []
+    failed: List[str] = []
+    undecided: List[str] = []
+    for check in checks:
+        try:
+            (passed if evaluate_check(check, context) else failed).append(check)
+        except UndecidableCheck:
+            undecided.append(check)
+    return passed, failed, undecided
+
+def diff_stats(diff: str) -> Dict[str, Any]:
+    """Arquivos tocados e linhas adicionadas/removidas de um diff unificado
+    
+    Como no ``DiffStreamParser``, os hunks são contados pelo cabeçalho
+    ``@@``: dentro de um hunk, ``--- x``/``+++ x`` são linhas removidas ou
+    adicionadas, não cabeçalhos de arquivo.
+    """
+    files: List[str] = []
+    added = removed = 0
+    old_left = new_left = 0
+    for line in diff.splitlines():
+        if old_left > 0 or new_left > 0:
+            if line.startswith("-"):
+                removed += 1
+                old_left -= 1
+            elif line.startswith("+"):
+                added += 1
+                new_left -= 1
+            elif not line.startswith("\\"):
+                # Contexto (``\ No newline at end of file`` não conta)
+                old_left -= 1
+                new_left -= 1
+            continue
+        
+        hunk = HUNK_RE.match(line)
+        if hunk:
+            old_left = int(hunk.group(1)) if hunk.group(1) is not None else 1
+            new_left = int(hunk.group(2)) if hunk.group(2) is not None else 1
+        elif line.startswith("+++ "):
+            path = line[4:].split("\t")[0].strip()
+            if path != "/dev/null":
+                files.append(path[2:] if path.startswith("b/") else path)
+        elif line.startswith("--- "):
+            path = line[4:].split("\t")[0].strip()
+            if path != "/dev/null" and path.startswith("a/"):
+                # Arquivo removido: o caminho só aparece na linha ``---``
+                files.append(path[2:])
+        elif line.startswith("+"):
+            added += 1
+        elif line.startswith("-"):
+            removed += 1
+    touched = list(dict.fromkeys(files))
+    return {
+        "touched_files": touched,
+        "files_touched": len(touched),
+        "lines_added": added,
+        "lines_removed": removed,
+        "diff_lines": added + removed,
+    }
+
+def build_context(diff: str, tests_passed: bool, lint_passed: Optional[bool] = None) -> Dict[str, Any]:
+    """Contexto das expressões de aceitação para uma implementação
+    
+    ``lint_passed`` fica None (indecidível) quando o projeto não tem
+    ``lint_command``.
+    """
+    context = diff_stats(diff)
+    context["tests_passed"] = tests_passed
+    context["lint_passed"] = lint_passed
+    return context
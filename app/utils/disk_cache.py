@@ -0,0 +1,125 @@
+"""
+Cache em disco com chave por hash e descarte LRU por tamanho total
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+class DiskCache:
+    """Cache de textos em disco, limitado em bytes
+    
+    Cada entrada é um arquivo ``<dir>/<2 primeiros caracteres>/<sha256 da chave>``
+    gravado de forma atômica. O mtime marca o último acesso; quando o total
+    passa de ``max_bytes`` as entradas menos usadas são removidas.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        
+        self._size: Optional[int] = None  # calculado no primeiro put
+        self._lock = threading.Lock()
+    
+    def _entry_path(self, key: str) -> Path:
+        """Caminho da entrada de uma chave"""
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.cache_dir / digest[:2] / digest
+    
+    def get(self, key: str) -> Optional[str]:
+        """Conteúdo de uma chave (None se ausente), marcando o acesso"""
+        entry_path = self._entry_path(key)
+        try:
+            value = entry_path.read_text(encoding='utf-8')
+            os.utime(entry_path)
+        except (OSError, UnicodeDecodeError):
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return value
+    
+    def put(self, key: str, value: str) -> bool:
+        """Grava uma entrada e descarta as menos usadas se passar do limite"""
+        data = value.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return False
+        
+        entry_path = self._entry_path(key)
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                with self._lock:
+                    previous = entry_path.stat().st_size if entry_path.exists() else 0
+                    os.replace(tmp_path, entry_path)
+                    if self._size is None:
+                        self._size = self._scan_size()
+                    else:
+                        self._size += len(data) - previous
+                    if self._size > self.max_bytes:
+                        self._evict()
+            except Exception:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            return True
+        
+        except OSError as e:
+            logger.warning(f"Erro ao gravar no cache {self.cache_dir}: {e}")
+            return False
+    
+    def _entries(self):
+        """Arquivos de entrada do cache (sem temporários)"""
+        if not self.cache_dir.exists():
+            return []
+        return [p for p in self.cache_dir.glob("*/*") if not p.name.startswith('.')]
+    
+    def _scan_size(self) -> int:
+        """Soma o tamanho de todas as entradas em disco"""
+        total = 0
+        for entry_path in self._entries():
+            try:
+                total += entry_path.stat().st_size
+            except OSError:
+                pass
+        return total
+    
+    def _evict(self):
+        """Remove as entradas menos usadas até ficar abaixo do limite"""
+        entries = []
+        for entry_path in self._entries():
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        entries.sort()
+        
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        
+        self._size = total
+        logger.info(f"Cache {self.cache_dir}: {removed} entradas descartadas")
+    
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            for entry_path in self._entries():
+                entry_path.unlink(missing_ok=True)
+            self._size = 0
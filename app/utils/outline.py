@@ -0,0 +1,55 @@
+"""
+Resumo de arquivos Python por assinaturas (módulo, classes e funções)
+"""
+
+import ast
+from typing import List, Optional, Union
+
+FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+def _first_line(node: ast.AST) -> Optional[str]:
+    """Primeira linha da docstring do nó"""
+    docstring = ast.get_docstring(node, clean=True)
+    if not docstring:
+        return None
+    return docstring.strip().splitlines()[0]
+
+def _function_signature(node: FunctionNode) -> str:
+    """Assinatura de uma função com anotações e retorno"""
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature + ": ..."
+
+def _outline_body(body: List[ast.stmt], indent: str, lines: List[str]):
+    """Acrescenta classes e funções de um bloco ao resumo"""
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for decorator in node.decorator_list:
+                lines.append(f"{indent}@{ast.unparse(decorator)}")
+            line = f"{indent}{_function_signature(node)}"
+            doc = _first_line(node)
+            lines.append(f"{line}  # {doc}" if doc else line)
+        elif isinstance(node, ast.ClassDef):
+            for decorator in node.decorator_list:
+                lines.append(f"{indent}@{ast.unparse(decorator)}")
+            bases = [ast.unparse(base) for base in node.bases + node.keywords]
+            line = f"{indent}class {node.name}({', '.join(bases)}):" if bases else f"{indent}class {node.name}:"
+            doc = _first_line(node)
+            lines.append(f"{line}  # {doc}" if doc else line)
+            _outline_body(node.body, indent + "    ", lines)
+
+def python_outline(source: str) -> Optional[str]:
+    """Resumo de um módulo Python (None se o código não compila)"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    
+    lines = []
+    doc = _first_line(tree)
+    if doc:
+        lines.append(f'"""{doc}"""')
+    _outline_body(tree.body, "", lines)
+    return "\n".join(lines)
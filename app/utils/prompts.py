@@ -57,6 +57,7 @@ IMPORTANTE:
 - Use o formato git diff -U0
 - Não inclua texto explicativo
 - Certifique-se de que o diff pode ser aplicado limpo
+- Arquivos do mapa com "..." no lugar do corpo estão resumidos: não edite linhas que não foram mostradas
 - Considere o feedback anterior se fornecido
 
 EXEMPLO DE FORMATO:
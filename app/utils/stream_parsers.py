@@ -0,0 +1,167 @@
+"""
+Validação incremental de respostas do LLM recebidas por streaming
+"""
+
+import re
+from typing import Callable, List, Optional
+
+DIFF_PREFIXES = ('--- a/', 'diff --git')
+HUNK_RE = re.compile(r'^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@')
+
+class StreamAborted(ValueError):
+    """A resposta em andamento claramente não está no formato esperado"""
+
+class DiffStreamParser:
+    """Acompanha um diff unificado conforme os tokens chegam
+    
+    Interrompe (``StreamAborted``) assim que o início da resposta não pode
+    mais ser um diff e entrega cada seção de arquivo completa para
+    ``on_section`` antes do fim do stream. Os hunks são contados pelo
+    cabeçalho ``@@``, então linhas removidas que começam com ``--`` não
+    são confundidas com o início de outro arquivo.
+    """
+    
+    def __init__(self, on_section: Optional[Callable[[str], None]] = None):
+        self.on_section = on_section
+        self.sections: List[str] = []
+        
+        self._chunks: List[str] = []
+        self._partial = ""
+        self._checked_prefix = False
+        self._section: List[str] = []
+        self._old_left = 0
+        self._new_left = 0
+    
+    def feed(self, text: str):
+        """Processa um trecho da resposta"""
+        self._chunks.append(text)
+        self._partial += text
+        if not self._checked_prefix:
+            self._check_prefix()
+        
+        *lines, self._partial = self._partial.split('\n')
+        for line in lines:
+            self._feed_line(line)
+    
+    def _check_prefix(self):
+        """Confere o início da resposta assim que há caracteres suficientes"""
+        head = ''.join(self._chunks).lstrip()
+        needed = max(len(prefix) for prefix in DIFF_PREFIXES)
+        if any(head.startswith(prefix) for prefix in DIFF_PREFIXES):
+            self._checked_prefix = True
+        elif len(head) >= needed or not any(prefix.startswith(head) for prefix in DIFF_PREFIXES):
+            raise StreamAborted(f"Resposta não é um diff válido: {head[:40]!r}")
+    
+    def _feed_line(self, line: str):
+        """Classifica uma linha completa do diff"""
+        if self._old_left > 0 or self._new_left > 0:
+            # Corpo de hunk
+            if line.startswith(' ') or line == '':
+                self._old_left -= 1
+                self._new_left -= 1
+            elif line.startswith('-'):
+                self._old_left -= 1
+            elif line.startswith('+'):
+                self._new_left -= 1
+            self._section.append(line)
+            return
+        
+        if line.startswith('diff --git') or (line.startswith('--- ') and not self._pending_header()):
+            self._emit_section()
+        
+        hunk = HUNK_RE.match(line)
+        if hunk:
+            self._old_left = int(hunk.group(1)) if hunk.group(1) is not None else 1
+            self._new_left = int(hunk.group(2)) if hunk.group(2) is not None else 1
+        if line or self._section:
+            self._section.append(line)
+    
+    def _pending_header(self) -> bool:
+        """Indica se a seção atual só tem o cabeçalho ``diff --git`` (sem hunks)"""
+        return bool(self._section) and not any(line.startswith('@@') for line in self._section) \
+            and not any(line.startswith('--- ') for line in self._section)
+    
+    def _emit_section(self):
+        """Entrega a seção de arquivo acumulada"""
+        while self._section and not self._section[-1].strip():
+            self._section.pop()
+        if not self._section:
+            return
+        section = '\n'.join(self._section) + '\n'
+        self._section = []
+        self.sections.append(section)
+        if self.on_section:
+            self.on_section(section)
+    
+    def close(self) -> str:
+        """Finaliza o stream, entregando a última seção, e retorna o texto completo"""
+        if not self._checked_prefix:
+            self._check_prefix()
+            if not self._checked_prefix:
+                raise StreamAborted("Resposta não é um diff válido: resposta incompleta")
+        if self._partial:
+            self._feed_line(self._partial)
+            self._partial = ""
+        self._emit_section()
+        return ''.join(self._chunks).strip()
+
+class JSONStreamParser:
+    """Acompanha um objeto JSON conforme os tokens chegam
+    
+    Aceita texto antes do objeto até ``max_preamble`` caracteres e indica
+    quando o objeto de nível mais alto foi fechado, para que o stream possa
+    ser encerrado sem esperar o resto da resposta.
+    """
+    
+    def __init__(self, max_preamble: int = 500):
+        self.max_preamble = max_preamble
+        self.done = False
+        
+        self._chunks: List[str] = []
+        self._seen = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """Processa um trecho da resposta; True quando o objeto está completo"""
+        if self.done:
+            return True
+        self._chunks.append(text)
+        
+        for index, char in enumerate(text):
+            self._seen += 1
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                elif self._seen > self.max_preamble:
+                    raise StreamAborted("Resposta não contém JSON")
+                continue
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    # Descarta o que vier depois do objeto
+                    self._chunks[-1] = text[:index + 1]
+                    self.done = True
+                    return True
+        return False
+    
+    def close(self) -> str:
+        """Texto recebido até o fim do objeto"""
+        if not self._started:
+            raise StreamAborted("Resposta não contém JSON")
+        return ''.join(self._chunks).strip()
@@ -0,0 +1,39 @@
+"""
+Utilitários de tokens: estimativa de tamanho de prompt e tokenização de código
+"""
+
+import math
+import re
+from typing import List
+
+# Aproximação de caracteres por token para os modelos GPT (texto e código)
+CHARS_PER_TOKEN = 4
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+CAMEL_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+STOPWORDS = {
+    # Inglês / palavras-chave comuns em código
+    'the', 'and', 'for', 'with', 'this', 'that', 'from', 'into', 'are', 'was', 'not', 'you',
+    'self', 'def', 'return', 'import', 'class', 'none', 'true', 'false', 'if', 'else', 'elif',
+    'in', 'is', 'of', 'to', 'or', 'as', 'an', 'be', 'on', 'by', 'it', 'at', 'var', 'let',
+    'const', 'function', 'new', 'str', 'int', 'py',
+    # Português
+    'de', 'da', 'do', 'das', 'dos', 'em', 'um', 'uma', 'para', 'com', 'que', 'os', 'as',
+    'no', 'na', 'nos', 'nas', 'por', 'se', 'ao', 'ou', 'mais',
+}
+
+def estimate_tokens(text: str) -> int:
+    """Estima quantos tokens um texto ocupa no prompt"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def tokenize_code(text: str) -> List[str]:
+    """Quebra identificadores em termos (snake_case e camelCase) em minúsculas"""
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        for part in identifier.split('_'):
+            for word in CAMEL_RE.findall(part):
+                word = word.lower()
+                if len(word) > 1 and word not in STOPWORDS:
+                    terms.append(word)
+    return terms
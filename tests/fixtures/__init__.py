@@ -1 +1,20 @@
 # Fixtures de teste
+
+import shutil
+from pathlib import Path
+import git
+
+SAMPLE_REPO = Path(__file__).parent / "sample_repo"
+
+def make_origin_repo(path: Path) -> Path:
+    """Cria um repositório bare com o conteúdo de tests/fixtures/sample_repo"""
+    source = path / "source"
+    shutil.copytree(SAMPLE_REPO, source, ignore=shutil.ignore_patterns(".pytest_cache", "__pycache__"))
+    repo = git.Repo.init(source, initial_branch="main")
+    repo.git.add(".")
+    repo.git.commit("-m", "Commit inicial", author="Test <test@example.com>",
+                    env={"GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com"})
+    
+    origin = path / "origin.git"
+    git.Repo.clone_from(source, origin, bare=True)
+    return origin
@@ -0,0 +1,74 @@
+"""
+Testes para a fachada assíncrona do state store
+"""
+
+import pytest
+import asyncio
+import tempfile
+import shutil
+import threading
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.async_state_store import AsyncStateStore
+from app.models.state_store import JSONStateStore
+from app.models.schemas import ProjectConfig, Task, TaskStatus
+
+class TestAsyncStateStore:
+    """Testes para AsyncStateStore"""
+    
+    @pytest.fixture
+    def temp_data_dir(self):
+        """Cria diretório temporário para dados de teste"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def async_store(self, temp_data_dir):
+        """Cria a fachada sobre um JSONStateStore temporário"""
+        store = AsyncStateStore(JSONStateStore(temp_data_dir, compact_interval=0), max_workers=2)
+        yield store
+        store.close()
+    
+    @pytest.mark.asyncio
+    async def test_task_roundtrip(self, async_store):
+        """Testa salvar, atualizar e recuperar task"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        task.add_event("created", "Task criada")
+        assert await async_store.save_task(task)
+        assert await async_store.update_task_status(task.id, TaskStatus.DONE)
+        
+        retrieved = await async_store.get_task(task.id, include_history=False)
+        assert retrieved.status == TaskStatus.DONE
+        assert len(await async_store.get_task_history(task.id)) == 1
+    
+    @pytest.mark.asyncio
+    async def test_projects_and_sessions(self, async_store):
+        """Testa projetos e sessões"""
+        await async_store.save_project(ProjectConfig(name="project-1", repo_url="https://github.com/test/repo1"))
+        assert await async_store.list_projects() == ["project-1"]
+        assert await async_store.update_session_project(1, "project-1")
+        assert (await async_store.get_session(1)).current_project == "project-1"
+    
+    @pytest.mark.asyncio
+    async def test_calls_do_not_block_event_loop(self, async_store):
+        """Testa que uma operação lenta do store não bloqueia o event loop"""
+        release = threading.Event()
+        original = async_store.store.list_projects
+        
+        def slow_list_projects():
+            release.wait(timeout=5)
+            return original()
+        
+        async_store.store.list_projects = slow_list_projects
+        pending = asyncio.ensure_future(async_store.list_projects())
+        
+        # O loop continua atendendo outras corrotinas enquanto o store trabalha
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        release.set()
+        assert await pending == []
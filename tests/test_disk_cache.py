@@ -0,0 +1,43 @@
+"""
+Testes para o cache em disco
+"""
+
+import os
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils.disk_cache import DiskCache
+
+class TestDiskCache:
+    """Testes para DiskCache"""
+    
+    def test_put_get(self, tmp_path):
+        """Testa gravação, leitura e contadores"""
+        cache = DiskCache(tmp_path, 1024)
+        
+        assert cache.get("chave") is None
+        assert cache.put("chave", "valor")
+        assert cache.get("chave") == "valor"
+        assert (cache.hits, cache.misses) == (1, 1)
+        
+        # Persistente entre instâncias
+        assert DiskCache(tmp_path, 1024).get("chave") == "valor"
+    
+    def test_lru_eviction_by_size(self, tmp_path):
+        """Testa o descarte das entradas menos usadas ao passar do limite"""
+        cache = DiskCache(tmp_path, 250)
+        cache.put("a", "x" * 100)
+        cache.put("b", "y" * 100)
+        
+        # "a" foi usada por último; "b" é a menos usada
+        os.utime(cache._entry_path("a"), (2000, 2000))
+        os.utime(cache._entry_path("b"), (1000, 1000))
+        cache.put("c", "z" * 100)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == "x" * 100
+        assert cache.get("c") == "z" * 100
+        assert not cache.put("grande", "w" * 300)
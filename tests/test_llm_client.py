@@ -0,0 +1,141 @@
+"""
+Testes para o cliente assíncrono do LLM
+"""
+
+import pytest
+import asyncio
+import json
+import time
+from pathlib import Path
+import sys
+import httpx
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.llm_client import LLMClient, LLMError
+from app.services.llm_service import LLMResponseCache, LLMService
+from app.services.model_router import ModelRouter
+from app.utils.disk_cache import DiskCache
+
+DIFF = "--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+
+def completion(content: str) -> httpx.Response:
+    """Resposta no formato da API de chat completions"""
+    return httpx.Response(200, json={
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5}
+    })
+
+class TestLLMClient:
+    """Testes para LLMClient"""
+    
+    @pytest.fixture
+    def make_client(self):
+        """Fábrica de clientes com transporte simulado, fechados ao final"""
+        clients = []
+        
+        def factory(handler, **kwargs):
+            client = LLMClient(base_url="http://llm.test/v1", api_key="chave",
+                               transport=httpx.MockTransport(handler), **kwargs)
+            clients.append(client)
+            return client
+        
+        yield factory
+        for client in clients:
+            client.close()
+    
+    @pytest.mark.asyncio
+    async def test_concurrency_limits(self, make_client):
+        """Testa os limites global e por modelo de chamadas em voo"""
+        in_flight = {"total": 0, "max": 0, "a": 0, "max_a": 0}
+        
+        async def handler(request):
+            model = json.loads(request.content)["model"]
+            in_flight["total"] += 1
+            in_flight[model] = in_flight.get(model, 0) + 1
+            in_flight["max"] = max(in_flight["max"], in_flight["total"])
+            in_flight["max_a"] = max(in_flight["max_a"], in_flight.get("a", 0))
+            await asyncio.sleep(0.02)
+            in_flight["total"] -= 1
+            in_flight[model] -= 1
+            assert request.headers["authorization"] == "Bearer chave"
+            return completion(f"ok {model}")
+        
+        client = make_client(handler, max_concurrency=3, per_model_concurrency=1)
+        calls = [client.chat(model, [{"role": "user", "content": "oi"}]) for model in "aaaabbbbcccc"]
+        results = await asyncio.gather(*calls)
+        
+        assert results.count("ok a") == 4
+        assert in_flight["max"] <= 3
+        assert in_flight["max_a"] == 1
+    
+    def test_http_error_with_retry_after(self, make_client):
+        """Testa a conversão de erros HTTP em LLMError (código de uso síncrono)"""
+        client = make_client(lambda request: httpx.Response(429, headers={"Retry-After": "7"}, text="limite"))
+        
+        with pytest.raises(LLMError) as error:
+            client.run(client.chat("m", [{"role": "user", "content": "oi"}]))
+        assert error.value.status_code == 429
+        assert error.value.retry_after == 7.0
+    
+    def test_llm_service_sync_and_async(self, make_client):
+        """Testa os métodos síncronos e assíncronos do LLMService sobre o cliente"""
+        client = make_client(lambda request: completion(DIFF))
+        service = LLMService(client=client, streaming=False, router=ModelRouter())
+        
+        assert service.generate_patch({"objective": "x"}, "mapa") == DIFF.strip()
+        assert asyncio.run(service.generate_patch_async({"objective": "x"}, "mapa")) == DIFF.strip()
+
+class TestLLMResponseCache:
+    """Testes para o cache de respostas do LLM"""
+    
+    @pytest.fixture
+    def service(self, tmp_path):
+        """LLMService com cache em disco e transporte que conta as requisições"""
+        responses = [completion("não é diff"), completion(DIFF), completion(DIFF)]
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            return responses[min(len(requests), len(responses)) - 1]
+        
+        client = LLMClient(base_url="http://llm.test/v1", api_key="chave",
+                           transport=httpx.MockTransport(handler))
+        cache = LLMResponseCache(DiskCache(tmp_path, 1024 * 1024), ttl=60, max_temperature=0.2)
+        service = LLMService(client=client, cache=cache, streaming=False,
+                             router=ModelRouter(fast_model="m", strong_model="m"))
+        service.requests = requests
+        yield service
+        client.close()
+    
+    def test_valid_responses_are_cached(self, service):
+        """Testa que só respostas válidas entram no cache e o bypass por chamada"""
+        with pytest.raises(ValueError):
+            service.generate_patch({"objective": "x"}, "mapa")
+        assert service.generate_patch({"objective": "x"}, "mapa") == DIFF.strip()
+        assert service.generate_patch({"objective": "x"}, "mapa") == DIFF.strip()
+        assert len(service.requests) == 2
+        assert service.cache.stats() == {"hits": 1, "misses": 2, "expired": 0}
+        
+        service.generate_patch({"objective": "x"}, "mapa", use_cache=False)
+        assert len(service.requests) == 3
+        
+        # Outro mapa do repositório é outra chave
+        service.generate_patch({"objective": "x"}, "outro mapa")
+        assert len(service.requests) == 4
+    
+    def test_ttl_and_temperature(self, service, monkeypatch):
+        """Testa a expiração por idade e que temperaturas altas não usam cache"""
+        cache = service.cache
+        messages = [{"role": "user", "content": "oi"}]
+        assert cache.key("m", messages, 0.7, 100) is None
+        
+        key = cache.key("m", messages, 0.1, 100)
+        cache.put(key, "resposta")
+        assert cache.get(key) == "resposta"
+        
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 120)
+        assert cache.get(key) is None
+        assert cache.expired == 1
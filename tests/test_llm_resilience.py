@@ -0,0 +1,104 @@
+"""
+Testes para repetição, hedging e prazo das chamadas ao LLM
+"""
+
+import pytest
+import asyncio
+import time
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.llm_client import LLMClient, LLMError
+from app.services.llm_resilience import LatencyTracker, LLMDeadlineExceeded, ResilientCaller, llm_deadline
+
+def scripted(outcomes, calls):
+    """Requisição simulada: cada chamada consome o próximo resultado (exceção ou valor)"""
+    async def request():
+        outcome = outcomes[len(calls)]
+        calls.append(time.monotonic())
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return request
+
+class TestResilientCaller:
+    """Testes para ResilientCaller"""
+    
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors(self):
+        """Testa a repetição de erros transitórios respeitando Retry-After"""
+        caller = ResilientCaller(max_retries=3, base_delay=0.001, max_delay=0.01, hedge=False)
+        calls = []
+        request = scripted([LLMError("limite", 429, retry_after=0.05), LLMError("rede"), "ok"], calls)
+        
+        assert await caller.call(request, "m") == "ok"
+        assert len(calls) == 3
+        assert calls[1] - calls[0] >= 0.01  # Retry-After limitado por max_delay
+    
+    @pytest.mark.asyncio
+    async def test_permanent_errors_and_retry_limit(self):
+        """Testa que erros permanentes não são repetidos e o limite de tentativas"""
+        caller = ResilientCaller(max_retries=2, base_delay=0.001, hedge=False)
+        
+        calls = []
+        with pytest.raises(LLMError):
+            await caller.call(scripted([LLMError("inválido", 400), "ok"], calls), "m")
+        assert len(calls) == 1
+        
+        calls = []
+        with pytest.raises(LLMError):
+            await caller.call(scripted([LLMError("fora", 503)] * 4, calls), "m")
+        assert len(calls) == 3
+    
+    @pytest.mark.asyncio
+    async def test_hedged_request_wins(self):
+        """Testa que uma segunda requisição é disparada após o p95 e a mais rápida vence"""
+        latencies = LatencyTracker()
+        for _ in range(20):
+            latencies.record("m", 0.02)
+        caller = ResilientCaller(hedge=True, hedge_min_samples=20, latencies=latencies)
+        
+        started = []
+        cancelled = []
+        
+        async def request():
+            started.append(time.monotonic())
+            try:
+                await asyncio.sleep(1 if len(started) == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return f"resposta {len(started)}"
+        
+        begin = time.monotonic()
+        assert await caller.call(request, "m") == "resposta 2"
+        assert time.monotonic() - begin < 0.5
+        assert caller.hedges_started == caller.hedges_won == 1
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+    
+    def test_deadline_from_sync_code(self):
+        """Testa que o prazo definido na thread da task vale no loop do cliente"""
+        client = LLMClient(base_url="http://llm.test/v1", api_key="chave")
+        caller = ResilientCaller(hedge=False)
+        
+        async def slow():
+            await asyncio.sleep(5)
+        
+        try:
+            begin = time.monotonic()
+            with llm_deadline(0.05):
+                with pytest.raises(LLMDeadlineExceeded):
+                    client.run(caller.call(slow, "m"))
+            assert time.monotonic() - begin < 1
+            
+            # Prazos aninhados não estendem o externo
+            with llm_deadline(0.05):
+                with llm_deadline(60):
+                    with pytest.raises(LLMDeadlineExceeded):
+                        client.run(caller.call(slow, "m"))
+        finally:
+            client.close()
@@ -0,0 +1,157 @@
+"""
+Testes para o ciclo de implementação e revisão do ManagerAgent
+"""
+
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents import manager as manager_module
+from app.agents.manager import ManagerAgent
+from app.config import config
+from app.models.schemas import ProjectConfig, ReviewResult, Task, TaskStatus
+from app.models.state_store import JSONStateStore
+
+DIFF = "--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+
+class FakeProgrammer:
+    """Programador que devolve resultados pré-definidos e registra as chamadas"""
+    
+    def __init__(self, results, pr_url="https://github.com/test/repo/pull/1"):
+        self.results = list(results)
+        self.pr_url = pr_url
+        self.calls = []
+        self.cleaned = None
+    
+    def implement(self, task, project_config, branch_name, feedback=None, attempt=1):
+        """Próximo resultado pré-definido"""
+        self.calls.append({"feedback": feedback, "attempt": attempt})
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def push_and_pr(self, task, project_config):
+        """URL de PR fictícia (None simula falha no push)"""
+        return self.pr_url
+    
+    def cleanup(self, task, project_config, keep_worktree=False):
+        """Registra a limpeza do workspace ("keep" quando o worktree é mantido)"""
+        self.cleaned = "keep" if keep_worktree else "remove"
+        return True
+    
+    def forget(self, task_id):
+        """Registra o descarte só do estado em memória"""
+        self.cleaned = "forget"
+
+class FakeReviewer:
+    """LLM que devolve revisões pré-definidas"""
+    
+    def __init__(self, reviews):
+        self.reviews = list(reviews)
+    
+    def review(self, spec_json, test_output, git_log, diff_applied):
+        """Próxima revisão pré-definida"""
+        return self.reviews.pop(0)
+
+class TestReviewAndIterate:
+    """Testes para ManagerAgent.review_and_iterate"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Cria diretório temporário"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def store(self, temp_dir, monkeypatch):
+        """State store temporário com um projeto e uma task"""
+        store = JSONStateStore(temp_dir / "data", compact_interval=0)
+        store.save_project(ProjectConfig(name="p", repo_url="https://github.com/test/repo"))
+        store.save_task(Task(id="t1", project="p", raw_request="x", objective="x", branch_name="feat/x"))
+        monkeypatch.setattr(manager_module, "state_store", store)
+        monkeypatch.setattr(config, "TASK_MAX_ITERATIONS", 3)
+        return store
+    
+    def run(self, temp_dir, monkeypatch, results, reviews, **kwargs):
+        """Executa o ciclo com programador e revisor simulados"""
+        programmer = FakeProgrammer(results, **kwargs)
+        monkeypatch.setattr(manager_module, "llm_service", FakeReviewer(reviews))
+        manager = ManagerAgent()
+        manager.set_programmer_agent(programmer)
+        return programmer, manager.review_and_iterate("t1")
+    
+    def test_feedback_fed_into_next_attempt(self, store, temp_dir, monkeypatch):
+        """Testa que a reprovação vira feedback da tentativa seguinte no mesmo worktree"""
+        ok = (True, "1 passed", temp_dir, DIFF)
+        programmer, (success, message, pr_url) = self.run(temp_dir, monkeypatch, [ok, ok], [
+            ReviewResult(approved=False, notes="falta tratar erro", next_actions="tratar ValueError"),
+            ReviewResult(approved=True, notes="ok"),
+        ])
+        
+        assert success and pr_url
+        assert [call["attempt"] for call in programmer.calls] == [1, 2]
+        assert programmer.calls[0]["feedback"] is None
+        assert "tratar ValueError" in programmer.calls[1]["feedback"]
+        assert store.get_task("t1").status == TaskStatus.DONE
+        assert programmer.cleaned == "remove"
+    
+    def test_test_failures_are_retried(self, store, temp_dir, monkeypatch):
+        """Testa que falhas de teste também são repetidas, com a saída como feedback"""
+        failed = (False, "Testes falharam: assert 1 == 2", temp_dir, DIFF)
+        programmer, (success, message, _) = self.run(temp_dir, monkeypatch, [failed] * 3, [])
+        
+        assert not success
+        assert len(programmer.calls) == 3
+        assert "assert 1 == 2" in programmer.calls[2]["feedback"]
+        assert programmer.cleaned == "remove"
+        assert store.get_task("t1").status == TaskStatus.FAILED
+    
+    def test_rejected_after_max_iterations(self, store, temp_dir, monkeypatch):
+        """Testa o limite de tentativas quando a revisão sempre reprova"""
+        ok = (True, "1 passed", temp_dir, DIFF)
+        rejection = ReviewResult(approved=False, notes="não atende", next_actions="refazer")
+        programmer, (success, message, _) = self.run(temp_dir, monkeypatch, [ok] * 3, [rejection] * 3)
+        
+        assert not success
+        assert "refazer" in message
+        assert len(programmer.calls) == 3
+        assert store.get_task("t1").status == TaskStatus.REVIEW
+        # Worktree mantido para inspeção; estado em memória e candidatos descartados
+        assert programmer.cleaned == "keep"
+    
+    def test_failed_pr_is_not_done(self, store, temp_dir, monkeypatch):
+        """Testa que uma aprovação sem PR criado não conclui a task"""
+        ok = (True, "1 passed", temp_dir, DIFF)
+        programmer, (success, message, pr_url) = self.run(
+            temp_dir, monkeypatch, [ok], [ReviewResult(approved=True, notes="ok")], pr_url=None
+        )
+        
+        assert not success and pr_url is None
+        assert "None" not in message
+        assert store.get_task("t1").status == TaskStatus.FAILED
+        assert programmer.cleaned == "remove"
+    
+    def test_internal_error_cleans_up(self, store, temp_dir, monkeypatch):
+        """Testa a limpeza do workspace quando o ciclo levanta uma exceção"""
+        programmer, (success, message, _) = self.run(temp_dir, monkeypatch, [RuntimeError("falhou")], [])
+        
+        assert not success
+        assert "Erro interno" in message
+        assert programmer.cleaned == "remove"
+    
+    def test_no_retry_without_worktree(self, store, temp_dir, monkeypatch):
+        """Testa que sem worktree a task falha sem novas tentativas"""
+        programmer, (success, message, _) = self.run(
+            temp_dir, monkeypatch, [(False, "Falha ao criar branch", Path(), "")], []
+        )
+        
+        assert not success
+        assert len(programmer.calls) == 1
+        assert "Falha ao criar branch" in message
@@ -0,0 +1,137 @@
+"""
+Testes para o roteamento de modelos do LLM
+"""
+
+import pytest
+import json
+from pathlib import Path
+import sys
+import httpx
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.llm_client import LLMClient, LLMError
+from app.services.llm_resilience import ResilientCaller
+from app.services.llm_service import LLMService
+from app.services.model_router import ROUTE_PATCH, ROUTE_REVIEW, ROUTE_SPEC, ModelRouter
+
+DIFF = "--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+
+def completion(content: str) -> httpx.Response:
+    """Resposta no formato da API de chat completions"""
+    return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+class TestModelRouter:
+    """Testes para ModelRouter"""
+    
+    @pytest.fixture
+    def router(self):
+        """Roteador com modelos fictícios e sem arquivo de estatísticas"""
+        return ModelRouter(fast_model="rapido", strong_model="forte", strong_complexities=["high"])
+    
+    def test_choose(self, router):
+        """Testa a escolha por etapa, complexidade e tentativa"""
+        assert router.choose(ROUTE_SPEC, "high") == "rapido"
+        assert router.choose(ROUTE_REVIEW, "high", attempt=3) == "rapido"
+        assert router.choose(ROUTE_PATCH, "low") == "rapido"
+        assert router.choose(ROUTE_PATCH, None) == "rapido"
+        assert router.choose(ROUTE_PATCH, "HIGH") == "forte"
+        assert router.choose(ROUTE_PATCH, "low", attempt=2) == "forte"
+        
+        assert router.escalate("rapido") == "forte"
+        assert router.escalate("forte") is None
+    
+    def test_stats_recorded(self, tmp_path):
+        """Testa as estatísticas em memória e o arquivo JSON Lines"""
+        path = tmp_path / "rotas.jsonl"
+        router = ModelRouter(fast_model="rapido", strong_model="forte", stats_path=path, flush_interval=3600)
+        router.record(ROUTE_PATCH, "rapido", 1.0, 100, 50, ok=True)
+        router.record(ROUTE_PATCH, "rapido", 3.0, 120, 0, ok=False)
+        
+        # As linhas ficam em memória até o flush em lote
+        assert not path.exists()
+        router.flush()
+        
+        stats = router.stats()["patch:rapido"]
+        assert stats["calls"] == 2
+        assert stats["failures"] == 1
+        assert stats["prompt_tokens"] == 220
+        assert stats["p50_seconds"] == 3.0
+        
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["ok"] for line in lines] == [True, False]
+        assert lines[0]["route"] == "patch" and lines[0]["model"] == "rapido"
+    
+    def test_stats_file_rotated(self, tmp_path):
+        """Testa a rotação do arquivo de estatísticas ao passar do limite"""
+        path = tmp_path / "rotas.jsonl"
+        router = ModelRouter(fast_model="rapido", strong_model="forte", stats_path=path,
+                             flush_interval=3600, max_bytes=300)
+        for _ in range(3):
+            router.record(ROUTE_SPEC, "rapido", 1.0, 100, 50, ok=True)
+            router.record(ROUTE_SPEC, "rapido", 1.0, 100, 50, ok=True)
+            router.flush()
+        
+        rotated = path.with_name("rotas.jsonl.1")
+        assert rotated.exists()
+        assert path.stat().st_size <= 300
+        assert len(path.read_text().splitlines()) == 2
+    
+    def test_service_escalates_on_invalid_response(self):
+        """Testa que o LLMService repete com o modelo forte quando o rápido erra o formato"""
+        models = []
+        
+        def handler(request):
+            model = json.loads(request.content)["model"]
+            models.append(model)
+            return completion("não é diff" if model == "rapido" else DIFF)
+        
+        client = LLMClient(base_url="http://llm.test/v1", api_key="chave",
+                           transport=httpx.MockTransport(handler))
+        router = ModelRouter(fast_model="rapido", strong_model="forte", strong_complexities=["high"])
+        service = LLMService(client=client, streaming=False, router=router,
+                             resilience=ResilientCaller(max_retries=0))
+        try:
+            assert service.generate_patch({"objective": "x"}, "mapa", complexity="low") == DIFF.strip()
+            assert models == ["rapido", "forte"]
+            
+            service.generate_patch({"objective": "x"}, "mapa", complexity="high", use_cache=False)
+            assert models[-1] == "forte" and len(models) == 3
+        finally:
+            client.close()
+        
+        stats = router.stats()
+        assert stats["patch:rapido"]["failures"] == 1
+        assert stats["patch:forte"]["calls"] == 2
+        
+        # O p95 do hedging é separado por rota e modelo
+        latencies = service.resilience.latencies
+        assert latencies.count("patch:rapido") == 1
+        assert latencies.count("patch:forte") == 2
+        assert latencies.count("forte") == 0
+    
+    @pytest.mark.parametrize("status, expected", [(400, ["rapido"]), (503, ["rapido", "forte"])])
+    def test_service_escalates_only_retryable_errors(self, status, expected):
+        """Testa que erros HTTP definitivos (4xx) não são repetidos com o modelo forte"""
+        models = []
+        
+        def handler(request):
+            model = json.loads(request.content)["model"]
+            models.append(model)
+            return httpx.Response(status, json={"error": "falha"}) if model == "rapido" else completion(DIFF)
+        
+        client = LLMClient(base_url="http://llm.test/v1", api_key="chave",
+                           transport=httpx.MockTransport(handler))
+        service = LLMService(client=client, streaming=False, resilience=ResilientCaller(max_retries=0),
+                             router=ModelRouter(fast_model="rapido", strong_model="forte"))
+        try:
+            if status == 400:
+                with pytest.raises(LLMError):
+                    service.generate_patch({"objective": "x"}, "mapa", use_cache=False)
+            else:
+                assert service.generate_patch({"objective": "x"}, "mapa", use_cache=False) == DIFF.strip()
+        finally:
+            client.close()
+        
+        assert models == expected
@@ -0,0 +1,103 @@
+"""
+Testes para o prefetch de repositórios em background
+"""
+
+import pytest
+import tempfile
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.state_store import JSONStateStore
+from app.models.schemas import ProjectConfig
+from app.services.repo_cache import RepoCache
+from app.services.prefetch_service import RepoPrefetcher
+from app.services.workspace_service import WorkspaceService
+from tests.fixtures import make_origin_repo
+
+class TestRepoPrefetcher:
+    """Testes para RepoPrefetcher"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Cria diretório temporário"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def origin(self, temp_dir):
+        """Repositório remoto local"""
+        return make_origin_repo(temp_dir)
+    
+    @pytest.fixture
+    def prefetcher(self, temp_dir):
+        """Prefetcher com cache e store temporários"""
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="", depth=0, fetch_ttl=3600)
+        store = JSONStateStore(temp_dir / "data", compact_interval=0)
+        prefetcher = RepoPrefetcher(cache, store, max_workers=2)
+        yield prefetcher
+        prefetcher.shutdown()
+    
+    def test_prefetch_populates_cache(self, prefetcher, origin):
+        """Testa que o prefetch cria o clone bare em background"""
+        assert prefetcher.prefetch(str(origin)).result(timeout=30)
+        assert prefetcher.cache.mirror_path(str(origin)).exists()
+        assert prefetcher.wait(str(origin))
+    
+    def test_concurrent_requests_share_fetch(self, prefetcher, origin, monkeypatch):
+        """Testa que pedidos simultâneos para o mesmo remoto viram um único fetch"""
+        release = threading.Event()
+        calls = []
+        
+        def slow_mirror(repo_url, force=False):
+            calls.append(repo_url)
+            release.wait(timeout=5)
+        
+        monkeypatch.setattr(prefetcher.cache, "mirror", slow_mirror)
+        first = prefetcher.prefetch(str(origin))
+        second = prefetcher.prefetch(str(origin))
+        release.set()
+        
+        assert first is second
+        assert first.result(timeout=5)
+        assert calls == [str(origin)]
+    
+    def test_prefetch_all_registered_projects(self, prefetcher, origin):
+        """Testa o prefetch dos projetos cadastrados"""
+        prefetcher.store.save_project(ProjectConfig(name="sample", repo_url=str(origin)))
+        
+        assert prefetcher.prefetch_all() == 1
+        assert prefetcher.wait(str(origin), timeout=30)
+        assert prefetcher.cache.mirror_path(str(origin)).exists()
+    
+    def test_worktree_waits_for_inflight_prefetch(self, prefetcher, origin, temp_dir, monkeypatch):
+        """Testa que o worktree aguarda o prefetch do mesmo remoto e reaproveita o fetch"""
+        release = threading.Event()
+        sync = prefetcher._sync
+        monkeypatch.setattr(prefetcher, "_sync", lambda repo_url: release.wait(timeout=5) and sync(repo_url))
+        fetches = []
+        fetch = prefetcher.cache._fetch
+        monkeypatch.setattr(prefetcher.cache, "_fetch",
+                            lambda repo, path: fetches.append(path) or fetch(repo, path))
+        workspace = WorkspaceService(temp_dir / "work", cache=prefetcher.cache, prefetcher=prefetcher)
+        
+        prefetcher.prefetch(str(origin))
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            created = pool.submit(workspace.create_worktree, str(origin), "sample", "task-1", "main", "feat/one")
+            time.sleep(0.2)
+            assert not created.done() and fetches == []
+            release.set()
+            assert created.result(timeout=30).exists()
+        
+        assert len(fetches) == 1
+    
+    def test_failed_prefetch_does_not_raise(self, prefetcher, temp_dir):
+        """Testa que falhas de fetch são apenas registradas"""
+        assert not prefetcher.prefetch(str(temp_dir / "inexistente.git")).result(timeout=30)
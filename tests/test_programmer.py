@@ -0,0 +1,134 @@
+"""
+Testes para o modo especulativo do ProgrammerAgent
+"""
+
+import pytest
+import difflib
+import tempfile
+import threading
+import time
+import shutil
+from pathlib import Path
+import sys
+import git
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents import programmer as programmer_module
+from app.agents.programmer import ProgrammerAgent
+from app.config import config
+from app.models.schemas import ProjectConfig, Task
+from app.services.patch_service import patch_service
+from app.services.repo_cache import RepoCache
+from app.services.workspace_service import WorkspaceService
+from tests.fixtures import SAMPLE_REPO, make_origin_repo
+
+APP = "src/pkg/app.py"
+
+def make_diff(new_source: str) -> str:
+    """Diff de ``src/pkg/app.py`` do repositório de exemplo para ``new_source``"""
+    old = (SAMPLE_REPO / APP).read_text()
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True), new_source.splitlines(keepends=True),
+        fromfile=APP, tofile=APP
+    ))
+
+SOURCE = (SAMPLE_REPO / APP).read_text()
+BROKEN = make_diff(SOURCE.replace("return a + b", "return a - b"))
+PASSING = make_diff(SOURCE + '\ndef square(x: int) -> int:\n    """Quadrado de um número"""\n    return x * x\n')
+SLOW = make_diff(SOURCE + "\nLENTO = True\n")
+
+class FakeLLM:
+    """LLM cujo patch depende da temperatura: 0.1 quebra os testes, 0.5 passa e 0.8 não termina"""
+    
+    def __init__(self):
+        self.temperatures = []
+        self.slow_cancelled = threading.Event()
+    
+    def generate_patch(self, spec_json, repo_map, feedback=None, use_cache=True, on_section=None,
+                       complexity=None, attempt=1, temperature=0.1):
+        """Patch de acordo com a temperatura do candidato"""
+        self.temperatures.append(temperature)
+        if temperature == 0.8:
+            # Stream longo: cada seção recebida dá ao programador a chance de cancelar
+            try:
+                for _ in range(600):
+                    on_section(SLOW)
+                    time.sleep(0.05)
+            except programmer_module.CandidateCancelled:
+                self.slow_cancelled.set()
+                raise
+            return SLOW
+        return BROKEN if temperature == 0.1 else PASSING
+
+class TestSpeculativeCandidates:
+    """Testes para ProgrammerAgent com SPECULATIVE_CANDIDATES > 1"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Cria diretório temporário"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def setup(self, temp_dir, monkeypatch):
+        """Programador com workspace temporário, LLM simulado e três candidatos"""
+        origin = make_origin_repo(temp_dir)
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="", depth=0, fetch_ttl=3600)
+        workspace = WorkspaceService(temp_dir / "work", cache=cache)
+        llm = FakeLLM()
+        
+        monkeypatch.setattr(programmer_module, "workspace_service", workspace)
+        monkeypatch.setattr(programmer_module, "llm_service", llm)
+        monkeypatch.setattr(programmer_module.github_service, "get_repo_map", lambda *args, **kwargs: "mapa")
+        monkeypatch.setattr(patch_service, "create_diff_backup", lambda diff, task_id: None)
+        monkeypatch.setattr(config, "SPECULATIVE_CANDIDATES", 3)
+        monkeypatch.setattr(config, "SPECULATIVE_TEMPERATURES", [0.1, 0.5, 0.8])
+        
+        project = ProjectConfig(
+            name="sample", repo_url=str(origin), test_command=f"{sys.executable} -m pytest -q"
+        )
+        task = Task(id="t1", project="sample", raw_request="x", objective="x", branch_name="feat/x")
+        return ProgrammerAgent(), project, task, workspace, llm
+    
+    def test_first_passing_candidate_wins(self, setup):
+        """Testa que o candidato que passa é adotado e os demais são descartados"""
+        programmer, project, task, workspace, llm = setup
+        
+        success, output, repo_path, diff = programmer.implement(task, project, task.branch_name)
+        
+        assert success, output
+        assert diff == PASSING
+        assert sorted(llm.temperatures) == [0.1, 0.5, 0.8]
+        assert llm.slow_cancelled.is_set()
+        
+        # O worktree da task recebe o commit vencedor, na branch da task
+        repo = git.Repo(repo_path)
+        assert repo_path == workspace.worktree_path("sample", task.id)
+        assert repo.active_branch.name == "feat/x"
+        assert "def square" in (repo_path / APP).read_text()
+        assert not repo.is_dirty()
+        
+        # Worktrees e branches dos candidatos são removidos
+        assert not any(workspace.worktree_path("sample", f"t1-c{index}").exists() for index in range(3))
+        mirror = git.Repo(workspace.cache.mirror_path(project.repo_url))
+        assert not [head.name for head in mirror.heads if head.name.startswith("feat/x-c")]
+    
+    def test_all_candidates_fail(self, setup, monkeypatch):
+        """Testa o feedback quando nenhum candidato passa nos testes"""
+        programmer, project, task, workspace, llm = setup
+        monkeypatch.setattr(config, "SPECULATIVE_TEMPERATURES", [0.1])
+        
+        success, output, repo_path, diff = programmer.implement(task, project, task.branch_name)
+        
+        assert not success
+        assert "Nenhum dos 3 candidatos" in output
+        assert output.count("Testes falharam") == 3
+        assert "def square" not in (repo_path / APP).read_text()
+        
+        # Na revisão manual o worktree da task fica, mas o estado em memória não
+        assert programmer.cleanup(task, project, keep_worktree=True)
+        assert repo_path.exists()
+        assert task.id not in programmer._workspaces
@@ -0,0 +1,115 @@
+"""
+Testes para o orçamento de tokens dos prompts
+"""
+
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.prompt_budget import PromptBudget, trim_diff, trim_repo_map, trim_test_output
+from app.utils.tokens import estimate_tokens
+
+PYTEST_OUTPUT = "\n".join(
+    ["============================= test session starts =============================="]
+    + [f"tests/test_mod.py::test_ok_{i} PASSED                                   [ {i}%]" for i in range(200)]
+    + [
+        "=================================== FAILURES ===================================",
+        "_________________________________ test_falha __________________________________",
+        "    def test_falha():",
+        ">       assert soma(1, 1) == 3",
+        "E       assert 2 == 3",
+        "=========================== short test summary info ============================",
+        "FAILED tests/test_mod.py::test_falha - assert 2 == 3",
+        "========================= 1 failed, 200 passed in 0.52s =========================",
+    ]
+)
+
+class TestTrimmers:
+    """Testes para os cortes específicos de cada seção"""
+    
+    def test_test_output_keeps_failures(self):
+        """Testa que aprovados saem primeiro e falhas e resumo ficam"""
+        trimmed = trim_test_output(PYTEST_OUTPUT, 200)
+        
+        assert estimate_tokens(trimmed) <= 220
+        assert "PASSED" not in trimmed
+        assert "E       assert 2 == 3" in trimmed
+        assert "1 failed, 200 passed" in trimmed
+        
+        # Sem espaço para os detalhes, o resumo final é preservado
+        tiny = trim_test_output(PYTEST_OUTPUT, 60)
+        assert "FAILED tests/test_mod.py::test_falha" in tiny
+        assert "1 failed, 200 passed" in tiny
+    
+    def test_test_output_keeps_non_progress_lines(self):
+        """Testa que só linhas de progresso do pytest são tratadas como progresso"""
+        output = "\n".join([
+            "tests/test_a.py ..F.s                                                    [ 50%]",
+            "..........                                                               [100%]",
+            "raise X",
+            "foo E",
+            "F",
+            "    return a.b",
+        ] + [f"linha {i}" for i in range(25)] + ["E"] + [f"linha {i}" for i in range(25, 50)])
+        trimmed = trim_test_output(output, estimate_tokens(output) - 5)
+        
+        assert "[ 50%]" not in trimmed and "[100%]" not in trimmed
+        assert "raise X" in trimmed
+        assert "foo E" in trimmed
+        assert "    return a.b" in trimmed
+        
+        # ``F`` e ``E`` soltos (sem caminho nem percentual) não são progresso
+        lines = trimmed.splitlines()
+        assert "F" in lines
+        assert lines.index("E") == lines.index("linha 24") + 1
+    
+    def test_diff_elides_unchanged_context(self):
+        """Testa a remoção de contexto longe das mudanças"""
+        context = [f" linha {i}" for i in range(40)]
+        diff = "\n".join(
+            ["--- a/mod.py", "+++ b/mod.py", "@@ -1,41 +1,41 @@"]
+            + context[:20] + ["-antiga", "+nova"] + context[20:]
+        )
+        
+        trimmed = trim_diff(diff, 40)
+        assert trimmed.splitlines() == [
+            "--- a/mod.py", "+++ b/mod.py", "@@ -1,41 +1,41 @@",
+            " …", " linha 19", "-antiga", "+nova", " linha 20", " …",
+        ]
+    
+    def test_repo_map_cut_between_files(self):
+        """Testa que o mapa perde arquivos inteiros do fim, não pedaços"""
+        repo_map = "".join(f"=== f{i}.py ===\n{'x = 1' * 20}\n\n" for i in range(10))
+        
+        trimmed = trim_repo_map(repo_map, 100)
+        assert trimmed.startswith("=== f0.py ===")
+        assert "=== f9.py ===" not in trimmed
+        assert "arquivos omitidos" in trimmed
+
+class TestPromptBudget:
+    """Testes para PromptBudget"""
+    
+    def test_allocate_redistributes_leftover(self):
+        """Testa que seções pequenas entram inteiras e a sobra vai para as grandes"""
+        budget = PromptBudget(max_prompt_tokens=1000, weights={"repo_map": 3})
+        
+        allocation = budget.allocate({"spec_json": 50, "repo_map": 5000, "feedback": 5000}, 1000)
+        assert allocation["spec_json"] == 50
+        assert allocation["repo_map"] == 712
+        assert allocation["feedback"] == 237
+    
+    def test_render_fits_budget_and_reports_usage(self):
+        """Testa que o prompt montado respeita o orçamento e informa o uso por seção"""
+        budget = PromptBudget(max_prompt_tokens=300)
+        template = "SPEC:\n{spec_json}\n\nTESTES:\n{test_output}\n"
+        
+        prompt, usage = budget.render("review", template, {
+            "spec_json": '{"objective": "corrigir soma"}',
+            "test_output": PYTEST_OUTPUT
+        })
+        
+        assert usage["total"] <= 320
+        assert usage["spec_json"] == estimate_tokens('{"objective": "corrigir soma"}')
+        assert "E       assert 2 == 3" in prompt
@@ -0,0 +1,83 @@
+"""
+Testes para o cache local de repositórios
+"""
+
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+import sys
+import git
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.repo_cache import RepoCache
+from tests.fixtures import make_origin_repo
+
+class TestRepoCache:
+    """Testes para RepoCache"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Cria diretório temporário"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def origin(self, temp_dir):
+        """Repositório remoto local"""
+        return make_origin_repo(temp_dir)
+    
+    def _push_commit(self, temp_dir: Path, origin: Path, filename: str) -> str:
+        """Cria um commit novo no remoto e retorna seu SHA"""
+        work = git.Repo.clone_from(str(origin), temp_dir / f"pusher-{filename}")
+        (Path(work.working_dir) / filename).write_text("novo conteúdo")
+        work.git.add(".")
+        work.git.commit("-m", f"Adiciona {filename}", author="Test <test@example.com>",
+                        env={"GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com"})
+        work.git.push("origin", "main")
+        return work.head.commit.hexsha
+    
+    def test_mirror_is_bare_with_remote_refs(self, temp_dir, origin):
+        """Testa criação do clone bare com refs origin/*"""
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="", depth=0, fetch_ttl=0)
+        mirror = cache.mirror(str(origin))
+        
+        assert mirror.bare
+        assert "origin/main" in [ref.name for ref in mirror.remotes.origin.refs]
+    
+    def test_mirror_fetches_incrementally(self, temp_dir, origin):
+        """Testa que o cache busca commits novos do remoto"""
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="", depth=0, fetch_ttl=3600)
+        cache.mirror(str(origin))
+        sha = self._push_commit(temp_dir, origin, "a.txt")
+        
+        # Dentro do TTL o fetch é reaproveitado; com force o commit novo chega
+        assert cache.mirror(str(origin)).commit("origin/main").hexsha != sha
+        assert cache.mirror(str(origin), force=True).commit("origin/main").hexsha == sha
+    
+    def test_clone_is_dissociated_from_cache(self, temp_dir, origin):
+        """Testa que clones de trabalho usam o cache sem depender dele depois"""
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="", depth=0, fetch_ttl=0)
+        repo = cache.clone(str(origin), temp_dir / "work")
+        
+        alternates = Path(repo.git_dir) / "objects" / "info" / "alternates"
+        assert not alternates.exists()
+        assert (temp_dir / "work" / "pyproject.toml").exists()
+        
+        # Remover o cache não afeta o clone
+        shutil.rmtree(cache.mirror_path(str(origin)))
+        repo.git.fsck()
+        assert repo.head.commit.tree["pyproject.toml"]
+    
+    def test_shallow_partial_clone_options(self, temp_dir, origin):
+        """Testa cache raso e parcial a partir de uma URL file://"""
+        self._push_commit(temp_dir, origin, "b.txt")
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="blob:none", depth=1, fetch_ttl=0)
+        mirror = cache.mirror(origin.as_uri())
+        
+        assert (Path(mirror.git_dir) / "shallow").exists()
+        assert len(list(mirror.iter_commits("origin/main"))) == 1
+        assert mirror.git.config("remote.origin.partialclonefilter") == "blob:none"
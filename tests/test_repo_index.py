@@ -0,0 +1,83 @@
+"""
+Testes para o índice léxico (BM25) do repositório
+"""
+
+from pathlib import Path
+import sys
+import git
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.repo_index import BlobCache, LexicalIndex, RepoIndexRegistry
+from app.services.repo_map_service import RepoMapService
+from app.utils.tokens import estimate_tokens, tokenize_code
+
+FILES = {
+    "src/auth/login.py": "def authenticate_user(username, password):\n    \"\"\"Valida login com JWT\"\"\"\n",
+    "src/billing/invoice.py": "class InvoiceGenerator:\n    def render_pdf(self): pass\n",
+    "src/utils/strings.py": "def slugify(text): return text.lower()\n",
+}
+
+class TestRepoIndex:
+    """Testes para LexicalIndex e o mapa ranqueado"""
+    
+    def _index(self, files, reads):
+        """Cria e popula um índice registrando as leituras"""
+        index = LexicalIndex(BlobCache())
+        
+        def read(path):
+            reads.append(path)
+            return files[path]
+        
+        index.update([(path, f"sha-{hash(content)}") for path, content in files.items()], read)
+        return index, read
+    
+    def test_tokenize_code_splits_identifiers(self):
+        """Testa quebra de snake_case e camelCase"""
+        assert tokenize_code("InvoiceGenerator.render_pdf") == ["invoice", "generator", "render", "pdf"]
+        assert estimate_tokens("a" * 40) == 10
+    
+    def test_search_ranks_relevant_files(self):
+        """Testa que a consulta traz primeiro os arquivos relevantes"""
+        index, _ = self._index(FILES, [])
+        
+        assert index.search("Corrigir autenticação do login de usuário")[0][0] == "src/auth/login.py"
+        assert index.search("gerar invoice em PDF")[0][0] == "src/billing/invoice.py"
+        assert index.search("xyz inexistente") == []
+    
+    def test_update_is_incremental_by_blob_sha(self):
+        """Testa que só arquivos com blob alterado são relidos"""
+        reads = []
+        index, read = self._index(FILES, reads)
+        assert len(reads) == 3
+        
+        changed = dict(FILES)
+        changed["src/utils/strings.py"] = "def slugify_invoice(text): return text\n"
+        entries = [(path, f"sha-{hash(content)}") for path, content in changed.items()]
+        entries.append(("src/novo.py", "sha-novo"))
+        changed["src/novo.py"] = "x = 1\n"
+        
+        reads.clear()
+        assert index.update(entries, lambda path: reads.append(path) or changed[path]) == 2
+        assert sorted(reads) == ["src/novo.py", "src/utils/strings.py"]
+        
+        # Arquivos removidos saem do índice
+        index.update(entries[:1], read)
+        assert len(index) == 1
+    
+    def test_ranked_repo_map_within_budget(self, tmp_path):
+        """Testa o mapa ordenado por relevância e limitado por tokens"""
+        repo = git.Repo.init(tmp_path)
+        for path, content in FILES.items():
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text(content)
+        repo.git.add(".")
+        
+        service = RepoMapService(ignore=[".*"], indexes=RepoIndexRegistry())
+        repo_map = service.get_repo_map(tmp_path, query="invoice pdf", index_key="p")
+        assert repo_map.index("src/billing/invoice.py") < repo_map.index("src/auth/login.py")
+        
+        budget = estimate_tokens(f"=== src/billing/invoice.py ===\n{FILES['src/billing/invoice.py']}\n")
+        small = service.get_repo_map(tmp_path, query="invoice pdf", token_budget=budget, index_key="p")
+        assert small.count("===") == 2
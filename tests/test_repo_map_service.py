@@ -0,0 +1,222 @@
+"""
+Testes para a enumeração de arquivos e o mapa do repositório
+"""
+
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+import sys
+import git
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.repo_index import RepoIndexRegistry
+from app.services.repo_map_service import RepoMapService
+from app.utils.disk_cache import DiskCache
+from app.utils.outline import python_outline
+
+MODULE = '''"""Serviço de faturas.
+
+Detalhes que não entram no resumo.
+"""
+
+class InvoiceService(BaseService, metaclass=Meta):
+    """Gera e envia faturas"""
+    
+    def render(self, invoice_id: int, *, fmt: str = "pdf") -> bytes:
+        """Renderiza a fatura"""
+        return b""
+    
+    async def send(self, to):
+        pass
+
+def helper(x=1):
+    return x
+'''
+
+class TestRepoMapService:
+    """Testes para RepoMapService"""
+    
+    @pytest.fixture
+    def repo_path(self):
+        """Repositório git com arquivos versionados, ignorados e binários"""
+        temp_dir = Path(tempfile.mkdtemp())
+        repo = git.Repo.init(temp_dir)
+        
+        (temp_dir / "src").mkdir()
+        (temp_dir / "src" / "app.py").write_text("def main():\n    return 1\n")
+        (temp_dir / "README.md").write_text("# Projeto\n")
+        (temp_dir / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\0\0\0binario")
+        (temp_dir / "vendor").mkdir()
+        (temp_dir / "vendor" / "lib.js").write_text("var x = 1;")
+        (temp_dir / ".gitignore").write_text("build/\n")
+        repo.git.add(".")
+        
+        # Arquivos fora do índice: saída de build ignorada e dependências não versionadas
+        (temp_dir / "build").mkdir()
+        (temp_dir / "build" / "out.py").write_text("gerado = True\n")
+        (temp_dir / "node_modules" / "pkg").mkdir(parents=True)
+        (temp_dir / "node_modules" / "pkg" / "index.js").write_text("module.exports = {}")
+        
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def test_list_files_uses_git_index(self, repo_path):
+        """Testa que apenas arquivos versionados e não ignorados são listados"""
+        service = RepoMapService(ignore=[".*", "vendor"])
+        files = service.list_files(repo_path)
+        
+        assert [f.path for f in files] == ["README.md", "logo.png", "src/app.py"]
+        assert all(len(f.blob_sha) == 40 for f in files)
+    
+    def test_repo_map_skips_binary_files(self, repo_path):
+        """Testa que binários são detectados pelo prefixo e ignorados"""
+        repo_map = RepoMapService(ignore=[".*", "vendor"]).get_repo_map(repo_path)
+        
+        assert "=== src/app.py ===" in repo_map
+        assert "=== README.md ===" in repo_map
+        assert "logo.png" not in repo_map
+        assert "node_modules" not in repo_map
+        assert "gerado" not in repo_map
+    
+    def test_repo_map_respects_limits(self, repo_path):
+        """Testa os limites de quantidade e tamanho de arquivo"""
+        (repo_path / "src" / "big.py").write_text("x = 1\n" * 1000)
+        git.Repo(repo_path).git.add(".")
+        service = RepoMapService(ignore=[".*"])
+        
+        assert "big.py" not in service.get_repo_map(repo_path, max_size_kb=1)
+        assert service.get_repo_map(repo_path, max_files=1).count("===") == 2
+    
+    def test_repo_map_stops_reading_when_budget_is_spent(self, tmp_path):
+        """Testa que nenhum arquivo é lido depois que o orçamento acaba"""
+        for i in range(20):
+            (tmp_path / f"m{i:02d}.py").write_text(f"valor_{i} = {i}\n" * 10)
+        service = RepoMapService(ignore=[".*"], map_cache=DiskCache(tmp_path / ".cache", 1024 * 1024))
+        reads = []
+        read_text = service.read_text
+        service.read_text = lambda path, rel, size: reads.append(rel) or read_text(path, rel, size)
+        
+        repo_map = service.get_repo_map(tmp_path, mode="full", token_budget=100)
+        assert repo_map.count("===") == 2 * len(reads)
+        assert reads == ["m00.py", "m01.py"]
+    
+    def test_walk_fallback_outside_git(self, tmp_path):
+        """Testa a enumeração pelo disco quando não há repositório git"""
+        (tmp_path / "node_modules").mkdir()
+        (tmp_path / "node_modules" / "a.js").write_text("x")
+        (tmp_path / "main.py").write_text("print(1)")
+        
+        files = RepoMapService(ignore=["node_modules"])._walk_files(tmp_path)
+        assert [f.path for f in files] == ["main.py"]
+
+class TestOutline:
+    """Testes para o modo de resumo por assinaturas"""
+    
+    def test_python_outline(self):
+        """Testa o resumo com assinaturas e primeira linha das docstrings"""
+        outline = python_outline(MODULE)
+        
+        assert outline.splitlines() == [
+            '"""Serviço de faturas."""',
+            "class InvoiceService(BaseService, metaclass=Meta):  # Gera e envia faturas",
+            "    def render(self, invoice_id: int, *, fmt: str='pdf') -> bytes: ...  # Renderiza a fatura",
+            "    async def send(self, to): ...",
+            "def helper(x=1): ...",
+        ]
+        assert python_outline("def quebrado(:\n") is None
+    
+    def test_outline_mode_reparses_only_changed_blobs(self, tmp_path):
+        """Testa que o resumo é reaproveitado por SHA do blob entre reconstruções"""
+        repo = git.Repo.init(tmp_path)
+        (tmp_path / "a.py").write_text("def a():\n    return 'corpo de a'\n")
+        (tmp_path / "b.py").write_text("def b():\n    return 'corpo de b'\n")
+        (tmp_path / "notas.txt").write_text("texto")
+        repo.git.add(".")
+        
+        service = RepoMapService(ignore=[".*"], map_cache=DiskCache(tmp_path / ".cache", 1024 * 1024))
+        reads = []
+        read_text = service.read_text
+        service.read_text = lambda path, rel, size: reads.append(rel) or read_text(path, rel, size)
+        
+        repo_map = service.get_repo_map(tmp_path, mode="outline", full_files=0)
+        assert "def a(): ..." in repo_map and "corpo de a" not in repo_map
+        assert "=== notas.txt ===" in repo_map and "texto" not in repo_map
+        assert reads == ["a.py", "b.py"]
+        
+        # Após um pull só o arquivo alterado é relido
+        (tmp_path / "b.py").write_text("def b2():\n    pass\n")
+        repo.git.add(".")
+        reads.clear()
+        repo_map = service.get_repo_map(tmp_path, mode="outline", full_files=0)
+        assert reads == ["b.py"]
+        assert "def a(): ..." in repo_map and "def b2(): ..." in repo_map
+        
+        # Os primeiros arquivos da ordem entram inteiros
+        repo_map = service.get_repo_map(tmp_path, mode="outline", full_files=1)
+        assert "corpo de a" in repo_map and "def b2(): ..." in repo_map
+        
+        full_map = service.get_repo_map(tmp_path, mode="full")
+        assert "corpo de a" in full_map and "texto" in full_map
+    
+    def test_map_cached_by_tree_sha(self, tmp_path):
+        """Testa que um repositório sem mudanças recebe o mapa sem ler arquivos"""
+        repo_path = tmp_path / "repo"
+        repo = git.Repo.init(repo_path)
+        (repo_path / "a.py").write_text("def a():\n    return 1\n")
+        (repo_path / "b.py").write_text("def b():\n    return 2\n")
+        repo.git.add(".")
+        repo.git.commit("-m", "Commit inicial", author="Test <test@example.com>",
+                        env={"GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com"})
+        
+        cache = DiskCache(tmp_path / "cache", 1024 * 1024)
+        service = RepoMapService(ignore=[".*"], map_cache=cache)
+        reads = []
+        read_text = service.read_text
+        service.read_text = lambda path, rel, size: reads.append(rel) or read_text(path, rel, size)
+        
+        first = service.get_repo_map(repo_path, full_files=1)
+        assert reads
+        
+        # Outra instância (novo processo) com o mesmo cache em disco
+        other = RepoMapService(ignore=[".*"], map_cache=cache)
+        other.read_text = lambda path, rel, size: reads.append(rel) or read_text(path, rel, size)
+        reads.clear()
+        assert other.get_repo_map(repo_path, full_files=1) == first
+        assert reads == []
+        
+        # Parâmetros diferentes ou alterações locais geram outro mapa
+        assert other.get_repo_map(repo_path, full_files=0) != first
+        (repo_path / "a.py").write_text("def a2():\n    return 1\n")
+        assert "def a2" in other.get_repo_map(repo_path, full_files=1)
+    
+    def test_new_query_reuses_cached_blob_data(self, tmp_path):
+        """Testa que uma consulta nova sobre um repositório sem mudanças não lê arquivos"""
+        repo_path = tmp_path / "repo"
+        repo = git.Repo.init(repo_path)
+        (repo_path / "fatura.py").write_text("def gerar_fatura():\n    return 'pdf'\n")
+        (repo_path / "usuario.py").write_text("def criar_usuario():\n    return 'login'\n")
+        repo.git.add(".")
+        repo.git.commit("-m", "Commit inicial", author="Test <test@example.com>",
+                        env={"GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com"})
+        
+        cache = DiskCache(tmp_path / "cache", 1024 * 1024)
+        reads = []
+        
+        def make_service():
+            service = RepoMapService(ignore=[".*"], indexes=RepoIndexRegistry(), map_cache=cache)
+            read_text = service.read_text
+            service.read_text = lambda path, rel, size: reads.append(rel) or read_text(path, rel, size)
+            return service
+        
+        make_service().get_repo_map(repo_path, query="fatura pdf", mode="full")
+        assert reads
+        
+        # Novo processo, outra task: ordenação diferente, nenhuma leitura
+        reads.clear()
+        repo_map = make_service().get_repo_map(repo_path, query="usuario login", mode="full")
+        assert reads == []
+        assert repo_map.startswith("=== usuario.py ===")
+        assert "criar_usuario" in repo_map
@@ -88,6 +88,22 @@ def test_test_service():
     success, output = test_service.run_tests(sample_repo, "pytest -q")
     assert success, f"Testes falharam: {output}"
 
+def test_test_service_cancel():
+    """Testa que a execução dos testes é interrompida pelo evento de cancelamento"""
+    import threading
+    import time
+    from app.services.test_service import test_service
+    
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    started = time.monotonic()
+    success, output = test_service.run_tests(
+        Path(__file__).parent, "sleep 30", cancel=cancel
+    )
+    assert not success
+    assert "cancelada" in output
+    assert time.monotonic() - started < 10
+
 def test_patch_service():
     """Testa serviço de patch"""
     from app.services.patch_service import patch_service
@@ -0,0 +1,190 @@
+"""
+Testes específicos para o SQLiteStateStore
+"""
+
+import pytest
+import tempfile
+import shutil
+from datetime import datetime
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.sqlite_store import SQLiteStateStore
+from app.models.state_store import JSONStateStore
+from app.models.schemas import ProjectConfig, Task, UserSession, TaskStatus
+
+class TestSQLiteStateStore:
+    """Testes para SQLiteStateStore"""
+    
+    @pytest.fixture
+    def temp_data_dir(self):
+        """Cria diretório temporário para dados de teste"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def state_store(self, temp_data_dir):
+        """Cria instância do state store para teste"""
+        store = SQLiteStateStore(temp_data_dir / "test.db")
+        yield store
+        store.close()
+    
+    def test_save_and_get_task(self, state_store):
+        """Testa salvar e recuperar task"""
+        task = Task(project="test-project", raw_request="Login", objective="Implementar JWT")
+        task.add_event("created", "Task criada")
+        
+        assert state_store.save_task(task)
+        
+        retrieved = state_store.get_task(task.id)
+        assert retrieved is not None
+        assert retrieved.objective == "Implementar JWT"
+        assert retrieved.status == TaskStatus.PENDING
+        assert len(retrieved.history) == 1
+    
+    def test_get_tasks_by_project(self, state_store):
+        """Testa recuperar tasks por projeto"""
+        state_store.save_task(Task(project="project-a", raw_request="Task 1", objective="Obj 1"))
+        state_store.save_task(Task(project="project-a", raw_request="Task 2", objective="Obj 2"))
+        state_store.save_task(Task(project="project-b", raw_request="Task 3", objective="Obj 3"))
+        
+        project_a_tasks = state_store.get_tasks_by_project("project-a")
+        assert len(project_a_tasks) == 2
+        assert all(task.project == "project-a" for task in project_a_tasks)
+        assert len(state_store.get_tasks_by_project("project-b")) == 1
+    
+    def test_get_tasks_by_project_uses_index(self, state_store):
+        """Testa que a consulta por projeto usa o índice"""
+        plan = state_store._fetchall(
+            "EXPLAIN QUERY PLAN SELECT data FROM tasks WHERE project = ? ORDER BY updated_at",
+            ("project-a",)
+        )
+        assert any("idx_tasks_project" in row[-1] for row in plan)
+    
+    def test_update_task_status(self, state_store):
+        """Testa atualização de status de task"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        state_store.save_task(task)
+        
+        assert state_store.update_task_status(task.id, TaskStatus.IN_PROGRESS)
+        assert state_store.get_task(task.id).status == TaskStatus.IN_PROGRESS
+        assert not state_store.update_task_status("nonexistent-id", TaskStatus.DONE)
+    
+    def test_save_task_expected_version(self, state_store):
+        """Testa a checagem otimista de versão ao salvar task"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        assert state_store.save_task(task, expected_version=0)
+        assert not state_store.save_task(task, expected_version=0)
+        assert state_store.save_task(task, expected_version=1)
+        assert not state_store.save_task(task, expected_version=1)
+        assert state_store.get_task_version(task.id) == 2
+    
+    def test_save_task_preserves_lease(self, state_store):
+        """Testa que só gravações com ``expected_version`` alteram o lease"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        state_store.save_task(task)
+        stale = state_store.get_task(task.id)
+        
+        task.lease_owner = "worker-1"
+        task.lease_expires_at = datetime(2030, 1, 1)
+        assert state_store.save_task(task, expected_version=1)
+        
+        stale.status = TaskStatus.DONE
+        assert state_store.save_task(stale)
+        saved = state_store.get_task(task.id)
+        assert saved.status == TaskStatus.DONE
+        assert saved.lease_owner == "worker-1"
+        assert saved.lease_expires_at == datetime(2030, 1, 1)
+    
+    def test_transaction_commits_once(self, state_store, temp_data_dir):
+        """Testa que mutações em uma transação são confirmadas juntas"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        other = SQLiteStateStore(temp_data_dir / "test.db")
+        
+        with state_store.transaction():
+            state_store.save_task(task)
+            state_store.update_task_status(task.id, TaskStatus.IN_PROGRESS)
+            assert other.get_task(task.id) is None
+        
+        assert other.get_task(task.id).status == TaskStatus.IN_PROGRESS
+        other.close()
+    
+    def test_transaction_rolls_back_on_error(self, state_store, temp_data_dir):
+        """Testa que uma exceção dentro da transação desfaz as mutações do bloco"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        
+        with pytest.raises(RuntimeError):
+            with state_store.transaction():
+                state_store.save_task(task)
+                state_store.update_task_status(task.id, TaskStatus.IN_PROGRESS)
+                raise RuntimeError("falha no meio da transação")
+        
+        assert state_store.get_task(task.id) is None
+        other = SQLiteStateStore(temp_data_dir / "test.db")
+        assert other.get_task(task.id) is None
+        other.close()
+        
+        # A conexão continua utilizável depois do rollback
+        assert state_store.save_task(task)
+        assert state_store.get_task(task.id) is not None
+    
+    def test_history_stored_per_event(self, state_store):
+        """Testa que o histórico é anexado evento a evento"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        task.add_event("created", "Task criada")
+        state_store.save_task(task)
+        
+        loaded = state_store.get_task(task.id, include_history=False)
+        assert loaded.history == []
+        loaded.add_event("started", "Iniciando")
+        state_store.save_task(loaded)
+        
+        assert [e.event_type for e in state_store.get_task(task.id).history] == ["created", "started"]
+        assert [e.event_type for e in state_store.get_task_history(task.id, limit=1)] == ["started"]
+        assert state_store._fetchall("SELECT json_extract(data, '$.history') FROM tasks") == [(None,)]
+    
+    def test_projects_and_sessions(self, state_store):
+        """Testa projetos e sessões"""
+        state_store.save_project(ProjectConfig(name="project-1", repo_url="https://github.com/test/repo1"))
+        state_store.save_project(ProjectConfig(name="project-2", repo_url="https://github.com/test/repo2"))
+        assert state_store.list_projects() == ["project-1", "project-2"]
+        assert state_store.get_project("project-1").repo_url == "https://github.com/test/repo1"
+        assert state_store.get_project("nonexistent-project") is None
+        
+        assert state_store.update_session_project(12345, "project-1")
+        assert state_store.update_session_project(12345, "project-2")
+        assert state_store.get_session(12345).current_project == "project-2"
+        assert state_store.get_session(99999) is None
+    
+    def test_migrate_from_json(self, temp_data_dir, state_store, monkeypatch):
+        """Testa migração única a partir dos arquivos JSON"""
+        json_dir = temp_data_dir / "json"
+        json_store = JSONStateStore(json_dir, compact_interval=0)
+        task = Task(project="project-a", raw_request="Test", objective="Test")
+        task.add_event("created", "Task criada")
+        json_store.save_task(task)
+        json_store.update_task_status(task.id, TaskStatus.DONE)
+        json_store.save_project(ProjectConfig(name="project-a", repo_url="https://github.com/test/repo"))
+        json_store.save_session(UserSession(user_id=1, current_project="project-a"))
+        json_store.close()
+        
+        # O store JSON aberto para a migração é fechado
+        closed = []
+        close = JSONStateStore.close
+        monkeypatch.setattr(JSONStateStore, "close", lambda self: closed.append(self) or close(self))
+        assert state_store.migrate_from_json(json_dir)
+        assert len(closed) == 1
+        
+        assert state_store.get_task(task.id).status == TaskStatus.DONE
+        assert len(state_store.get_task_history(task.id)) == 1
+        assert state_store.list_projects() == ["project-a"]
+        assert state_store.get_session(1).current_project == "project-a"
+        
+        # A migração não deve sobrescrever dados em uma segunda execução
+        state_store.update_task_status(task.id, TaskStatus.FAILED)
+        assert state_store.migrate_from_json(json_dir)
+        assert state_store.get_task(task.id).status == TaskStatus.FAILED
@@ -5,15 +5,26 @@ Testes específicos para o state store
 import pytest
 import tempfile
 import shutil
+import multiprocessing
 from pathlib import Path
 import sys
 
 # Adicionar diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.models.state_store import JSONStateStore
+from app.models.state_store import JSONStateStore, fcntl
+from app.models.artifact_store import artifact_store
 from app.models.schemas import ProjectConfig, Task, UserSession, TaskStatus
 
+def _concurrent_writer(data_dir: str, worker: int, count: int):
+    """Processo que grava projetos e tasks no mesmo diretório de dados"""
+    store = JSONStateStore(Path(data_dir), compact_threshold=5, compact_interval=0)
+    for i in range(count):
+        store.save_project(ProjectConfig(name=f"p{worker}-{i}", repo_url="https://github.com/test/repo"))
+        store.save_task(Task(id=f"t{worker}-{i}", project="p", raw_request="r", objective="o"))
+        if i % 5 == 4:
+            store.compact()
+
 class TestJSONStateStore:
     """Testes para JSONStateStore"""
     
@@ -170,3 +181,255 @@ class TestJSONStateStore:
         """Testa recuperar sessão que não existe"""
         session = state_store.get_session(99999)
         assert session is None
+    
+    def test_task_log_rebuilds_index_on_restart(self, temp_data_dir):
+        """Testa reconstrução do índice a partir do log de tasks"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        store.save_task(task)
+        store.update_task_status(task.id, TaskStatus.DONE)
+        
+        # Nova instância deve reconstruir o índice a partir do log
+        reopened = JSONStateStore(temp_data_dir, compact_interval=0)
+        retrieved = reopened.get_task(task.id)
+        assert retrieved is not None
+        assert retrieved.status == TaskStatus.DONE
+    
+    def test_task_log_compaction(self, temp_data_dir):
+        """Testa compactação do log no snapshot"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        store.save_task(task)
+        assert store.tasks_log_file.stat().st_size > 0
+        
+        assert store.compact()
+        assert store.tasks_log_file.stat().st_size == 0
+        
+        reopened = JSONStateStore(temp_data_dir, compact_interval=0)
+        assert reopened.get_task(task.id) is not None
+    
+    def test_task_log_ignores_torn_record(self, temp_data_dir):
+        """Testa que um registro incompleto no fim do log é ignorado"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        store.save_task(task)
+        with open(store.tasks_log_file, 'a', encoding='utf-8') as f:
+            f.write('{"op": "put", "id": "x", "task": {')
+        
+        reopened = JSONStateStore(temp_data_dir, compact_interval=0)
+        assert reopened.get_task(task.id) is not None
+        assert reopened.get_task("x") is None
+        
+        # Registros posteriores não podem ser perdidos pela linha incompleta
+        other = Task(project="test-project", raw_request="Other", objective="Other")
+        reopened.save_task(other)
+        assert JSONStateStore(temp_data_dir, compact_interval=0).get_task(other.id) is not None
+    
+    def test_read_cache_invalidated_by_external_write(self, temp_data_dir):
+        """Testa que o cache de leitura percebe escritas de outra instância"""
+        reader = JSONStateStore(temp_data_dir, compact_interval=0)
+        writer = JSONStateStore(temp_data_dir, compact_interval=0)
+        assert reader.list_projects() == []
+        
+        writer.save_project(ProjectConfig(name="project-1", repo_url="https://github.com/test/repo1"))
+        assert reader.list_projects() == ["project-1"]
+        
+        task = Task(project="project-1", raw_request="Test", objective="Test")
+        writer.save_task(task)
+        assert reader.get_task(task.id) is not None
+        
+        # Compactação por outro processo deve recarregar o índice
+        writer.update_task_status(task.id, TaskStatus.DONE)
+        writer.compact()
+        assert reader.get_task(task.id).status == TaskStatus.DONE
+    
+    def test_read_cache_skips_parse_when_unchanged(self, state_store, monkeypatch):
+        """Testa que leituras repetidas não refazem o parse do arquivo"""
+        state_store.save_project(ProjectConfig(name="project-1", repo_url="https://github.com/test/repo1"))
+        
+        calls = []
+        original = state_store._read_json_file
+        monkeypatch.setattr(state_store, "_read_json_file", lambda path: calls.append(path) or original(path))
+        
+        for _ in range(3):
+            assert state_store.get_project("project-1") is not None
+        assert calls == []
+    
+    def test_transaction_coalesces_writes(self, state_store):
+        """Testa que mutações em uma transação geram uma única escrita"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        
+        with state_store.transaction():
+            state_store.save_task(task)
+            task.add_event("created", "Task criada")
+            state_store.save_task(task)
+            state_store.update_task_status(task.id, TaskStatus.IN_PROGRESS)
+            state_store.save_project(ProjectConfig(name="test-project", repo_url="https://github.com/test/repo"))
+            
+            # Leituras dentro da transação enxergam as mudanças pendentes
+            assert state_store.get_task(task.id).status == TaskStatus.IN_PROGRESS
+            assert state_store.list_projects() == ["test-project"]
+            assert not state_store.tasks_log_file.exists()
+        
+        lines = state_store.tasks_log_file.read_text().splitlines()
+        assert len(lines) == 1
+        
+        reopened = JSONStateStore(state_store.data_dir, compact_interval=0)
+        retrieved = reopened.get_task(task.id)
+        assert retrieved.status == TaskStatus.IN_PROGRESS
+        assert len(retrieved.history) == 1
+        assert reopened.list_projects() == ["test-project"]
+    
+    def test_coalesce_window_flushes_on_close(self, temp_data_dir):
+        """Testa que escritas agrupadas por janela são gravadas no close"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0, coalesce_ms=60000)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        store.save_task(task)
+        store.update_task_status(task.id, TaskStatus.DONE)
+        assert not store.tasks_log_file.exists()
+        
+        store.close()
+        
+        reopened = JSONStateStore(temp_data_dir, compact_interval=0)
+        assert reopened.get_task(task.id).status == TaskStatus.DONE
+    
+    def test_flush_after_concurrent_write(self, temp_data_dir):
+        """Testa que o flush de uma transação não é descartado se outro processo gravou a task"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0)
+        other = JSONStateStore(temp_data_dir, compact_interval=0)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        store.save_task(task)
+        
+        with store.transaction():
+            task.status = TaskStatus.IN_PROGRESS
+            task.add_event("started", "Evento do primeiro processo")
+            store.save_task(task)
+            
+            concurrent = other.get_task(task.id)
+            concurrent.add_event("note", "Evento do segundo processo")
+            other.save_task(concurrent)
+        
+        for reader in (store, other, JSONStateStore(temp_data_dir, compact_interval=0)):
+            retrieved = reader.get_task(task.id)
+            assert retrieved.status == TaskStatus.IN_PROGRESS
+            assert [event.event_type for event in retrieved.history] == ["note", "started"]
+            assert reader.get_task_version(task.id) == 3
+    
+    def test_coalesced_put_merges_concurrent_write(self, temp_data_dir):
+        """Testa que uma gravação agrupada não apaga campos alterados por outro processo"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0, coalesce_ms=60000)
+        other = JSONStateStore(temp_data_dir, compact_interval=0)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        assert store.save_task(task, expected_version=0)
+        
+        task.priority = 5
+        store.save_task(task)
+        local_version = store.get_task_version(task.id)
+        
+        concurrent = other.get_task(task.id)
+        concurrent.context = "Contexto do segundo processo"
+        concurrent.status = TaskStatus.IN_PROGRESS
+        other.save_task(concurrent)
+        
+        store.flush()
+        for reader in (store, other):
+            merged = reader.get_task(task.id)
+            assert merged.priority == 5
+            assert merged.context == "Contexto do segundo processo"
+            assert merged.status == TaskStatus.IN_PROGRESS
+        
+        # A versão lida antes do merge não vale mais para checagens otimistas
+        assert not other.save_task(merged, expected_version=local_version)
+        store.close()
+    
+    def test_expected_version_bypasses_coalescing(self, temp_data_dir):
+        """Testa que a checagem de versão vale entre processos mesmo agrupando escritas"""
+        store = JSONStateStore(temp_data_dir, compact_interval=0, coalesce_ms=60000)
+        other = JSONStateStore(temp_data_dir, compact_interval=0)
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        store.save_task(task)
+        assert not store.tasks_log_file.exists()
+        
+        # A gravação com versão grava o buffer e o próprio registro em disco
+        assert store.save_task(task, expected_version=1)
+        assert other.get_task_version(task.id) == 2
+        
+        assert other.save_task(task, expected_version=2)
+        assert not store.save_task(task, expected_version=2)
+        assert store.get_task_version(task.id) == 3
+        store.close()
+    
+    def test_atomic_write_leaves_no_temp_files(self, state_store):
+        """Testa que a gravação atômica não deixa arquivos temporários"""
+        state_store.save_project(ProjectConfig(name="project-1", repo_url="https://github.com/test/repo1"))
+        leftovers = [p.name for p in state_store.data_dir.iterdir() if p.name.endswith(".tmp")]
+        assert leftovers == []
+    
+    def test_save_task_expected_version(self, state_store):
+        """Testa a checagem otimista de versão ao salvar task"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        assert state_store.get_task_version(task.id) is None
+        assert state_store.save_task(task, expected_version=0)
+        assert state_store.get_task_version(task.id) == 1
+        
+        # Outro escritor atualiza a task antes
+        assert state_store.save_task(task, expected_version=1)
+        assert not state_store.save_task(task, expected_version=1)
+        assert state_store.get_task_version(task.id) == 2
+        
+        # Versões sobrevivem à compactação e à reabertura
+        state_store.compact()
+        reopened = JSONStateStore(state_store.data_dir, compact_interval=0)
+        assert reopened.get_task_version(task.id) == 2
+    
+    def test_history_appended_incrementally(self, state_store):
+        """Testa que o histórico é anexado sem reescrever eventos antigos"""
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        task.add_event("created", "Task criada")
+        state_store.save_task(task)
+        
+        # Task carregada sem histórico continua anexando ao histórico salvo
+        loaded = state_store.get_task(task.id, include_history=False)
+        assert loaded.history == []
+        loaded.add_event("started", "Iniciando")
+        state_store.save_task(loaded)
+        
+        for line in state_store.tasks_log_file.read_text().splitlines():
+            assert '"history"' not in line
+        
+        state_store.compact()
+        reopened = JSONStateStore(state_store.data_dir, compact_interval=0)
+        assert [e.event_type for e in reopened.get_task(task.id).history] == ["created", "started"]
+        assert [e.event_type for e in reopened.get_task_history(task.id, limit=1)] == ["started"]
+    
+    def test_large_event_offloaded_to_artifact_store(self, state_store, temp_data_dir, monkeypatch):
+        """Testa que mensagens grandes vão para o artifact store"""
+        monkeypatch.setattr(artifact_store, "base_dir", temp_data_dir / "blobs")
+        task = Task(project="test-project", raw_request="Test", objective="Test")
+        output = "FAILED test_x\n" * 1000
+        task.add_event("failed", output)
+        state_store.save_task(task)
+        
+        event = state_store.get_task_history(task.id)[0]
+        assert event.payload_ref is not None
+        assert len(event.message) < len(output)
+        assert artifact_store.get(event.payload_ref) == output
+    
+    @pytest.mark.skipif(fcntl is None, reason="lock entre processos requer fcntl")
+    def test_concurrent_processes_do_not_lose_updates(self, temp_data_dir):
+        """Testa vários processos gravando no mesmo diretório"""
+        JSONStateStore(temp_data_dir, compact_interval=0)
+        ctx = multiprocessing.get_context("fork")
+        workers = [
+            ctx.Process(target=_concurrent_writer, args=(str(temp_data_dir), worker, 20))
+            for worker in range(4)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+        
+        store = JSONStateStore(temp_data_dir, compact_interval=0)
+        assert len(store.list_projects()) == 80
+        assert len(store.get_tasks_by_project("p")) == 80
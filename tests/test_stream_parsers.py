@@ -0,0 +1,124 @@
+"""
+Testes para o streaming de respostas do LLM e sua validação incremental
+"""
+
+import pytest
+import json
+from pathlib import Path
+import sys
+import httpx
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.llm_client import LLMClient
+from app.services.llm_service import LLMService
+from app.services.model_router import ModelRouter
+from app.utils.stream_parsers import DiffStreamParser, JSONStreamParser, StreamAborted
+
+DIFF = """diff --git a/db.py b/db.py
+--- a/db.py
++++ b/db.py
+@@ -1,2 +1,2 @@
+--- comentário sql removido
++-- comentário novo
+ x = 1
+--- a/app.py
++++ b/app.py
+@@ -1 +1 @@
+-a = 1
++a = 2
+"""
+
+def sse(chunks, tail=""):
+    """Resposta SSE no formato de chat completions com stream"""
+    events = [
+        f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n"
+        for chunk in chunks
+    ]
+    return httpx.Response(200, text="".join(events) + tail + "data: [DONE]\n\n",
+                          headers={"content-type": "text/event-stream"})
+
+def pieces(text, size=7):
+    """Quebra um texto em trechos como os tokens de um stream"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class TestStreamParsers:
+    """Testes para os validadores incrementais"""
+    
+    def test_diff_sections_emitted_as_they_complete(self):
+        """Testa a entrega de seções completas, sem confundir linhas removidas com cabeçalhos"""
+        sections = []
+        parser = DiffStreamParser(sections.append)
+        for chunk in pieces(DIFF):
+            parser.feed(chunk)
+            if "+a = 2" not in "".join(parser._chunks):
+                assert len(sections) <= 1
+        
+        assert parser.close() == DIFF.strip()
+        assert len(sections) == 2
+        assert sections[0].startswith("diff --git a/db.py") and "--- comentário" in sections[0]
+        assert sections[1].startswith("--- a/app.py")
+    
+    def test_diff_aborts_early_on_prose(self):
+        """Testa a interrupção assim que o início não pode ser um diff"""
+        parser = DiffStreamParser()
+        parser.feed("  --")
+        with pytest.raises(StreamAborted):
+            parser.feed("x Aqui está")
+    
+    def test_json_completes_at_object_end(self):
+        """Testa que o objeto fecha respeitando strings e que sem JSON o stream é interrompido"""
+        parser = JSONStreamParser()
+        assert not parser.feed('Resultado: {"notes": "use {chaves}", "a"')
+        assert parser.feed(': {"b": 1}} texto extra')
+        assert parser.close() == 'Resultado: {"notes": "use {chaves}", "a": {"b": 1}}'
+        
+        with pytest.raises(StreamAborted):
+            JSONStreamParser(max_preamble=10).feed("Desculpe, não posso ajudar com isso.")
+
+class TestStreamingLLMService:
+    """Testes para LLMService em modo streaming"""
+    
+    @pytest.fixture
+    def make_service(self):
+        """Fábrica de LLMService com streaming sobre respostas SSE simuladas"""
+        clients = []
+        
+        def factory(responses):
+            requests = []
+            
+            def handler(request):
+                requests.append(json.loads(request.content))
+                return responses[len(requests) - 1]
+            
+            client = LLMClient(base_url="http://llm.test/v1", api_key="chave",
+                               transport=httpx.MockTransport(handler))
+            clients.append(client)
+            service = LLMService(client=client, streaming=True, router=ModelRouter())
+            service.requests = requests
+            return service
+        
+        yield factory
+        for client in clients:
+            client.close()
+    
+    def test_patch_retried_after_early_abort(self, make_service):
+        """Testa que uma resposta que não é diff é interrompida e pedida de novo"""
+        service = make_service([sse(["Claro! Aqui ", "está o diff:\n"]), sse(pieces(DIFF))])
+        sections = []
+        
+        diff = service.generate_patch({"objective": "x"}, "mapa", on_section=sections.append)
+        
+        assert diff == DIFF.strip()
+        assert len(sections) == 2
+        assert len(service.requests) == 2
+        assert all(request["stream"] for request in service.requests)
+    
+    def test_review_stops_at_object_end(self, make_service):
+        """Testa que a revisão termina quando o JSON fecha, ignorando o resto do stream"""
+        review = '{"approved": true, "notes": "ok", "next_actions": null}'
+        service = make_service([sse(pieces(review) + ["\n\nObservações finais..."])])
+        
+        result = service.review({"objective": "x"}, "1 passed", "log", "diff")
+        assert result.approved is True
@@ -0,0 +1,95 @@
+"""
+Testes para o executor de tasks em background
+"""
+
+import pytest
+import asyncio
+import threading
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.task_executor import TaskExecutor
+
+class TestTaskExecutor:
+    """Testes para TaskExecutor"""
+    
+    @pytest.fixture
+    def executor(self):
+        """Cria um executor pequeno para teste"""
+        executor = TaskExecutor(max_workers=2, max_pending=3)
+        yield executor
+        executor.shutdown(wait=True)
+    
+    @pytest.mark.asyncio
+    async def test_submit_returns_immediately_and_reports(self, executor):
+        """Testa que submit não bloqueia e o resultado chega pelo callback"""
+        release = threading.Event()
+        results = {}
+        
+        def pipeline(task_id):
+            release.wait(timeout=5)
+            return True, f"ok {task_id}", None
+        
+        async def on_complete(task_id, result):
+            results[task_id] = result
+        
+        executor.set_pipeline(pipeline)
+        assert executor.submit("task-1", on_complete)
+        assert executor.is_running("task-1")
+        assert not executor.submit("task-1", on_complete)
+        
+        await asyncio.sleep(0.05)
+        assert results == {}
+        
+        release.set()
+        await executor.wait_all()
+        assert results == {"task-1": (True, "ok task-1", None)}
+        assert executor.active_count == 0
+    
+    @pytest.mark.asyncio
+    async def test_tasks_run_concurrently(self, executor):
+        """Testa que tasks diferentes rodam em paralelo nos workers"""
+        barrier = threading.Barrier(2, timeout=5)
+        
+        def pipeline(task_id):
+            barrier.wait()
+            return True, task_id, None
+        
+        executor.set_pipeline(pipeline)
+        assert executor.submit("task-1")
+        assert executor.submit("task-2")
+        await executor.wait_all()
+        assert not barrier.broken
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_error_is_reported(self, executor):
+        """Testa que exceções do pipeline viram resultado de falha"""
+        results = []
+        
+        def pipeline(task_id):
+            raise RuntimeError("clone falhou")
+        
+        async def on_complete(task_id, result):
+            results.append(result)
+        
+        executor.set_pipeline(pipeline)
+        executor.submit("task-1", on_complete)
+        await executor.wait_all()
+        assert results[0][0] is False
+        assert "clone falhou" in results[0][1]
+    
+    @pytest.mark.asyncio
+    async def test_rejects_when_pending_limit_reached(self, executor):
+        """Testa o limite de tasks pendentes"""
+        release = threading.Event()
+        executor.set_pipeline(lambda task_id: release.wait(timeout=5) and (True, "", None))
+        
+        for i in range(3):
+            assert executor.submit(f"task-{i}")
+        assert not executor.submit("task-3")
+        
+        release.set()
+        await executor.wait_all()
@@ -0,0 +1,234 @@
+"""
+Testes para a fila persistente de tasks
+"""
+
+import pytest
+import asyncio
+import tempfile
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.state_store import JSONStateStore
+from app.models.schemas import Task, TaskStatus
+from app.services.task_executor import TaskExecutor, task_cancelled
+from app.services.task_queue import TaskQueue
+
+class TestTaskQueue:
+    """Testes para TaskQueue"""
+    
+    @pytest.fixture
+    def temp_data_dir(self):
+        """Cria diretório temporário para dados de teste"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def store(self, temp_data_dir):
+        """Cria um state store temporário"""
+        return JSONStateStore(temp_data_dir, compact_interval=0)
+    
+    def _queue(self, store, worker_id="worker-1", **kwargs):
+        """Cria uma fila com um worker_id fixo"""
+        queue = TaskQueue(store, **{"max_global": 4, "max_per_project": 1, **kwargs})
+        queue.worker_id = worker_id
+        return queue
+    
+    def test_claim_respects_priority(self, store):
+        """Testa que tasks de maior prioridade são reivindicadas primeiro"""
+        queue = self._queue(store, max_per_project=4)
+        low = Task(project="p", raw_request="low", objective="low")
+        high = Task(project="p", raw_request="high", objective="high")
+        queue.enqueue(low, priority=0)
+        queue.enqueue(high, priority=10)
+        
+        claimed = queue.claim()
+        assert claimed.id == high.id
+        assert claimed.status == TaskStatus.IN_PROGRESS
+        assert claimed.lease_owner == "worker-1"
+        assert queue.claim().id == low.id
+        assert queue.claim() is None
+    
+    def test_claim_respects_project_and_global_limits(self, store):
+        """Testa os limites por projeto e global"""
+        queue = self._queue(store, max_global=2)
+        for project in ["a", "a", "b", "c"]:
+            queue.enqueue(Task(project=project, raw_request="t", objective="t"))
+        
+        first = queue.claim()
+        second = queue.claim()
+        assert {first.project, second.project} == {"a", "b"}
+        assert queue.claim() is None
+        
+        # Liberar uma vaga permite reivindicar a próxima task
+        store.update_task_status(first.id, TaskStatus.DONE)
+        queue.release(first.id)
+        assert queue.claim() is not None
+    
+    def test_concurrent_workers_do_not_claim_same_task(self, store, temp_data_dir):
+        """Testa que dois workers não reivindicam a mesma task"""
+        task = Task(project="p", raw_request="t", objective="t")
+        self._queue(store).enqueue(task)
+        
+        worker_1 = self._queue(store, "worker-1", max_per_project=4)
+        worker_2 = self._queue(JSONStateStore(temp_data_dir, compact_interval=0), "worker-2", max_per_project=4)
+        
+        claims = [worker_1.claim(), worker_2.claim()]
+        assert sum(1 for claimed in claims if claimed is not None) == 1
+    
+    def test_expired_lease_is_reclaimed(self, store):
+        """Testa que leases expirados voltam para a fila e respeitam o limite de tentativas"""
+        queue = self._queue(store, max_attempts=2)
+        task = Task(project="p", raw_request="t", objective="t")
+        queue.enqueue(task)
+        
+        for attempt in range(2):
+            claimed = queue.claim()
+            assert claimed.attempts == attempt + 1
+            claimed.lease_expires_at = datetime.now() - timedelta(seconds=1)
+            store.save_task(claimed, expected_version=store.get_task_version(claimed.id))
+        
+        assert queue.claim() is None
+        assert store.get_task(task.id).status == TaskStatus.FAILED
+    
+    def test_renew_requires_lease_owner(self, store):
+        """Testa que só o dono do lease o renova e que gravações sem CAS o preservam"""
+        queue = self._queue(store)
+        task = Task(project="p", raw_request="t", objective="t")
+        queue.enqueue(task)
+        claimed = queue.claim()
+        
+        assert queue.renew(task.id)
+        renewed = store.get_task(task.id).lease_expires_at
+        assert renewed > claimed.lease_expires_at
+        
+        # O manager grava a cópia antiga da task: o lease renovado continua valendo
+        claimed.add_event("progress", "Gravação com lease antigo")
+        store.save_task(claimed)
+        assert store.get_task(task.id).lease_expires_at == renewed
+        
+        assert not self._queue(store, "worker-2").renew(task.id)
+    
+    def test_release_marks_unfinished_task_failed(self, store):
+        """Testa que liberar uma task sem status final a marca como falha"""
+        queue = self._queue(store)
+        task = Task(project="p", raw_request="t", objective="t")
+        queue.enqueue(task)
+        queue.claim()
+        
+        assert queue.release(task.id)
+        released = store.get_task(task.id)
+        assert released.status == TaskStatus.FAILED
+        assert released.lease_owner is None
+    
+    @pytest.mark.asyncio
+    async def test_dispatcher_runs_pending_tasks(self, store):
+        """Testa o dispatcher executando tasks pendentes (ex.: após reinício)"""
+        queue = self._queue(store, max_per_project=4)
+        tasks = [Task(project="p", raw_request=f"t{i}", objective=f"t{i}") for i in range(3)]
+        for task in tasks:
+            queue.enqueue(task)
+        
+        def pipeline(task_id):
+            store.update_task_status(task_id, TaskStatus.DONE)
+            return True, "ok", None
+        
+        done = []
+        
+        async def on_complete(task_id, result):
+            done.append(task_id)
+        
+        executor = TaskExecutor(max_workers=2)
+        executor.set_pipeline(pipeline)
+        dispatcher = asyncio.create_task(queue.run(executor, on_complete, poll_interval=0.01))
+        try:
+            for _ in range(200):
+                if len(done) == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            dispatcher.cancel()
+            await asyncio.gather(dispatcher, return_exceptions=True)
+            executor.shutdown(wait=True)
+        
+        assert sorted(done) == sorted(task.id for task in tasks)
+        for task in tasks:
+            finished = store.get_task(task.id)
+            assert finished.status == TaskStatus.DONE
+            assert finished.lease_owner is None
+    
+    async def _run_one(self, queue, pipeline, timeout=10.0):
+        """Executa uma única task pelo dispatcher e aguarda sua conclusão"""
+        done = asyncio.Event()
+        
+        async def on_complete(task_id, result):
+            done.set()
+        
+        executor = TaskExecutor(max_workers=1)
+        executor.set_pipeline(pipeline)
+        dispatcher = asyncio.create_task(queue.run(executor, on_complete, poll_interval=0.01))
+        try:
+            await asyncio.wait_for(done.wait(), timeout=timeout)
+        finally:
+            dispatcher.cancel()
+            await asyncio.gather(dispatcher, return_exceptions=True)
+            executor.shutdown(wait=True)
+    
+    @pytest.mark.asyncio
+    async def test_long_run_keeps_lease(self, store, temp_data_dir):
+        """Testa que uma execução mais longa que o lease não é reivindicada por outro worker"""
+        queue = self._queue(store, lease_seconds=1)
+        task = Task(project="p", raw_request="t", objective="t")
+        queue.enqueue(task)
+        other = self._queue(JSONStateStore(temp_data_dir, compact_interval=0), "worker-2", max_per_project=4)
+        stolen = []
+        
+        def pipeline(task_id):
+            # Cópia da task com o lease da reivindicação, como a do manager
+            current = store.get_task(task_id, include_history=False)
+            for step in range(5):
+                time.sleep(0.5)
+                current.add_event("progress", f"Etapa {step}")
+                store.save_task(current)
+                stolen.append(other.claim())
+            store.update_task_status(task_id, TaskStatus.DONE)
+            return True, "ok", None
+        
+        await self._run_one(queue, pipeline)
+        
+        assert stolen == [None] * 5
+        finished = store.get_task(task.id)
+        assert finished.status == TaskStatus.DONE
+        assert finished.attempts == 1
+        assert finished.lease_owner is None
+    
+    @pytest.mark.asyncio
+    async def test_lost_lease_cancels_pipeline(self, store):
+        """Testa que o pipeline é avisado quando a renovação do lease falha"""
+        queue = self._queue(store, lease_seconds=1)
+        task = Task(project="p", raw_request="t", objective="t")
+        queue.enqueue(task)
+        cancelled = []
+        
+        def pipeline(task_id):
+            # Outro worker assume a task (ex.: depois de uma pausa longa deste processo)
+            current = store.get_task(task_id, include_history=False)
+            current.lease_owner = "worker-2"
+            store.save_task(current, expected_version=store.get_task_version(task_id))
+            
+            deadline = time.monotonic() + 5
+            while not task_cancelled() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            cancelled.append(task_cancelled())
+            return False, "abortada", None
+        
+        await self._run_one(queue, pipeline)
+        
+        assert cancelled == [True]
+        assert store.get_task(task.id).lease_owner == "worker-2"
@@ -0,0 +1,97 @@
+"""
+Testes para os worktrees por task
+"""
+
+import pytest
+import tempfile
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+import git
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.repo_cache import RepoCache
+from app.services.workspace_service import WorkspaceService
+from tests.fixtures import make_origin_repo
+
+class TestWorkspaceService:
+    """Testes para WorkspaceService"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Cria diretório temporário"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+    
+    @pytest.fixture
+    def origin(self, temp_dir):
+        """Repositório remoto local"""
+        return make_origin_repo(temp_dir)
+    
+    @pytest.fixture
+    def workspace(self, temp_dir):
+        """Serviço de workspace com base e cache temporários"""
+        cache = RepoCache(temp_dir / "mirrors", clone_filter="", depth=0, fetch_ttl=0)
+        return WorkspaceService(temp_dir / "work", cache=cache)
+    
+    def test_worktrees_are_isolated(self, workspace, origin):
+        """Testa que tasks do mesmo projeto têm working trees independentes"""
+        first = workspace.create_worktree(str(origin), "sample", "task-1", "main", "feat/one")
+        second = workspace.create_worktree(str(origin), "sample", "task-2", "main", "feat/two")
+        
+        assert first != second
+        assert git.Repo(first).active_branch.name == "feat/one"
+        assert git.Repo(second).active_branch.name == "feat/two"
+        
+        (first / "novo.txt").write_text("alteração da task 1")
+        assert not (second / "novo.txt").exists()
+        
+        # Objetos ficam no clone bare compartilhado do cache
+        assert (first / ".git").is_file()
+        assert workspace.cache.mirror_path(str(origin)).exists()
+    
+    def test_concurrent_worktree_creation(self, workspace, origin):
+        """Testa criação concorrente de worktrees no mesmo projeto"""
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            paths = list(pool.map(
+                lambda i: workspace.create_worktree(str(origin), "sample", f"task-{i}", "main", f"feat/{i}"),
+                range(4)
+            ))
+        assert len({str(path) for path in paths}) == 4
+        assert all(path.exists() for path in paths)
+    
+    def test_remove_worktree(self, workspace, origin):
+        """Testa a remoção do worktree e da branch local"""
+        path = workspace.create_worktree(str(origin), "sample", "task-1", "main", "feat/one")
+        assert workspace.remove_worktree(str(origin), "sample", "task-1", "feat/one")
+        
+        assert not path.exists()
+        mirror = git.Repo(workspace.cache.mirror_path(str(origin)))
+        assert "feat/one" not in mirror.heads
+        
+        # Recriar a mesma task funciona depois da remoção
+        assert workspace.create_worktree(str(origin), "sample", "task-1", "main", "feat/one").exists()
+    
+    def test_reset_worktree(self, workspace, origin):
+        """Testa que a próxima tentativa recomeça do commit base no mesmo worktree"""
+        path = workspace.create_worktree(str(origin), "sample", "task-1", "main", "feat/one")
+        repo = git.Repo(path)
+        base_sha = repo.head.commit.hexsha
+        
+        (path / "tentativa.txt").write_text("primeira tentativa")
+        repo.git.add(".")
+        repo.git.commit("-m", "Tentativa 1", author="Test <test@example.com>",
+                        env={"GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com"})
+        (path / "solto.txt").write_text("não versionado")
+        
+        assert workspace.reset_worktree("sample", "task-1", base_sha)
+        assert repo.head.commit.hexsha == base_sha
+        assert repo.active_branch.name == "feat/one"
+        assert not (path / "tentativa.txt").exists()
+        assert not (path / "solto.txt").exists()
+        
+        assert not workspace.reset_worktree("sample", "inexistente", base_sha)